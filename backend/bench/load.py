@@ -0,0 +1,382 @@
+"""HTTP load benchmark of the template API, compared to a committed baseline.
+
+Seeds a throwaway SQLite database and local storage directory with
+``--templates`` templates (through ``manage.py templates load-samples``),
+starts uvicorn on them and drives each scenario with ``--concurrency``
+concurrent clients. Throughput and p50/p95/p99 latencies are written as
+JSON to ``--output`` and compared to ``--baseline``: a scenario whose
+throughput drops, or whose p95 grows, by more than ``--threshold`` is a
+regression and the command exits with status 1.
+
+    uv run python -m bench.load [--templates 500] [--requests 2000]
+    uv run python -m bench.load --save-baseline
+
+Baselines are only comparable on the same machine and settings; refresh
+the committed one with ``--save-baseline`` when either changes.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+from base64 import b64encode
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+import itsdangerous
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = BACKEND_DIR / "bench" / "baseline.json"
+DEFAULT_OUTPUT = BACKEND_DIR / ".report" / "bench.json"
+SESSION_SECRET = "bench-session-secret"  # nosec B105
+WORDS = ["cat", "dog", "drake", "doge", "success", "fail", "surprised", "wow"]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    # (client, template count) -> response
+    request: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+    # Uploads are slow, CPU-bound (thumbnails) and grow the catalog: they
+    # get a share of ``--requests`` and fewer concurrent clients
+    share: float = 1.0
+    max_concurrency: int | None = None
+
+
+def _upload_image() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 80, 40)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+_UPLOAD = _upload_image()
+
+
+def _scenarios() -> list[Scenario]:
+    def template_id(count: int) -> int:
+        return random.randint(1, count)  # nosec B311
+
+    return [
+        Scenario("list", lambda c, n: c.get("/api/templates", params={"limit": 40})),
+        Scenario(
+            "search",
+            lambda c, n: c.get(
+                "/api/templates",
+                params={"search": random.choice(WORDS), "limit": 40},  # nosec B311
+            ),
+        ),
+        Scenario(
+            "deep_offset",
+            lambda c, n: c.get(
+                "/api/templates", params={"offset": max(n - 40, 0), "limit": 40}
+            ),
+        ),
+        Scenario("get", lambda c, n: c.get(f"/api/templates/{template_id(n)}")),
+        Scenario(
+            "popularity",
+            lambda c, n: c.post(f"/api/templates/{template_id(n)}/popularity"),
+        ),
+        Scenario(
+            "upload",
+            lambda c, n: c.post(
+                "/api/templates",
+                data={"name": "bench upload", "keywords": "bench,upload"},
+                files={"file": ("bench.jpg", _UPLOAD, "image/jpeg")},
+            ),
+            share=0.1,
+            max_concurrency=4,
+        ),
+    ]
+
+
+def _environment(workdir: Path) -> dict[str, str]:
+    """Settings of the benchmarked server: everything local and throwaway."""
+    env = dict(os.environ)
+    # A developer .env may point at a replica or S3; never touch those
+    env.pop("DATABASE_READ_URL", None)
+    env.update(
+        DATABASE_URL=f"sqlite:///{workdir / 'bench.db'}",
+        STORAGE_DRIVER="local",
+        STORAGE_LOCAL_PATH=str(workdir / "storage"),
+        STORAGE_LOCAL_BASE_URL="/api/static/templates",
+        SESSION_SECRET_KEY=SESSION_SECRET,
+        SESSION_COOKIE_MAX_AGE="86400",
+        RATE_LIMIT="1000000/second",
+        RATE_LIMIT_UPLOAD="1000000/second",
+        # Not the developer's data/ratelimit counters
+        RATE_LIMIT_STORAGE_URI=f"shm://{workdir / 'ratelimit'}",
+        APP_ENV="bench",
+        LOG_LEVEL="WARNING",
+        OTEL_ENABLED="false",
+        ALLOWED_HOSTS="127.0.0.1,localhost",
+        ALLOWED_ORIGINS="http://localhost",
+    )
+    for name in (
+        "KEYCLOAK_CLIENT_ID",
+        "KEYCLOAK_CLIENT_SECRET",
+        "KEYCLOAK_AUTHORIZE_URL",
+        "KEYCLOAK_ACCESS_TOKEN_URL",
+        "KEYCLOAK_JWT_URL",
+        "OTEL_EXPORTER_OTLP_ENDPOINT",
+    ):
+        env.setdefault(name, "http://localhost/unused")
+    return env
+
+
+def _run(env: dict[str, str], *args: str) -> None:
+    subprocess.run(  # nosec B603
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def _seed(workdir: Path, env: dict[str, str], count: int) -> None:
+    """Migrate, then load ``count`` generated templates like sample data."""
+    images = workdir / "samples"
+    images.mkdir()
+    entries = []
+    rng = random.Random(count)  # nosec B311
+    for i in range(count):
+        filename = f"sample-{i}.jpg"
+        color = (i * 37 % 256, i * 91 % 256, i * 53 % 256)
+        Image.new("RGB", (400, 300), color).save(images / filename, "JPEG")
+        keywords = rng.sample(WORDS, 3)
+        entries.append(
+            {
+                "title": f"{keywords[0]} template {i}",
+                "filename": filename,
+                "keywords": ",".join(keywords),
+            }
+        )
+    data_file = workdir / "samples.json"
+    data_file.write_text(json.dumps(entries))
+
+    _run(env, "-m", "alembic", "-c", "src/migrations/alembic.ini", "upgrade", "head")
+    _run(env, "manage.py", "templates", "load-samples", str(data_file), str(images))
+
+
+def _session_cookie(env: dict[str, str]) -> str:
+    """Signed session of a bench user, created in the bench database."""
+    code = (
+        "from src.database import SessionLocal\n"
+        "from src.models import User\n"
+        "with SessionLocal() as db:\n"
+        "    db.add(User(sub='bench', name='bench', email='bench@localhost'))\n"
+        "    db.commit()\n"
+    )
+    _run(env, "-c", code)
+    session = {"user": {"sub": "bench", "name": "bench", "role": None}}
+    data = b64encode(json.dumps(session).encode())
+    return itsdangerous.TimestampSigner(SESSION_SECRET).sign(data).decode()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(base_url: str, server: subprocess.Popen) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(300):
+            if server.poll() is not None:
+                raise SystemExit("uvicorn exited during startup")
+            try:
+                if (await client.get("/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise SystemExit("uvicorn did not become ready")
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+async def _drive(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    count: int,
+    requests: int,
+    concurrency: int,
+) -> dict[str, float]:
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await scenario.request(client, count)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def _bench(args: argparse.Namespace, base_url: str, cookie: str) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(
+        base_url=base_url, cookies={"session": cookie}, limits=limits, timeout=60
+    ) as client:
+        for scenario in _scenarios():
+            if args.only and scenario.name not in args.only:
+                continue
+            requests = max(int(args.requests * scenario.share), 1)
+            concurrency = min(args.concurrency, scenario.max_concurrency or sys.maxsize)
+            # Warm-up: connections, worker caches, SQLite page cache
+            warmup = min(concurrency * 5, requests)
+            await _drive(client, scenario, args.templates, warmup, concurrency)
+            results[scenario.name] = await _drive(
+                client, scenario, args.templates, requests, concurrency
+            )
+            print(f"{scenario.name:<12} {_format(results[scenario.name])}")
+    return results
+
+
+def _format(result: dict[str, float]) -> str:
+    return (
+        f"{result['throughput_rps']:8.1f} req/s"
+        f"  p50 {result['p50_ms']:7.2f} ms"
+        f"  p95 {result['p95_ms']:7.2f} ms"
+        f"  p99 {result['p99_ms']:7.2f} ms"
+        f"  errors {result['errors']}"
+    )
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Regressions of ``current`` against ``baseline``, one line each."""
+    regressions = []
+    for name, base in baseline["scenarios"].items():
+        result = current["scenarios"].get(name)
+        if result is None:
+            continue
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors")
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {result['throughput_rps']} req/s"
+                f" (baseline {base['throughput_rps']})"
+            )
+        if result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']} ms (baseline {base['p95_ms']})"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--templates", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=2000, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument(
+        "--only", nargs="+", metavar="SCENARIO", help="run these scenarios only"
+    )
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed relative regression"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="write results as the baseline"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="memegenerator-bench-") as tmp:
+        workdir = Path(tmp)
+        env = _environment(workdir)
+        print(f"seeding {args.templates} templates")
+        _seed(workdir, env, args.templates)
+        cookie = _session_cookie(env)
+
+        port = _free_port()
+        server = subprocess.Popen(  # nosec B603
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "src.web:app",
+                "--host=127.0.0.1",
+                f"--port={port}",
+                f"--workers={args.workers}",
+                "--no-access-log",
+                "--log-level=warning",
+            ],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            asyncio.run(_wait_ready(base_url, server))
+            scenarios = asyncio.run(_bench(args, base_url, cookie))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    results = {
+        "config": {
+            "templates": args.templates,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+        },
+        "scenarios": scenarios,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"results written to {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print("no baseline to compare to; run with --save-baseline")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["config"] != results["config"]:
+        print(f"warning: baseline was recorded with {baseline['config']}")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"regressions (threshold {args.threshold:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        raise SystemExit(1)
+    print(f"no regression against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Fixed per-request cost of the middleware stack built by ``create_app``.
+
+Sends ``--requests`` requests straight to the ASGI app (no server, no
+socket), to a no-op route added after all the others, so the rate limiter
+looks it up the slow way. The stack is rebuilt with 0, 1, 2... of the
+app's middlewares, innermost first: each line shows what one more layer
+adds per request, the last one the cost of the whole stack before any
+route code runs. Requests come from ``--clients`` addresses, under a limit
+high enough never to refuse them. Each figure is the best of ``--repeat``
+runs.
+
+    uv run python -m bench.middleware [--requests 20000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["RATE_LIMIT"] = "1000000000/minute"
+os.environ["RATE_LIMIT_STORAGE_URI"] = f"shm://{Path(_tmp.name) / 'ratelimit'}"
+
+from fastapi import Response  # noqa: E402
+
+from src.web import app  # noqa: E402
+
+BENCH_PATH = "/api/_bench"
+
+
+async def _noop() -> Response:
+    return Response()
+
+
+def _scopes(clients: int) -> list[dict]:
+    host = os.environ["ALLOWED_HOSTS"].split(",")[0].replace("*", "bench")
+    origin = os.environ["ALLOWED_ORIGINS"].split(",")[0]
+    return [
+        {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": BENCH_PATH,
+            "raw_path": BENCH_PATH.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (b"host", host.encode()),
+                (b"origin", origin.encode()),
+                (b"accept", b"*/*"),
+            ],
+            "client": (f"10.0.{i // 256}.{i % 256}", 50000),
+            "server": ("127.0.0.1", 8000),
+        }
+        for i in range(clients)
+    ]
+
+
+async def _receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _time(scopes: list[dict], requests: int) -> float:
+    """Seconds per request through the current middleware stack."""
+    statuses = []
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    app.middleware_stack = app.build_middleware_stack()
+    start = time.perf_counter()
+    for i in range(requests):
+        # Middlewares and the router add keys to the scope
+        await app(dict(scopes[i % len(scopes)]), _receive, send)
+    elapsed = time.perf_counter() - start
+    if set(statuses) != {200}:
+        raise RuntimeError(f"unexpected statuses {sorted(set(statuses))}")
+    return elapsed / requests
+
+
+async def _run(requests: int, clients: int, repeat: int) -> None:
+    app.add_api_route(BENCH_PATH, _noop, include_in_schema=False)
+    # Outermost first
+    stack = list(app.user_middleware)
+    scopes = _scopes(clients)
+    await _time(scopes, requests // 10)  # warm up
+
+    print(f"{requests} requests to {BENCH_PATH}, µs per request")
+    previous = None
+    for layers in range(len(stack) + 1):
+        app.user_middleware = stack[len(stack) - layers :]
+        seconds = min([await _time(scopes, requests) for _ in range(repeat)])
+        name = stack[len(stack) - layers].cls.__name__ if layers else "no middleware"
+        added = "" if previous is None else f"  (+{(seconds - previous) * 1e6:.2f})"
+        print(f"{name:<28}{seconds * 1e6:8.2f}{added}")
+        previous = seconds
+    app.user_middleware = stack
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run(args.requests, args.clients, args.repeat))
+    finally:
+        _tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
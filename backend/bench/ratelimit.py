@@ -0,0 +1,103 @@
+"""Per-request cost of the rate limiter, per worker and across workers.
+
+Times ``--requests`` hits of one limit through the same strategy slowapi
+uses, from ``--clients`` client addresses, on the in-memory storage (per
+worker, the old default) and on the shared-memory one. Then ``--workers``
+processes hit the shared storage at once, which shows the cost of the
+lock under contention and checks that they enforce a single limit.
+
+    uv run python -m bench.ratelimit [--requests 200000] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+import src.ratelimit  # noqa: F401 (registers shm://)
+
+# High enough that every hit is counted, never refused
+THROUGHPUT_LIMIT = "1000000000/minute"
+ENFORCED_LIMIT = 1000
+
+
+def _hits(uri: str, limit: str, requests: int, clients: int) -> tuple[float, int]:
+    """Seconds per hit and number of hits allowed."""
+    limiter = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    item = parse(limit)
+    keys = [f"10.0.{i // 256}.{i % 256}" for i in range(clients)]
+    allowed = 0
+    start = time.perf_counter()
+    for i in range(requests):
+        allowed += limiter.hit(item, keys[i % clients])
+    return (time.perf_counter() - start) / requests, allowed
+
+
+def _worker(uri: str, limit: str, requests: int, clients: int, results) -> None:
+    results.put(_hits(uri, limit, requests, clients))
+
+
+def _contended(
+    uri: str, limit: str, workers: int, requests: int, clients: int
+) -> list[tuple[float, int]]:
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=_worker, args=(uri, limit, requests, clients, results)
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcome = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return outcome
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shared = f"shm://{Path(tmp) / 'ratelimit'}"
+        memory, _ = _hits("memory://", THROUGHPUT_LIMIT, args.requests, args.clients)
+        shm, _ = _hits(shared, THROUGHPUT_LIMIT, args.requests, args.clients)
+        print(f"{args.requests} hits from {args.clients} clients, one process")
+        print(f"memory:// {memory * 1e6:6.2f} µs/hit (per worker)")
+        print(f"shm://    {shm * 1e6:6.2f} µs/hit (shared)")
+
+        per_worker = args.requests // args.workers
+        outcome = _contended(
+            shared, THROUGHPUT_LIMIT, args.workers, per_worker, args.clients
+        )
+        slowest = max(seconds for seconds, _ in outcome)
+        print(
+            f"shm://    {slowest * 1e6:6.2f} µs/hit with {args.workers} workers"
+            " hitting at once (slowest worker)"
+        )
+
+        outcome = _contended(
+            f"{shared}-enforced",
+            f"{ENFORCED_LIMIT}/minute",
+            args.workers,
+            ENFORCED_LIMIT,
+            1,
+        )
+        allowed = sum(count for _, count in outcome)
+        print(
+            f"{args.workers} workers x {ENFORCED_LIMIT} hits of one client against"
+            f" {ENFORCED_LIMIT}/minute: {allowed} allowed"
+        )
+
+
+if __name__ == "__main__":
+    main()
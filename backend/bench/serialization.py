@@ -0,0 +1,108 @@
+"""CPU cost of serializing a template list response, before and after.
+
+"before" is the generic path: build ``TemplateListResponse``, let FastAPI
+validate it against the route's response model and encode a JSONResponse.
+"after" is the fragment path used by the list routes. Both run on the same
+in-memory rows, so only serialization is measured.
+
+    uv run python -m bench.serialization [--limit 100] [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import UTC, datetime
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from src.models import Template
+from src.routes.templates import _to_list_response, _to_response
+from src.schemas.template import TemplateListResponse
+from src.serialization import fragment_cache
+from src.services.pagination import Page
+from src.storage import active_disk
+from src.web import app
+
+TEXT_LAYERS = json.dumps(
+    [
+        {"text": "top text", "x": 50, "y": 10, "font_size": 48},
+        {"text": "bottom text", "x": 50, "y": 90, "font_size": 48},
+    ]
+)
+
+
+def _rows(count: int) -> list[Template]:
+    return [
+        Template(
+            id=i,
+            name=f"template {i}",
+            filename=f"{i:032x}.jpg",
+            keywords="funny,cat,reaction",
+            popularity=count - i,
+            created_at=datetime(2026, 1, 1, tzinfo=UTC),
+            text_layers=TEXT_LAYERS,
+            thumbnail_widths="160,320,640",
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def _list_route() -> APIRoute:
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == "/api/templates":
+            return route
+    raise LookupError("template list route not found")
+
+
+async def _before(page: Page, route: APIRoute) -> bytes:
+    content = TemplateListResponse(
+        templates=[_to_response(t, active_disk) for t in page.items],
+        total=page.total,
+        next_cursor=page.next_cursor,
+    )
+    data = await serialize_response(
+        field=route.response_field, response_content=content
+    )
+    return JSONResponse(data).body
+
+
+async def _after(page: Page) -> bytes:
+    return _to_list_response(page, active_disk, Response()).body
+
+
+async def _cpu_per_call(fn, requests: int) -> float:
+    start = time.process_time()
+    for _ in range(requests):
+        await fn()
+    return (time.process_time() - start) / requests
+
+
+async def _run(limit: int, requests: int) -> tuple[float, float]:
+    page = Page(items=_rows(limit), total=None, next_cursor="cursor")
+    route = _list_route()
+    if json.loads(await _before(page, route)) != json.loads(await _after(page)):
+        raise SystemExit("serialization paths disagree")
+
+    fragment_cache.configure(max_entries=limit)
+    before = await _cpu_per_call(lambda: _before(page, route), requests)
+    after = await _cpu_per_call(lambda: _after(page), requests)
+    return before, after
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=100, help="templates per page")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    before, after = asyncio.run(_run(args.limit, args.requests))
+    print(f"{args.limit} templates per page, {args.requests} requests")
+    print(f"before: {before * 1e6:9.1f} µs CPU/request")
+    print(f"after:  {after * 1e6:9.1f} µs CPU/request, warm ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
 import json
+import time
 import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 import click
+from sqlalchemy.orm import Session
 
 from src.database import SessionLocal
 from src.models import Template
+from src.services import blobs as blob_service
+from src.services import embeddings as embedding_service
+from src.services import imports as import_service
+from src.services import keywords as keyword_service
+from src.services import similarity
 from src.services import templates as template_service
+from src.services import thumbnails as thumbnail_service
+from src.services.embeddings import embedding_matrix
 from src.storage import active_disk
 
 
@@ -29,6 +40,14 @@ def cli_delete_template(template_id: int):
     click.echo(f"Template {template_id} deleted.")
 
 
+@templates_group.command("sweep-blobs")
+def cli_sweep_blobs():
+    """Delete the files of images no template uses any more."""
+    with SessionLocal() as db:
+        swept = blob_service.sweep_all(db, active_disk)
+    click.echo(f"{swept} unused images deleted.")
+
+
 @templates_group.command("load-samples")
 @click.argument(
     "data_file", type=click.Path(exists=True, dir_okay=False, path_type=Path)
@@ -58,11 +77,225 @@ def cli_load_samples(data_file: Path, images_dir: Path):
             stored_name = f"{uuid.uuid4().hex}{ext}"
             with image_path.open("rb") as f:
                 active_disk.save(stored_name, f)
+            content = image_path.read_bytes()
+            widths = thumbnail_service.store(active_disk, stored_name, content)
 
-            template = Template(name=title, filename=stored_name, keywords=keywords)
+            template = Template(
+                name=title,
+                filename=stored_name,
+                thumbnail_widths=",".join(str(w) for w in widths),
+                dhash=similarity.to_hex(similarity.dhash(content)),
+            )
             db.add(template)
+            keyword_service.set_keywords(db, template, keywords.split(","))
+            blob_service.acquire(db, stored_name)
             db.commit()
+            if embedding_matrix.enabled:
+                embedding_matrix.put(template.id, embedding_service.embed(content))
             click.echo(f"  ok    {title}")
             loaded += 1
 
     click.echo(f"\nDone: {loaded} loaded, {skipped} skipped.")
+
+
+@templates_group.command("import")
+@click.argument(
+    "data_file", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument(
+    "images_dir", type=click.Path(exists=True, file_okay=False, path_type=Path)
+)
+@click.option("--workers", default=8, show_default=True, type=int)
+@click.option("--batch-size", default=500, show_default=True, type=int)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Progress file; defaults to DATA_FILE.checkpoint.",
+)
+def cli_import(
+    data_file: Path,
+    images_dir: Path,
+    workers: int,
+    batch_size: int,
+    checkpoint: Path | None,
+):
+    """Bulk import templates from DATA_FILE (JSON) and IMAGES_DIR.
+
+    Same input as load-samples. Images are uploaded by a pool of WORKERS
+    threads and templates inserted in batches; rerunning the command after
+    a crash resumes where it stopped. Identical images are imported once.
+    """
+    progress = import_service.Checkpoint(
+        checkpoint or data_file.with_name(f"{data_file.name}.checkpoint")
+    )
+    entries = import_service.read_entries(data_file)
+    todo = [e for e in entries if e.filename not in progress.done]
+
+    imported = 0
+    duplicates = 0
+    failed = 0
+    start = time.monotonic()
+    batch: list[import_service.StoredImage] = []
+
+    def commit_batch(db: Session) -> None:
+        nonlocal imported, duplicates
+        skipped = import_service.insert_batch(db, batch)
+        progress.record(batch)
+        imported += len(batch) - len(skipped)
+        duplicates += len(skipped)
+        batch.clear()
+
+    click.echo(f"{len(entries) - len(todo)} entries already imported.")
+    with (
+        SessionLocal() as db,
+        ThreadPoolExecutor(max_workers=workers) as pool,
+        click.progressbar(
+            length=len(todo), label="Importing", item_show_func=lambda s: s
+        ) as bar,
+    ):
+        # Bounded window of uploads, consumed in file order
+        window: deque[tuple[import_service.ImportEntry, Future]] = deque()
+        pending = iter(todo)
+        while True:
+            while len(window) < workers * 4 and (entry := next(pending, None)):
+                future = pool.submit(
+                    import_service.store_image,
+                    active_disk,
+                    entry,
+                    images_dir / entry.filename,
+                )
+                window.append((entry, future))
+            if not window:
+                break
+            entry, future = window.popleft()
+            try:
+                batch.append(future.result())
+            except Exception as exc:
+                click.echo(f"\n  fail  {entry.filename} ({exc})", err=True)
+                failed += 1
+            if len(batch) >= batch_size:
+                commit_batch(db)
+            rate = (bar.pos + 1) / (time.monotonic() - start)
+            bar.update(1, f"{rate:.1f} images/s")
+        if batch:
+            commit_batch(db)
+
+    click.echo(
+        f"\nDone: {imported} imported, {duplicates} duplicates, {failed} failed"
+        f" in {time.monotonic() - start:.1f}s."
+    )
+
+
+@templates_group.command("backfill-thumbnails")
+@click.option(
+    "--force", is_flag=True, help="Regenerate derivatives for every template."
+)
+@click.option("--batch-size", default=100, show_default=True, type=int)
+def cli_backfill_thumbnails(force: bool, batch_size: int):
+    """Generate the gallery thumbnails of templates that have none."""
+    done = 0
+    failed = 0
+    last_id = 0
+    with SessionLocal() as db:
+        while True:
+            query = db.query(Template).filter(Template.id > last_id)
+            if not force:
+                query = query.filter(Template.thumbnail_widths == "")
+            batch = query.order_by(Template.id).limit(batch_size).all()
+            if not batch:
+                break
+            for template in batch:
+                last_id = template.id
+                try:
+                    with active_disk.open(template.filename) as f:
+                        source = f.read()
+                    widths = thumbnail_service.store(
+                        active_disk, template.filename, source
+                    )
+                except Exception as exc:
+                    click.echo(f"  fail  {template.id} ({exc})", err=True)
+                    failed += 1
+                    continue
+                template.thumbnail_widths = ",".join(str(w) for w in widths)
+                click.echo(f"  ok    {template.id} {template.name}")
+                done += 1
+            db.commit()
+
+    click.echo(f"\nDone: {done} generated, {failed} failed.")
+
+
+@templates_group.command("backfill-hashes")
+@click.option("--force", is_flag=True, help="Recompute the hash of every template.")
+@click.option("--batch-size", default=100, show_default=True, type=int)
+def cli_backfill_hashes(force: bool, batch_size: int):
+    """Compute the perceptual hashes used to find near-duplicate templates."""
+    done = 0
+    failed = 0
+    last_id = 0
+    # Templates sharing an image file share its hash
+    known: dict[str, str] = {}
+    with SessionLocal() as db:
+        while True:
+            query = db.query(Template).filter(Template.id > last_id)
+            if not force:
+                query = query.filter(Template.dhash.is_(None))
+            batch = query.order_by(Template.id).limit(batch_size).all()
+            if not batch:
+                break
+            for template in batch:
+                last_id = template.id
+                if template.filename not in known:
+                    try:
+                        with active_disk.open(template.filename) as f:
+                            value = similarity.dhash(f.read())
+                    except Exception as exc:
+                        click.echo(f"  fail  {template.id} ({exc})", err=True)
+                        failed += 1
+                        continue
+                    known[template.filename] = similarity.to_hex(value)
+                template.dhash = known[template.filename]
+                done += 1
+            db.commit()
+            click.echo(f"  {done} hashed (up to id {last_id})")
+
+    click.echo(f"\nDone: {done} hashed, {failed} failed.")
+
+
+@templates_group.command("backfill-embeddings")
+@click.option("--force", is_flag=True, help="Recompute the vector of every template.")
+@click.option("--batch-size", default=100, show_default=True, type=int)
+def cli_backfill_embeddings(force: bool, batch_size: int):
+    """Compute the image vectors used by visual search on this host."""
+    if not embedding_matrix.enabled:
+        click.echo("Image search is disabled (set EMBEDDINGS_PATH).", err=True)
+        raise SystemExit(1)
+    done = 0
+    failed = 0
+    last_id = 0
+    with SessionLocal() as db:
+        while True:
+            batch = (
+                db.query(Template.id, Template.filename)
+                .filter(Template.id > last_id)
+                .order_by(Template.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            for template_id, filename in batch:
+                last_id = template_id
+                if not force and embedding_matrix.get(template_id) is not None:
+                    continue
+                try:
+                    with active_disk.open(filename) as f:
+                        vector = embedding_service.embed(f.read())
+                except Exception as exc:
+                    click.echo(f"  fail  {template_id} ({exc})", err=True)
+                    failed += 1
+                    continue
+                embedding_matrix.put(template_id, vector)
+                done += 1
+            click.echo(f"  {done} embedded (up to id {last_id})")
+
+    click.echo(f"\nDone: {done} embedded, {failed} failed.")
@@ -24,10 +24,46 @@ class Settings(BaseSettings):
 
     # Rate limiting (slowapi format: "N/second|minute|hour|day")
     RATE_LIMIT: str
+    # Stricter limit of the routes that take an image
+    RATE_LIMIT_UPLOAD: str = "10/minute"
+    # Counters shared by the workers of a host ("memory://": per worker)
+    RATE_LIMIT_STORAGE_URI: str = "shm://./data/ratelimit"
 
     # Logging
     LOG_LEVEL: str
 
+    # Server-side meme rendering
+    RENDER_POOL_SIZE: int = 2
+    RENDER_MAX_PENDING: int = 256
+    RENDER_FONT_DIR: str = ""
+    RENDER_CACHE_MEMORY_MB: int = 64
+    RENDER_CACHE_DISK_MB: int = 1024
+    RENDER_CACHE_DIR: str = ""
+
+    # Direct-to-S3 uploads: lifetime of a presigned POST, in seconds
+    DIRECT_UPLOAD_EXPIRES: int = 300
+
+    # HTTP caching of template reads (Cache-Control on public responses)
+    HTTP_CACHE_MAX_AGE: int = 60
+    HTTP_CACHE_STALE_WHILE_REVALIDATE: int = 300
+
+    # Per-worker template cache (invalidated through the catalog version)
+    CATALOG_CACHE_SIZE: int = 10000
+    CATALOG_CACHE_TTL: float = 60.0
+    CATALOG_CACHE_CHECK_INTERVAL: float = 1.0
+
+    # Per-worker cache of authenticated users (invalidated through a change log)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: float = 60.0
+    PRINCIPAL_CACHE_CHECK_INTERVAL: float = 1.0
+
+    # Typeahead prefix index (full rebuild interval, for popularity)
+    SUGGEST_REFRESH_INTERVAL: float = 300.0
+
+    # Popularity counters (write-behind)
+    POPULARITY_FLUSH_INTERVAL: float = 2.0
+    POPULARITY_FLUSH_MAX_PENDING: int = 1000
+
     # OpenTelemetry
     OTEL_ENABLED: bool = False
     OTEL_SERVICE_NAME: str = "memegenerator"
@@ -1,17 +1,88 @@
-"""SQLite database engine and session factory."""
+"""SQLite database engines and session factories.
+
+Writes go through ``database_engine``. Reads that never write (listing,
+search, get-by-id) use ``read_engine``, a separate pool that can point at a
+replica (``DATABASE_READ_URL``) and, on SQLite, opens read-only connections
+tuned for reading. SQLite in WAL mode lets those readers run alongside the
+single writer instead of waiting on its locks.
+
+Request handlers use the async twins of both engines (aiosqlite), so slow
+queries do not hold a threadpool worker. The sync ones serve the CLI,
+migrations and background threads. The API only runs on SQLite: change log
+triggers and ``ON CONFLICT`` upserts depend on it, and it refuses to start
+on another database (``catalog.require_change_triggers``), so a replica
+named by ``DATABASE_READ_URL`` is a SQLite file too.
+"""
 
 import os
+from collections.abc import AsyncGenerator
 from typing import Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 _db_path = os.environ.get("DATABASE_URL", "sqlite:///./data/meme_generator.db")
+_read_db_path = os.environ.get("DATABASE_READ_URL", _db_path)
+_read_pool_size = int(os.environ.get("DATABASE_READ_POOL_SIZE", "10"))
+# Per read connection: memory-mapped I/O (bytes) and page cache (KiB)
+_mmap_size = int(os.environ.get("DATABASE_MMAP_SIZE", str(256 * 1024 * 1024)))
+_cache_size_kib = int(os.environ.get("DATABASE_CACHE_SIZE", str(64 * 1024)))
+
+
+# Default (blocking) drivers -> their asyncio counterparts; URLs naming an
+# explicit driver are used as they are
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def _async_url(url: str) -> URL:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername)
+    return parsed.set(drivername=driver) if driver else parsed
+
+
+def _on_sqlite_connect(engine: Engine, *pragmas: str) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
 
 database_engine = create_engine(
     _db_path,
     connect_args={"check_same_thread": False},
 )
+async_database_engine = create_async_engine(_async_url(_db_path))
+read_engine = create_engine(
+    _read_db_path,
+    connect_args={"check_same_thread": False},
+    pool_size=_read_pool_size,
+)
+async_read_engine = create_async_engine(
+    _async_url(_read_db_path), pool_size=_read_pool_size
+)
+
+# WAL is persistent, but setting it needs a writable connection
+_WRITE_PRAGMAS = ("journal_mode=WAL", "synchronous=NORMAL", "busy_timeout=5000")
+_READ_PRAGMAS = (
+    "query_only=ON",
+    f"mmap_size={_mmap_size}",
+    f"cache_size=-{_cache_size_kib}",
+    "busy_timeout=5000",
+)
+for _engine in (database_engine, async_database_engine.sync_engine):
+    _on_sqlite_connect(_engine, *_WRITE_PRAGMAS)
+for _engine in (read_engine, async_read_engine.sync_engine):
+    _on_sqlite_connect(_engine, *_READ_PRAGMAS)
 
 SessionLocal: sessionmaker[Session] = sessionmaker(
     expire_on_commit=False,
@@ -20,6 +91,21 @@ SessionLocal: sessionmaker[Session] = sessionmaker(
     bind=database_engine,
 )
 
+ReadSessionLocal: sessionmaker[Session] = sessionmaker(
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine,
+)
+
+AsyncSessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
+    async_database_engine, expire_on_commit=False, autoflush=True
+)
+
+AsyncReadSessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
+    async_read_engine, expire_on_commit=False, autoflush=False
+)
+
 
 def get_db() -> Generator[Session, None, None]:
     """Dependency that yields a database session."""
@@ -28,3 +114,24 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """Dependency that yields a read-only database session."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency that yields an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency that yields an async read-only database session."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
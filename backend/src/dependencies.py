@@ -3,23 +3,31 @@
 from typing import Annotated
 
 from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette.requests import Request
 
-from src.database import get_db
-from src.models import User
+from src.database import get_async_db, get_async_read_db, get_db, get_read_db
+from src.services.principals import Principal, principal_cache
 from src.storage import get_disk
 from src.storage.disk import StorageDisk
 
 SessionDep = Annotated[Session, Depends(get_db)]
 
+# Read-only session on its own pool, for handlers that never write
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
+
+# Async twins, for async handlers
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+AsyncReadSessionDep = Annotated[AsyncSession, Depends(get_async_read_db)]
+
 DiskDep = Annotated[StorageDisk, Depends(get_disk)]
 
 ADMIN_ROLES = {"admin", "superadmin"}
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
-    """Return the logged-in User ORM object, or raise 401 if not authenticated."""
+async def get_current_user(request: Request, db: AsyncReadSessionDep) -> Principal:
+    """Return the logged-in user's principal, or raise 401 if not authenticated."""
     session_user = request.session.get("user")
     if not session_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -27,14 +35,14 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     if not sub:
         request.session.clear()
         raise HTTPException(status_code=401, detail="Not authenticated")
-    user = db.query(User).filter(User.sub == sub).first()
-    if user is None:
+    principal = await principal_cache.aget(db, sub)
+    if principal is None:
         request.session.clear()
         raise HTTPException(status_code=401, detail="Not authenticated")
-    return user
+    return principal
 
 
-CurrentUserDep = Annotated[User, Depends(get_current_user)]
+CurrentUserDep = Annotated[Principal, Depends(get_current_user)]
 
 
 def require_admin(request: Request) -> None:
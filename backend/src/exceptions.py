@@ -1 +1,10 @@
 class TemplateNotFound(Exception): ...
+
+
+class RenderQueueFull(Exception): ...
+
+
+class RenderWorkerLost(Exception): ...
+
+
+class InvalidCursor(Exception): ...
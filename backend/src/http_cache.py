@@ -0,0 +1,122 @@
+"""HTTP conditional requests: ETag / Last-Modified validators and 304s.
+
+Template reads are validated against the catalog version and the newest
+popularity flush: a validator changes only when a response could.
+"""
+
+import hashlib
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+from src.config import get_settings
+from src.services.catalog import CatalogVersion, catalog_cache
+
+PRIVATE_POLICY = "private, no-cache"
+
+
+def public_policy(max_age: int, stale_while_revalidate: int) -> str:
+    return f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+
+
+def catalog_validators(catalog: CatalogVersion, *parts: object) -> tuple[str, datetime]:
+    """ETag and Last-Modified of a response derived from the catalog.
+
+    ``parts`` identify the representation (path, query, user...).
+    """
+    raw = "\0".join(str(p) for p in (catalog.version, catalog.popularity, *parts))
+    etag = f'W/"{hashlib.sha256(raw.encode()).hexdigest()[:20]}"'
+
+    if catalog.changed_at is None:
+        last_modified = datetime.fromtimestamp(0, UTC)
+    else:
+        # SQLite CURRENT_TIMESTAMP is naive UTC
+        last_modified = catalog.changed_at.replace(tzinfo=UTC)
+    return etag, last_modified
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    opaque = etag.removeprefix("W/")
+    return any(c.strip().removeprefix("W/") == opaque for c in header.split(","))
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: datetime,
+    cache_control: str,
+) -> Response | None:
+    """Return a 304 if the client's copy is current, else set the validators.
+
+    Call it before doing any work for the response body.
+    """
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        fresh = _etag_matches(if_none_match, etag)
+    elif if_modified_since is not None:
+        fresh = _not_modified_since(if_modified_since, last_modified)
+    else:
+        fresh = False
+    if fresh:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def public_conditional(
+    request: Request, response: Response, db: Session, *parts: object
+) -> Response | None:
+    """``conditional`` for a public read derived from the catalog."""
+    return _public(request, response, catalog_cache.version(db), parts)
+
+
+async def apublic_conditional(
+    request: Request, response: Response, db: AsyncSession, *parts: object
+) -> Response | None:
+    """Async ``public_conditional``."""
+    catalog = await db.run_sync(catalog_cache.version)
+    return _public(request, response, catalog, parts)
+
+
+def _public(
+    request: Request,
+    response: Response,
+    catalog: CatalogVersion,
+    parts: tuple[object, ...],
+) -> Response | None:
+    settings = get_settings()
+    etag, last_modified = catalog_validators(catalog, *parts)
+    return conditional(
+        request,
+        response,
+        etag,
+        last_modified,
+        public_policy(
+            settings.HTTP_CACHE_MAX_AGE, settings.HTTP_CACHE_STALE_WHILE_REVALIDATE
+        ),
+    )
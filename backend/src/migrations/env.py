@@ -27,6 +27,11 @@ config.set_main_option("sqlalchemy.url", get_engine_url())
 target_metadata = BaseModel.metadata
 
 
+def include_name(name, type_, parent_names):
+    """Skip objects managed by hand-written migrations (FTS5 virtual tables)."""
+    return not (type_ == "table" and name and name.startswith("templates_fts"))
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -43,6 +48,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -59,7 +65,11 @@ def run_migrations_online() -> None:
 
     """
     with database_engine.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,29 @@
+"""add_template_thumbnail_widths
+
+Revision ID: c4d5e6f7a8b9
+Revises: b1c2d3e4f5a6
+Create Date: 2026-10-18 00:00:00.000000
+"""  # noqa: INP001
+
+import sqlalchemy as sa
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "c4d5e6f7a8b9"
+down_revision = "b1c2d3e4f5a6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    with op.batch_alter_table("templates") as batch_op:
+        batch_op.add_column(
+            sa.Column("thumbnail_widths", sa.Text(), nullable=False, server_default="")
+        )
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    with op.batch_alter_table("templates") as batch_op:
+        batch_op.drop_column("thumbnail_widths")
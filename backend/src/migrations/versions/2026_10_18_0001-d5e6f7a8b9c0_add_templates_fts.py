@@ -0,0 +1,78 @@
+"""add_templates_fts
+
+Full-text index over template name and keywords (SQLite FTS5), kept in sync
+with the templates table by triggers.
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-18 00:01:00.000000
+"""  # noqa: INP001
+
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "d5e6f7a8b9c0"
+down_revision = "c4d5e6f7a8b9"
+branch_labels = None
+depends_on = None
+
+# Only fire on name/keywords changes so popularity bumps never touch the index.
+# NB: a batch_alter_table() that recreates "templates" drops these triggers;
+# such a migration must create them again afterwards.
+TRIGGERS = [
+    """
+    CREATE TRIGGER templates_fts_ai AFTER INSERT ON templates BEGIN
+        INSERT INTO templates_fts(rowid, name, keywords)
+        VALUES (new.id, new.name, new.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_fts_ad AFTER DELETE ON templates BEGIN
+        INSERT INTO templates_fts(templates_fts, rowid, name, keywords)
+        VALUES ('delete', old.id, old.name, old.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_fts_au AFTER UPDATE OF name, keywords ON templates
+    BEGIN
+        INSERT INTO templates_fts(templates_fts, rowid, name, keywords)
+        VALUES ('delete', old.id, old.name, old.keywords);
+        INSERT INTO templates_fts(rowid, name, keywords)
+        VALUES (new.id, new.name, new.keywords);
+    END
+    """,
+]
+
+
+def create_triggers() -> None:
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE templates_fts USING fts5(
+            name,
+            keywords,
+            content='templates',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        """
+    )
+    create_triggers()
+    op.execute("INSERT INTO templates_fts(templates_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for name in ("templates_fts_ai", "templates_fts_ad", "templates_fts_au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS templates_fts")
@@ -0,0 +1,34 @@
+"""add_template_keyset_indexes
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-18 00:02:00.000000
+"""  # noqa: INP001
+
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "e6f7a8b9c0d1"
+down_revision = "d5e6f7a8b9c0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    op.create_index(
+        "ix_templates_popularity_created_at_id",
+        "templates",
+        ["popularity", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_templates_creator_id_created_at_id",
+        "templates",
+        ["creator_id", "created_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    op.drop_index("ix_templates_creator_id_created_at_id", table_name="templates")
+    op.drop_index("ix_templates_popularity_created_at_id", table_name="templates")
@@ -0,0 +1,79 @@
+"""add_catalog_changes
+
+Log of template inserts, updates and deletes (excluding popularity), written
+by triggers so every process and the CLI bump the catalog version.
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2026-10-18 00:03:00.000000
+"""  # noqa: INP001
+
+import sqlalchemy as sa
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "f7a8b9c0d1e2"
+down_revision = "e6f7a8b9c0d1"
+branch_labels = None
+depends_on = None
+
+# NB: a batch_alter_table() that recreates "templates" drops these triggers;
+# such a migration must create them again afterwards.
+TRIGGERS = [
+    """
+    CREATE TRIGGER templates_catalog_ai AFTER INSERT ON templates BEGIN
+        INSERT INTO catalog_changes(template_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_catalog_ad AFTER DELETE ON templates BEGIN
+        INSERT INTO catalog_changes(template_id) VALUES (old.id);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_catalog_au
+    AFTER UPDATE OF name, filename, keywords, creator_id, text_layers,
+        thumbnail_widths
+    ON templates BEGIN
+        INSERT INTO catalog_changes(template_id) VALUES (new.id);
+    END
+    """,
+]
+
+
+def create_triggers() -> None:
+    for statement in TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    op.create_table(
+        "catalog_changes",
+        sa.Column("template_id", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sqlite_autoincrement=True,
+    )
+    op.create_index("ix_catalog_changes_created_at", "catalog_changes", ["created_at"])
+    op.create_index(
+        "ix_catalog_changes_template_id", "catalog_changes", ["template_id"]
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        create_triggers()
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    if op.get_bind().dialect.name == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS templates_catalog_{suffix}")
+    op.drop_index("ix_catalog_changes_template_id", table_name="catalog_changes")
+    op.drop_index("ix_catalog_changes_created_at", table_name="catalog_changes")
+    op.drop_table("catalog_changes")
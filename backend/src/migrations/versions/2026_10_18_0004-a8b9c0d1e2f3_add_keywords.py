@@ -0,0 +1,98 @@
+"""add_keywords
+
+Normalized keyword index: one row per lowercase keyword with its template
+count, and the template <-> keyword links, backfilled from the comma-joined
+``templates.keywords`` column.
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-18 00:04:00.000000
+"""  # noqa: INP001
+
+from collections import Counter
+
+import sqlalchemy as sa
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "a8b9c0d1e2f3"
+down_revision = "f7a8b9c0d1e2"
+branch_labels = None
+depends_on = None
+
+
+def backfill() -> None:
+    bind = op.get_bind()
+    links = []
+    counts: Counter[str] = Counter()
+    for template_id, keywords in bind.execute(
+        sa.text("SELECT id, keywords FROM templates")
+    ):
+        tags = {tag for k in keywords.split(",") if (tag := k.strip().lower())}
+        links.extend((template_id, tag) for tag in tags)
+        counts.update(tags)
+    if not counts:
+        return
+
+    keywords_table = sa.table(
+        "keywords", sa.column("name"), sa.column("template_count")
+    )
+    op.bulk_insert(
+        keywords_table,
+        [{"name": name, "template_count": n} for name, n in sorted(counts.items())],
+    )
+    ids: dict[str, int] = {}
+    for name, keyword_id in bind.execute(sa.text("SELECT name, id FROM keywords")):
+        ids[name] = keyword_id
+    links_table = sa.table(
+        "template_keywords", sa.column("template_id"), sa.column("keyword_id")
+    )
+    op.bulk_insert(
+        links_table,
+        [{"template_id": t, "keyword_id": ids[tag]} for t, tag in links],
+    )
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    op.create_table(
+        "keywords",
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("template_count", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_index("ix_keywords_created_at", "keywords", ["created_at"])
+    op.create_index("ix_keywords_template_count", "keywords", ["template_count"])
+    op.create_table(
+        "template_keywords",
+        sa.Column("template_id", sa.Integer(), nullable=False),
+        sa.Column("keyword_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["keyword_id"], ["keywords.id"]),
+        sa.ForeignKeyConstraint(["template_id"], ["templates.id"]),
+        sa.PrimaryKeyConstraint("template_id", "keyword_id"),
+    )
+    op.create_index(
+        "ix_template_keywords_keyword_id_template_id",
+        "template_keywords",
+        ["keyword_id", "template_id"],
+    )
+    backfill()
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    op.drop_index(
+        "ix_template_keywords_keyword_id_template_id", table_name="template_keywords"
+    )
+    op.drop_table("template_keywords")
+    op.drop_index("ix_keywords_template_count", table_name="keywords")
+    op.drop_index("ix_keywords_created_at", table_name="keywords")
+    op.drop_table("keywords")
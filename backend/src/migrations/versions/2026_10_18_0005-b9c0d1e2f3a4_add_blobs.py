@@ -0,0 +1,112 @@
+"""add_blobs
+
+Reference counts of stored template images, so templates can share one
+content-addressed file: ``templates.filename`` is no longer unique. Existing
+files are backfilled with one reference per template using them.
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-18 00:05:00.000000
+"""  # noqa: INP001
+
+import sqlalchemy as sa
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "b9c0d1e2f3a4"
+down_revision = "a8b9c0d1e2f3"
+branch_labels = None
+depends_on = None
+
+# Names the UNIQUE (filename) constraint of the original create_table
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+# Recreating "templates" drops its triggers (see d5e6f7a8b9c0, f7a8b9c0d1e2)
+TRIGGERS = [
+    """
+    CREATE TRIGGER templates_fts_ai AFTER INSERT ON templates BEGIN
+        INSERT INTO templates_fts(rowid, name, keywords)
+        VALUES (new.id, new.name, new.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_fts_ad AFTER DELETE ON templates BEGIN
+        INSERT INTO templates_fts(templates_fts, rowid, name, keywords)
+        VALUES ('delete', old.id, old.name, old.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_fts_au AFTER UPDATE OF name, keywords ON templates
+    BEGIN
+        INSERT INTO templates_fts(templates_fts, rowid, name, keywords)
+        VALUES ('delete', old.id, old.name, old.keywords);
+        INSERT INTO templates_fts(rowid, name, keywords)
+        VALUES (new.id, new.name, new.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_catalog_ai AFTER INSERT ON templates BEGIN
+        INSERT INTO catalog_changes(template_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_catalog_ad AFTER DELETE ON templates BEGIN
+        INSERT INTO catalog_changes(template_id) VALUES (old.id);
+    END
+    """,
+    """
+    CREATE TRIGGER templates_catalog_au
+    AFTER UPDATE OF name, filename, keywords, creator_id, text_layers,
+        thumbnail_widths
+    ON templates BEGIN
+        INSERT INTO catalog_changes(template_id) VALUES (new.id);
+    END
+    """,
+]
+
+
+def create_triggers() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    op.create_table(
+        "blobs",
+        sa.Column("filename", sa.String(length=255), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("filename"),
+    )
+    op.create_index("ix_blobs_created_at", "blobs", ["created_at"])
+    op.execute(
+        "INSERT INTO blobs (filename, refcount) "
+        "SELECT filename, count(*) FROM templates GROUP BY filename"
+    )
+
+    with op.batch_alter_table(
+        "templates", naming_convention=NAMING_CONVENTION
+    ) as batch_op:
+        batch_op.drop_constraint("uq_templates_filename", type_="unique")
+        batch_op.create_index("ix_templates_filename", ["filename"])
+    create_triggers()
+
+
+def downgrade() -> None:
+    """Reverse the migration (fails if templates share a file)."""
+    with op.batch_alter_table("templates") as batch_op:
+        batch_op.drop_index("ix_templates_filename")
+        batch_op.create_unique_constraint("uq_templates_filename", ["filename"])
+    create_triggers()
+    op.drop_index("ix_blobs_created_at", table_name="blobs")
+    op.drop_table("blobs")
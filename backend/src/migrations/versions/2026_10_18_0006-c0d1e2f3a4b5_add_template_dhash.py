@@ -0,0 +1,49 @@
+"""add_template_dhash
+
+Perceptual hash of each template image, for near-duplicate detection.
+Existing rows are hashed by ``manage.py templates backfill-hashes``; hash
+updates are logged to ``catalog_changes`` so every worker's index sees them.
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2026-10-18 00:06:00.000000
+"""  # noqa: INP001
+
+import sqlalchemy as sa
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "c0d1e2f3a4b5"
+down_revision = "b9c0d1e2f3a4"
+branch_labels = None
+depends_on = None
+
+CATALOG_UPDATE_TRIGGER = """
+    CREATE TRIGGER templates_catalog_au
+    AFTER UPDATE OF name, filename, keywords, creator_id, text_layers,
+        thumbnail_widths{extra}
+    ON templates BEGIN
+        INSERT INTO catalog_changes(template_id) VALUES (new.id);
+    END
+"""
+
+
+def replace_catalog_trigger(extra: str) -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute("DROP TRIGGER IF EXISTS templates_catalog_au")
+    op.execute(CATALOG_UPDATE_TRIGGER.format(extra=extra))
+
+
+# Plain ALTER TABLE (SQLite >= 3.35): batch mode would recreate "templates"
+# and drop its FTS and catalog triggers
+def upgrade() -> None:
+    """Apply the migration."""
+    op.add_column("templates", sa.Column("dhash", sa.String(length=16), nullable=True))
+    replace_catalog_trigger(", dhash")
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    replace_catalog_trigger("")
+    op.drop_column("templates", "dhash")
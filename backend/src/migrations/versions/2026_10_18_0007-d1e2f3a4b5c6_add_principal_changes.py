@@ -0,0 +1,85 @@
+"""add_principal_changes
+
+Log of changes to a user's role or groups (and to the roles of groups),
+written by triggers so every worker evicts the principals it cached, whether
+the change comes from a login, the CLI or plain SQL.
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2026-10-18 00:07:00.000000
+"""  # noqa: INP001
+
+import sqlalchemy as sa
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "d1e2f3a4b5c6"
+down_revision = "c0d1e2f3a4b5"
+branch_labels = None
+depends_on = None
+
+TRIGGERS = {
+    "users_principal_au": """
+    CREATE TRIGGER users_principal_au AFTER UPDATE OF sub, role_id ON users
+    BEGIN
+        INSERT INTO principal_changes(sub) VALUES (old.sub);
+    END
+    """,
+    "users_principal_ad": """
+    CREATE TRIGGER users_principal_ad AFTER DELETE ON users BEGIN
+        INSERT INTO principal_changes(sub) VALUES (old.sub);
+    END
+    """,
+    "user_groups_principal_ai": """
+    CREATE TRIGGER user_groups_principal_ai AFTER INSERT ON user_groups BEGIN
+        INSERT INTO principal_changes(sub)
+        SELECT sub FROM users WHERE id = new.user_id;
+    END
+    """,
+    "user_groups_principal_ad": """
+    CREATE TRIGGER user_groups_principal_ad AFTER DELETE ON user_groups BEGIN
+        INSERT INTO principal_changes(sub)
+        SELECT sub FROM users WHERE id = old.user_id;
+    END
+    """,
+    "groups_principal_au": """
+    CREATE TRIGGER groups_principal_au AFTER UPDATE OF role_id ON groups BEGIN
+        INSERT INTO principal_changes(sub)
+        SELECT users.sub FROM users
+        JOIN user_groups ON user_groups.user_id = users.id
+        WHERE user_groups.group_id = new.id;
+    END
+    """,
+}
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    op.create_table(
+        "principal_changes",
+        sa.Column("sub", sa.String(length=255), nullable=False),
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sqlite_autoincrement=True,
+    )
+    op.create_index(
+        "ix_principal_changes_created_at", "principal_changes", ["created_at"]
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        for statement in TRIGGERS.values():
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    if op.get_bind().dialect.name == "sqlite":
+        for name in TRIGGERS:
+            op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_index("ix_principal_changes_created_at", table_name="principal_changes")
+    op.drop_table("principal_changes")
@@ -0,0 +1,46 @@
+"""prune_catalog_changes
+
+Keep only the newest rows of catalog_changes: a trigger deletes, on each
+insert, the row that fell out of the window. A worker more than
+CatalogCache.MAX_TRACKED_CHANGES changes behind drops its whole cache
+anyway, so older rows are never read.
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2026-10-18 00:08:00.000000
+"""  # noqa: INP001
+
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "e2f3a4b5c6d7"
+down_revision = "d1e2f3a4b5c6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    # Rows kept: well above CatalogCache.MAX_TRACKED_CHANGES (1000)
+    op.execute(
+        """
+        CREATE TRIGGER catalog_changes_prune AFTER INSERT ON catalog_changes
+        BEGIN
+            DELETE FROM catalog_changes WHERE id <= new.id - 10000;
+        END
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM catalog_changes
+        WHERE id <= (SELECT max(id) FROM catalog_changes) - 10000
+        """
+    )
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS catalog_changes_prune")
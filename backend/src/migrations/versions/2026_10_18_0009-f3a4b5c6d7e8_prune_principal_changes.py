@@ -0,0 +1,46 @@
+"""prune_principal_changes
+
+Keep only the newest rows of principal_changes: a trigger deletes, on each
+insert, the row that fell out of the window. A worker more than
+PrincipalCache.MAX_TRACKED_CHANGES changes behind drops its whole cache
+anyway, so older rows are never read.
+
+Revision ID: f3a4b5c6d7e8
+Revises: e2f3a4b5c6d7
+Create Date: 2026-10-18 00:09:00.000000
+"""  # noqa: INP001
+
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "f3a4b5c6d7e8"
+down_revision = "e2f3a4b5c6d7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    # Rows kept: well above PrincipalCache.MAX_TRACKED_CHANGES (1000)
+    op.execute(
+        """
+        CREATE TRIGGER principal_changes_prune AFTER INSERT ON principal_changes
+        BEGIN
+            DELETE FROM principal_changes WHERE id <= new.id - 10000;
+        END
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM principal_changes
+        WHERE id <= (SELECT max(id) FROM principal_changes) - 10000
+        """
+    )
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS principal_changes_prune")
@@ -0,0 +1,55 @@
+"""add_popularity_flushes
+
+Generation of popularity counts, shared by every worker: each flush of
+buffered increments inserts a row, and a trigger deletes the older ones.
+
+Revision ID: a4b5c6d7e8f9
+Revises: f3a4b5c6d7e8
+Create Date: 2026-10-18 00:10:00.000000
+"""  # noqa: INP001
+
+import sqlalchemy as sa
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "a4b5c6d7e8f9"
+down_revision = "f3a4b5c6d7e8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    op.create_table(
+        "popularity_flushes",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sqlite_autoincrement=True,
+    )
+    op.create_index(
+        "ix_popularity_flushes_created_at", "popularity_flushes", ["created_at"]
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            """
+            CREATE TRIGGER popularity_flushes_prune
+            AFTER INSERT ON popularity_flushes
+            BEGIN
+                DELETE FROM popularity_flushes WHERE id < new.id;
+            END
+            """
+        )
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS popularity_flushes_prune")
+    op.drop_index("ix_popularity_flushes_created_at", table_name="popularity_flushes")
+    op.drop_table("popularity_flushes")
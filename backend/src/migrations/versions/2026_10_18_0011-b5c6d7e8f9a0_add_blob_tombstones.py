@@ -0,0 +1,35 @@
+"""add_blob_tombstones
+
+Blobs released by their last template stay as refcount 0 tombstones until
+their files are deleted, after the template delete has committed. The
+tombstone keeps the derivative widths to delete.
+
+Revision ID: b5c6d7e8f9a0
+Revises: a4b5c6d7e8f9
+Create Date: 2026-10-18 00:11:00.000000
+"""  # noqa: INP001
+
+import sqlalchemy as sa
+from alembic import op
+
+# Revision identifiers used by Alembic
+revision = "b5c6d7e8f9a0"
+down_revision = "a4b5c6d7e8f9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Apply the migration."""
+    with op.batch_alter_table("blobs") as batch_op:
+        batch_op.add_column(
+            sa.Column("thumbnail_widths", sa.Text(), nullable=False, server_default="")
+        )
+
+
+def downgrade() -> None:
+    """Reverse the migration."""
+    # Files of pending tombstones are left behind
+    op.execute("DELETE FROM blobs WHERE refcount <= 0")
+    with op.batch_alter_table("blobs") as batch_op:
+        batch_op.drop_column("thumbnail_widths")
@@ -1,6 +1,16 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Table, Text, func
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    Text,
+    func,
+)
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -88,18 +98,114 @@ class User(BaseModel):
     )
 
 
+# Many-to-many association table for Template <-> Keyword
+template_keywords = Table(
+    "template_keywords",
+    BaseModel.metadata,
+    Column("template_id", Integer, ForeignKey("templates.id"), primary_key=True),
+    Column("keyword_id", Integer, ForeignKey("keywords.id"), primary_key=True),
+    # Tag lookups go from the keyword to its templates
+    Index("ix_template_keywords_keyword_id_template_id", "keyword_id", "template_id"),
+)
+
+
+class Keyword(BaseModel):
+    """A normalized (lowercase) template keyword and its usage count."""
+
+    __tablename__ = "keywords"
+
+    name: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    # Number of templates tagged with it, maintained by the keywords service
+    template_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, index=True
+    )
+
+
 class Template(BaseModel):
     """A meme template stored in the library."""
 
     __tablename__ = "templates"
 
+    # Keyset pagination: one index per listing order, ending with the id
+    __table_args__ = (
+        Index(
+            "ix_templates_popularity_created_at_id", "popularity", "created_at", "id"
+        ),
+        Index(
+            "ix_templates_creator_id_created_at_id", "creator_id", "created_at", "id"
+        ),
+    )
+
     name: Mapped[str] = mapped_column(String(255), nullable=False)
-    filename: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    # Storage key, shared by templates with the same image (see Blob)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
+    # Comma-joined as entered; indexed through Keyword / template_keywords
     keywords: Mapped[str] = mapped_column(Text, nullable=False, default="")
     popularity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     creator_id: Mapped[int | None] = mapped_column(
         ForeignKey("users.id"), nullable=True
     )
     text_layers: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
+    # Comma-joined widths of the generated WebP derivatives ("" = none yet)
+    thumbnail_widths: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    # 64-bit perceptual hash (dHash) as 16 hex digits; None until computed
+    dhash: Mapped[str | None] = mapped_column(String(16), nullable=True)
 
     creator: Mapped["User | None"] = relationship("User")
+
+
+class Blob(BaseModel):
+    """A stored template image and the number of templates using it.
+
+    Uploads are stored under a name derived from their SHA-256, so identical
+    images share one file. After its last template is deleted, the row stays
+    as a tombstone (refcount 0) until the file is (see the blob service).
+    """
+
+    __tablename__ = "blobs"
+
+    filename: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Derivatives to delete with the file, set by the last release
+    thumbnail_widths: Mapped[str] = mapped_column(Text, nullable=False, default="")
+
+
+class CatalogChange(BaseModel):
+    """One insert, update or delete of a template, written by DB triggers.
+
+    The highest id is the catalog version used by HTTP validators. Popularity
+    updates are not logged.
+    """
+
+    __tablename__ = "catalog_changes"
+    # Ids must never be reused, or a version could repeat after a delete
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    template_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+
+
+class PopularityFlush(BaseModel):
+    """One flush of buffered popularity increments, by any worker.
+
+    The highest id moves HTTP validators along with the catalog version, as
+    popularity counts and ordering are part of template reads. A trigger
+    keeps only the newest row.
+    """
+
+    __tablename__ = "popularity_flushes"
+    # Ids must never be reused, or a version could repeat after a delete
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class PrincipalChange(BaseModel):
+    """A change to what a user is allowed to do, written by DB triggers.
+
+    Role assignments and group memberships are logged by the user's ``sub``
+    so every worker evicts its cached principal (see the principals service).
+    """
+
+    __tablename__ = "principal_changes"
+    # Ids must never be reused, or a version could repeat after a delete
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    sub: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -28,7 +28,7 @@ def add_otel_context(
 
 def setup_otel(
     app: FastAPI,
-    engine: Engine,
+    engines: list[Engine],
     service_name: str,
     otlp_endpoint: str,
 ) -> None:
@@ -42,4 +42,4 @@ def setup_otel(
     trace.set_tracer_provider(provider)
 
     FastAPIInstrumentor.instrument_app(app)
-    SQLAlchemyInstrumentor().instrument(engine=engine)
+    SQLAlchemyInstrumentor().instrument(engines=engines)
@@ -0,0 +1,276 @@
+"""Rate limiting shared by every worker of a host, without Redis.
+
+slowapi keeps its counters in the storage named by ``RATE_LIMIT_STORAGE_URI``.
+Its default in-memory storage counts per process, so N workers let N times
+the limit through. ``SharedMemoryStorage`` (``shm://<path>``) keeps them in
+a small memory-mapped file instead: a fixed-size hash table whose slots hold
+a key hash and two window counters. Every worker maps the same file and
+updates it under an exclusive ``flock``, so a check costs a hash, a lock and
+a few struct reads (a few microseconds) and never blocks on I/O.
+
+Limits use the sliding window counter strategy: the previous window's count
+is weighted by how much of it still overlaps the sliding window. When a
+probe sequence is full, its stalest slot is recycled; a busy table may thus
+forget an idle client early, never count a request twice.
+
+``RateLimitMiddleware`` applies the default limit to the routes without a
+``@limiter.limit`` of their own, as plain ASGI: unlike slowapi's
+``BaseHTTPMiddleware`` it runs no extra task and does not wrap the
+response stream. The slowapi internals it relies on are in
+``src.slowapi_compat``.
+
+Limits count per client address, as uvicorn reports it: behind a proxy,
+uvicorn must trust the proxy's ``X-Forwarded-For`` (``FORWARDED_ALLOW_IPS``),
+or every client shares the proxy's limit.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from starlette.requests import Request
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.config import get_settings
+from src.slowapi_compat import (
+    check_default_limits,
+    freeze_default_limits,
+    uses_default_limits,
+)
+
+# key hash, stale after (epoch seconds), window number, current, previous
+_SLOT = struct.Struct("<QdqII")
+SLOTS = 1 << 16
+# Slots tried for one key before recycling the stalest of them
+_PROBES = 8
+
+
+def _key_hash(key: str) -> int:
+    # Stable across processes, unlike hash(); 0 marks an empty slot
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class _ProcessLock:
+    """Exclusive against the other threads, then the other processes."""
+
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+        # flock() is per process: threads of one worker would share it
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self) -> None:
+        self._thread_lock.acquire()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info: object) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport):
+    """``limits`` storage in a memory-mapped file shared by processes."""
+
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(
+        self, uri: str, wrap_exceptions: bool = False, **options: float | str | bool
+    ) -> None:
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = Path(uri.removeprefix("shm://"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = SLOTS * _SLOT.size
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = _ProcessLock(self._fd)
+
+    @property
+    def base_exceptions(self) -> type[Exception] | tuple[type[Exception], ...]:
+        return OSError
+
+    def _find(self, key_hash: int, now: float) -> tuple[int, tuple]:
+        """Offset and content of the slot of ``key_hash`` (caller locks).
+
+        A missing key gets an empty or stale slot of its probe sequence, else
+        the one going stale first; its content is then returned as empty.
+        """
+        first = key_hash % SLOTS
+        victim = first * _SLOT.size
+        victim_stale = float("inf")
+        for probe in range(_PROBES):
+            offset = ((first + probe) % SLOTS) * _SLOT.size
+            slot = _SLOT.unpack_from(self._map, offset)
+            if slot[0] == key_hash:
+                return offset, slot
+            stale_after = 0.0 if slot[0] == 0 or slot[1] <= now else slot[1]
+            if stale_after < victim_stale:
+                victim, victim_stale = offset, stale_after
+        return victim, (key_hash, 0.0, 0, 0, 0)
+
+    def _windows(
+        self, key_hash: int, expiry: int, now: float
+    ) -> tuple[int, int, int, int]:
+        """Offset, window number, previous and current counts (caller locks)."""
+        offset, (_, _, number, current, previous) = self._find(key_hash, now)
+        window = int(now // expiry)
+        if number != window:
+            previous = current if number == window - 1 else 0
+            current = 0
+        return offset, window, previous, current
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        key_hash = _key_hash(key)
+        now = time.time()
+        # Share of the previous window still inside the sliding one
+        overlap = 1 - (now % expiry) / expiry
+        with self._lock:
+            offset, window, previous, current = self._windows(key_hash, expiry, now)
+            if int(previous * overlap + current) + amount > limit:
+                return False
+            # Useless once the current window is no longer the previous one
+            stale_after = (window + 2) * expiry
+            _SLOT.pack_into(
+                self._map,
+                offset,
+                key_hash,
+                stale_after,
+                window,
+                current + amount,
+                previous,
+            )
+        return True
+
+    def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> tuple[int, float, int, float]:
+        now = time.time()
+        with self._lock:
+            _, _, previous, current = self._windows(_key_hash(key), expiry, now)
+        remaining = expiry - now % expiry
+        return previous, remaining if previous else 0.0, current, remaining + expiry
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.clear(key)
+
+    # Fixed window strategy: one counter reset ``expiry`` seconds after its
+    # first hit
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        key_hash = _key_hash(key)
+        now = time.time()
+        with self._lock:
+            offset, (_, stale_after, _, count, _) = self._find(key_hash, now)
+            if stale_after <= now:
+                count = 0
+                stale_after = now + expiry
+            count += amount
+            _SLOT.pack_into(self._map, offset, key_hash, stale_after, 0, count, 0)
+        return count
+
+    def get(self, key: str) -> int:
+        now = time.time()
+        with self._lock:
+            _, (_, stale_after, _, count, _) = self._find(_key_hash(key), now)
+        return count if stale_after > now else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._lock:
+            _, (_, stale_after, _, _, _) = self._find(_key_hash(key), now)
+        return max(stale_after, now)
+
+    def clear(self, key: str) -> None:
+        key_hash = _key_hash(key)
+        with self._lock:
+            offset, slot = self._find(key_hash, time.time())
+            if slot[0] == key_hash:
+                _SLOT.pack_into(self._map, offset, 0, 0.0, 0, 0, 0)
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def reset(self) -> int | None:
+        with self._lock:
+            self._map[:] = bytes(len(self._map))
+        return None
+
+
+_settings = get_settings()
+limiter = Limiter(
+    key_func=get_remote_address,
+    default_limits=[_settings.RATE_LIMIT],
+    storage_uri=_settings.RATE_LIMIT_STORAGE_URI,
+    strategy="sliding-window-counter",
+)
+freeze_default_limits(limiter)
+
+
+def _route_endpoint(routes: list[BaseRoute], scope: Scope) -> Callable | None:
+    """Endpoint of the route the router will pick, None for a mount or a 404."""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return getattr(route, "endpoint", None)
+    return None
+
+
+class RateLimitMiddleware:
+    """Default limit check, before routing: a 429 never reaches the route.
+
+    Uses the app's ``state.limiter``, like slowapi's decorator.
+    """
+
+    # Endpoints remembered per method and path. Paths holding an id may fill
+    # it; it then starts over.
+    MAX_CACHED_ENDPOINTS = 1024
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._endpoints: dict[tuple[str, str], Callable | None] = {}
+
+    def _endpoint(self, scope: Scope) -> Callable | None:
+        key = (scope["method"], scope["path"])
+        try:
+            return self._endpoints[key]
+        except KeyError:
+            pass
+        endpoint = _route_endpoint(scope["app"].routes, scope)
+        if len(self._endpoints) >= self.MAX_CACHED_ENDPOINTS:
+            self._endpoints.clear()
+        self._endpoints[key] = endpoint
+        return endpoint
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["app"].state.limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+        limiter = scope["app"].state.limiter
+        endpoint = self._endpoint(scope)
+        if not uses_default_limits(limiter, endpoint):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope, receive, send)
+        # The limiter sends no X-RateLimit headers, only the 429 response
+        error_response = await check_default_limits(
+            limiter, request, endpoint, scope["app"]
+        )
+        if error_response is not None:
+            await error_response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
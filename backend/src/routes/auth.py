@@ -10,8 +10,8 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 
 from src.config import get_settings
-from src.dependencies import SessionDep
-from src.services.users import get_effective_role, upsert_user
+from src.dependencies import AsyncSessionDep
+from src.services.users import aupsert_user, get_effective_role
 
 logger = structlog.get_logger(__name__)
 
@@ -55,7 +55,7 @@ async def login_endpoint(
 
 
 @router.get("/authorize", name="authorize_endpoint")
-async def authorize_endpoint(request: Request, db: SessionDep):
+async def authorize_endpoint(request: Request, db: AsyncSessionDep):
     nonce = request.session.pop("nonce", None)
     if not nonce:
         raise HTTPException(status_code=401, detail="Missing nonce")
@@ -66,7 +66,9 @@ async def authorize_endpoint(request: Request, db: SessionDep):
     email: str = data["email"]
     group_names: list[str] = data["groups"]
 
-    user = upsert_user(db, sub=sub, name=name, email=email, group_names=group_names)
+    user = await aupsert_user(
+        db, sub=sub, name=name, email=email, group_names=group_names
+    )
     logger.info("user.login", sub=sub, name=name, email=email)
 
     request.session["user"] = {
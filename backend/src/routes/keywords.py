@@ -0,0 +1,34 @@
+"""Template keywords (tags) endpoints."""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Query, Response
+from starlette.requests import Request
+
+from src import http_cache
+from src.dependencies import AsyncReadSessionDep
+from src.schemas.keyword import KeywordListResponse, KeywordResponse
+from src.services import keywords as keyword_service
+
+router = APIRouter(prefix="/keywords", tags=["keywords"])
+
+
+@router.get(path="", response_model=KeywordListResponse)
+async def list_keywords(
+    request: Request,
+    response: Response,
+    db: AsyncReadSessionDep,
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+):
+    """Most used tags with their template counts, for tag clouds and facets."""
+    not_modified = await http_cache.apublic_conditional(
+        request, response, db, request.url.path, limit
+    )
+    if not_modified is not None:
+        return not_modified
+    return KeywordListResponse(
+        keywords=[
+            KeywordResponse(name=k.name, count=k.template_count)
+            for k in await keyword_service.alist_keywords(db, limit=limit)
+        ]
+    )
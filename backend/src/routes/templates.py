@@ -4,27 +4,69 @@ import json
 from typing import Annotated
 
 import structlog
-from fastapi import APIRouter, Form, HTTPException, Query, UploadFile
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Form,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+)
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
 
+from src import http_cache
+from src.config import get_settings
 from src.dependencies import (
     ADMIN_ROLES,
+    AdminDep,
+    AsyncReadSessionDep,
+    AsyncSessionDep,
     CurrentUserDep,
     DiskDep,
-    SessionDep,
+    ReadSessionDep,
 )
+from src.exceptions import InvalidCursor, RenderQueueFull, RenderWorkerLost
 from src.models import Template
+from src.ratelimit import limiter
 from src.schemas.template import (
+    TemplateCreatedResponse,
+    TemplateFinalizeRequest,
     TemplateListResponse,
+    TemplateLookalikeListResponse,
+    TemplateLookalikeResponse,
+    TemplateRenderRequest,
     TemplateResponse,
+    TemplateSimilarListResponse,
+    TemplateSimilarResponse,
+    TemplateSuggestion,
+    TemplateSuggestResponse,
     TemplateTextLayerSchema,
+    TemplateThumbnailSchema,
     TemplateUpdateRequest,
+    TemplateUploadUrlRequest,
+    TemplateUploadUrlResponse,
 )
+from src.serialization import fragment_cache, list_body
+from src.services import render as render_service
+from src.services import similarity
 from src.services import templates as template_service
+from src.services import thumbnails as thumbnail_service
+from src.services.catalog import catalog_cache
+from src.services.embeddings import embedding_matrix
+from src.services.pagination import Page
+from src.services.render_cache import render_cache
+from src.services.suggest import suggest_index
 from src.storage.disk import StorageDisk
+from src.storage.s3 import S3Disk
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 logger = structlog.get_logger(__name__)
 
+# Routes taking an image are limited on their own, instead of RATE_LIMIT
+UPLOAD_RATE_LIMIT = get_settings().RATE_LIMIT_UPLOAD
+
 
 def _to_response(t: Template, disk: StorageDisk) -> TemplateResponse:
     try:
@@ -32,6 +74,24 @@ def _to_response(t: Template, disk: StorageDisk) -> TemplateResponse:
         text_layers = [TemplateTextLayerSchema(**layer) for layer in raw_layers]
     except Exception:
         text_layers = []
+    widths = thumbnail_service.parse_widths(t.thumbnail_widths)
+    thumbnails = [
+        TemplateThumbnailSchema(
+            url=disk.url(thumbnail_service.webp_path(t.filename, w)),
+            width=w,
+            format="webp",
+        )
+        for w in widths
+    ]
+    if widths:
+        fallback = thumbnail_service.fallback_width(widths)
+        thumbnails.append(
+            TemplateThumbnailSchema(
+                url=disk.url(thumbnail_service.fallback_path(t.filename, fallback)),
+                width=fallback,
+                format="jpeg",
+            )
+        )
     return TemplateResponse(
         id=t.id,
         name=t.name,
@@ -40,58 +100,302 @@ def _to_response(t: Template, disk: StorageDisk) -> TemplateResponse:
         popularity=t.popularity,
         created_at=t.created_at,
         text_layers=text_layers,
+        thumbnails=thumbnails,
+        srcset=", ".join(
+            f"{th.url} {th.width}w" for th in thumbnails if th.format == "webp"
+        ),
+    )
+
+
+def _to_similar(
+    matches: list[tuple[Template, int]], disk: StorageDisk
+) -> list[TemplateSimilarResponse]:
+    return [
+        TemplateSimilarResponse(**_to_response(t, disk).model_dump(), distance=distance)
+        for t, distance in matches
+    ]
+
+
+def _to_lookalikes(
+    matches: list[tuple[Template, float]], disk: StorageDisk
+) -> list[TemplateLookalikeResponse]:
+    return [
+        TemplateLookalikeResponse(**_to_response(t, disk).model_dump(), score=score)
+        for t, score in matches
+    ]
+
+
+def _require_image_search() -> None:
+    if not embedding_matrix.enabled:
+        raise HTTPException(status_code=404, detail="Image search is not enabled")
+
+
+def _json_response(content: bytes, response: Response) -> Response:
+    """Send pre-encoded JSON, keeping headers set on the injected response."""
+    return Response(
+        content=content, media_type="application/json", headers=response.headers
+    )
+
+
+def _to_list_response(page: Page, disk: StorageDisk, response: Response) -> Response:
+    # Same shape as TemplateListResponse, from cached per-template fragments
+    fragments = [
+        fragment_cache.get(t, lambda t: _to_response(t, disk)) for t in page.items
+    ]
+    return _json_response(
+        list_body(
+            "templates", fragments, total=page.total, next_cursor=page.next_cursor
+        ),
+        response,
     )
 
 
 @router.get(path="", response_model=TemplateListResponse)
-def list_templates(
-    db: SessionDep,
+async def list_templates(
+    request: Request,
+    response: Response,
+    db: AsyncReadSessionDep,
     disk: DiskDep,
     search: str | None = None,
+    tag: Annotated[list[str] | None, Query()] = None,
     limit: Annotated[int, Query(ge=1, le=100)] = 40,
     offset: Annotated[int, Query(ge=0)] = 0,
+    cursor: str | None = None,
+    include_total: bool = True,
 ):
-    templates, total = template_service.list_templates(
-        db, search=search, limit=limit, offset=offset
-    )
-    return TemplateListResponse(
-        templates=[_to_response(t, disk) for t in templates],
-        total=total,
+    not_modified = await http_cache.apublic_conditional(
+        request, response, db, request.url.query
     )
+    if not_modified is not None:
+        return not_modified
+    try:
+        page = await template_service.alist_templates(
+            db,
+            search=search,
+            tags=tag,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            include_total=include_total,
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from exc
+    return _to_list_response(page, disk, response)
 
 
 @router.get(path="/mine", response_model=TemplateListResponse)
-def list_user_templates(
-    db: SessionDep,
+async def list_user_templates(
+    request: Request,
+    response: Response,
+    db: AsyncReadSessionDep,
     disk: DiskDep,
     current_user: CurrentUserDep,
     limit: Annotated[int, Query(ge=1, le=100)] = 40,
     offset: Annotated[int, Query(ge=0)] = 0,
+    cursor: str | None = None,
+    include_total: bool = True,
 ):
-    templates, total = template_service.list_templates_by_creator(
-        db, current_user.id, limit=limit, offset=offset
+    etag, last_modified = http_cache.catalog_validators(
+        await db.run_sync(catalog_cache.version),
+        current_user.id,
+        request.url.query,
     )
-    return TemplateListResponse(
-        templates=[_to_response(t, disk) for t in templates],
-        total=total,
+    not_modified = http_cache.conditional(
+        request, response, etag, last_modified, http_cache.PRIVATE_POLICY
     )
+    if not_modified is not None:
+        return not_modified
+    try:
+        page = await template_service.alist_templates_by_creator(
+            db,
+            current_user.id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            include_total=include_total,
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from exc
+    return _to_list_response(page, disk, response)
+
+
+# Sync on purpose: a periodic index rebuild is CPU-bound and must not stall
+# the event loop
+@router.get(path="/suggest", response_model=TemplateSuggestResponse)
+def suggest_templates(
+    request: Request,
+    response: Response,
+    db: ReadSessionDep,
+    q: Annotated[str, Query(min_length=1, max_length=100)],
+    limit: Annotated[int, Query(ge=1, le=20)] = 8,
+):
+    """Typeahead: ids and names of the most popular templates matching ``q``."""
+    not_modified = http_cache.public_conditional(
+        request, response, db, request.url.path, request.url.query
+    )
+    if not_modified is not None:
+        return not_modified
+    return TemplateSuggestResponse(
+        suggestions=[
+            TemplateSuggestion(id=s.id, name=s.name)
+            for s in suggest_index.suggest(db, q, limit=limit)
+        ]
+    )
+
+
+@router.get(path="/render/stats", dependencies=[AdminDep])
+def render_cache_stats():
+    """Render cache counters for the worker that serves the request."""
+    return render_cache.snapshot()
 
 
 @router.get(path="/{template_id}", response_model=TemplateResponse)
-def get_template(
-    db: SessionDep,
+async def get_template(
+    request: Request,
+    response: Response,
+    db: AsyncReadSessionDep,
     disk: DiskDep,
     template_id: int,
 ):
-    template = template_service.get_template(db, template_id)
+    not_modified = await http_cache.apublic_conditional(
+        request, response, db, template_id
+    )
+    if not_modified is not None:
+        return not_modified
+    template = await db.run_sync(catalog_cache.get_template, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
-    return _to_response(template, disk)
+    return _json_response(
+        fragment_cache.get(template, lambda t: _to_response(t, disk)), response
+    )
+
+
+# Sync for the same reason as suggest_templates
+@router.get(path="/{template_id}/similar", response_model=TemplateSimilarListResponse)
+def similar_templates(
+    request: Request,
+    response: Response,
+    db: ReadSessionDep,
+    disk: DiskDep,
+    template_id: int,
+    max_distance: Annotated[int, Query(ge=0, le=similarity.MAX_DISTANCE)] = 10,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    """Templates whose image looks like this one's, most similar first."""
+    not_modified = http_cache.public_conditional(
+        request, response, db, request.url.path, request.url.query
+    )
+    if not_modified is not None:
+        return not_modified
+    template = catalog_cache.get_template(db, template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    matches = template_service.similar_templates(
+        db, template, max_distance=max_distance, limit=limit
+    )
+    return TemplateSimilarListResponse(templates=_to_similar(matches, disk))
 
 
-@router.post(path="", response_model=TemplateResponse, status_code=201)
-def upload_template(
-    db: SessionDep,
+# Sync: the scan of the embedding matrix is CPU-bound
+@router.get(
+    path="/{template_id}/similar-looking",
+    response_model=TemplateLookalikeListResponse,
+)
+def similar_looking_templates(
+    db: ReadSessionDep,
+    disk: DiskDep,
+    template_id: int,
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    """Templates with the closest colours and layout, most similar first."""
+    _require_image_search()
+    template = catalog_cache.get_template(db, template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    vector = embedding_matrix.get(template_id)
+    if vector is None:
+        return TemplateLookalikeListResponse(templates=[])
+    matches = template_service.lookalike_templates(
+        db, vector, limit=limit, exclude=template_id
+    )
+    return TemplateLookalikeListResponse(templates=_to_lookalikes(matches, disk))
+
+
+@router.post(path="/search-by-image", response_model=TemplateLookalikeListResponse)
+@limiter.limit(UPLOAD_RATE_LIMIT)
+async def search_by_image(
+    request: Request,
+    db: ReadSessionDep,
+    disk: DiskDep,
+    file: Annotated[UploadFile, Form()],
+    limit: Annotated[int, Query(ge=1, le=50)] = 20,
+):
+    """Templates that look like an uploaded image (which is not stored)."""
+    _require_image_search()
+    try:
+        matches = await template_service.asearch_by_image(db, file, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return TemplateLookalikeListResponse(templates=_to_lookalikes(matches, disk))
+
+
+@router.post(
+    path="/{template_id}/render",
+    response_class=Response,
+    responses={
+        200: {
+            "content": {
+                media_type: {}
+                for _, media_type, _ in render_service.OUTPUT_FORMATS.values()
+            }
+        }
+    },
+)
+async def render_template(
+    db: AsyncReadSessionDep,
+    disk: DiskDep,
+    template_id: int,
+    body: TemplateRenderRequest,
+):
+    template = await template_service.aget_template(db, template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    try:
+        content, cached = await render_service.render_template(
+            disk,
+            template.filename,
+            [layer.model_dump() for layer in body.text_layers],
+            body.format,
+            body.width,
+        )
+    except RenderQueueFull as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Render queue is full",
+            headers={"Retry-After": "1"},
+        ) from exc
+    except RenderWorkerLost as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Render worker was lost",
+            headers={"Retry-After": "1"},
+        ) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    _, media_type, _ = render_service.OUTPUT_FORMATS[body.format]
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"X-Render-Cache": "hit" if cached else "miss"},
+    )
+
+
+@router.post(path="", response_model=TemplateCreatedResponse, status_code=201)
+@limiter.limit(UPLOAD_RATE_LIMIT)
+async def upload_template(
+    request: Request,
+    db: AsyncSessionDep,
+    read_db: ReadSessionDep,
     disk: DiskDep,
     current_user: CurrentUserDep,
     name: Annotated[str, Form()],
@@ -100,7 +404,7 @@ def upload_template(
 ):
     keyword_list = [k.strip() for k in keywords.split(",") if k.strip()]
     try:
-        template: Template = template_service.create_template(
+        template: Template = await template_service.acreate_template(
             db,
             disk,
             name,
@@ -116,27 +420,103 @@ def upload_template(
         name=template.name,
         creator_id=current_user.id,
     )
+    # Uploads still succeed: the uploader decides whether to keep a duplicate
+    matches = await run_in_threadpool(
+        template_service.similar_templates, read_db, template
+    )
+    if matches:
+        logger.warning(
+            "template.near_duplicate",
+            template_id=template.id,
+            similar_ids=[t.id for t, _ in matches],
+        )
+    return TemplateCreatedResponse(
+        **_to_response(template, disk).model_dump(),
+        near_duplicates=_to_similar(matches, disk),
+    )
+
+
+@router.post(path="/upload-url", response_model=TemplateUploadUrlResponse)
+@limiter.limit(UPLOAD_RATE_LIMIT)
+def create_upload_url(
+    request: Request,
+    disk: DiskDep,
+    current_user: CurrentUserDep,
+    body: TemplateUploadUrlRequest,
+):
+    if not isinstance(disk, S3Disk):
+        raise HTTPException(status_code=404, detail="Direct uploads are not enabled")
+    settings = get_settings()
+    try:
+        upload = template_service.create_direct_upload(
+            disk,
+            current_user.id,
+            body.content_type,
+            secret=settings.SESSION_SECRET_KEY,
+            expires_in=settings.DIRECT_UPLOAD_EXPIRES,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return TemplateUploadUrlResponse(**upload)
+
+
+@router.post(path="/finalize", response_model=TemplateResponse, status_code=201)
+@limiter.limit(UPLOAD_RATE_LIMIT)
+async def finalize_upload(
+    request: Request,
+    db: AsyncSessionDep,
+    disk: DiskDep,
+    current_user: CurrentUserDep,
+    body: TemplateFinalizeRequest,
+    background_tasks: BackgroundTasks,
+):
+    if not isinstance(disk, S3Disk):
+        raise HTTPException(status_code=404, detail="Direct uploads are not enabled")
+    settings = get_settings()
+    try:
+        template = await template_service.finalize_direct_upload(
+            db,
+            disk,
+            body.token,
+            secret=settings.SESSION_SECRET_KEY,
+            max_age=settings.DIRECT_UPLOAD_EXPIRES,
+            user_id=current_user.id,
+            name=body.name,
+            keywords=body.keywords,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    background_tasks.add_task(
+        template_service.agenerate_thumbnails, disk, template.id, template.filename
+    )
+    logger.info(
+        "template.created",
+        template_id=template.id,
+        name=template.name,
+        creator_id=current_user.id,
+        direct=True,
+    )
     return _to_response(template, disk)
 
 
 @router.patch(path="/{template_id}", response_model=TemplateResponse)
-def update_template(
-    db: SessionDep,
+async def update_template(
+    db: AsyncSessionDep,
     disk: DiskDep,
     current_user: CurrentUserDep,
     template_id: int,
     body: TemplateUpdateRequest,
 ):
-    template = template_service.get_template(db, template_id)
+    template = await template_service.aget_template(db, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
-    is_admin = current_user.role is not None and current_user.role.name in ADMIN_ROLES
+    is_admin = current_user.effective_role in ADMIN_ROLES
     is_creator = template.creator_id == current_user.id
     if not is_admin and not is_creator:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    updated = template_service.update_template(
+    updated = await template_service.aupdate_template(
         db,
         template_id,
         name=body.name,
@@ -149,30 +529,34 @@ def update_template(
 
 
 @router.post(path="/{template_id}/popularity", status_code=204)
-def increment_popularity(
-    db: SessionDep,
+async def increment_popularity(
+    db: AsyncReadSessionDep,
     template_id: int,
 ):
-    if not template_service.increment_popularity(db, template_id):
+    # Only checks that the template exists: the increment is buffered
+    if not await template_service.aincrement_popularity(db, template_id):
         raise HTTPException(status_code=404, detail="Template not found")
 
 
 @router.delete(path="/{template_id}", status_code=204)
-def delete_template(
-    db: SessionDep,
+async def delete_template(
+    db: AsyncSessionDep,
     disk: DiskDep,
     current_user: CurrentUserDep,
     template_id: int,
+    background_tasks: BackgroundTasks,
 ):
-    template = template_service.get_template(db, template_id)
+    template = await template_service.aget_template(db, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
-    is_admin = current_user.role is not None and current_user.role.name in ADMIN_ROLES
+    is_admin = current_user.effective_role in ADMIN_ROLES
     is_creator = template.creator_id == current_user.id
     if not is_admin and not is_creator:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    if not template_service.delete_template(db, disk, template_id):
-        raise HTTPException(status_code=404, detail="Template not found")
+    if await template_service.adelete_template(db, template):
+        # After the response: the sweep waits on storage, holding the
+        # database write lock
+        background_tasks.add_task(template_service.asweep_blob, disk, template.filename)
     logger.info("template.deleted", template_id=template_id, actor_id=current_user.id)
@@ -0,0 +1,13 @@
+"""Pydantic schemas for keyword endpoints."""
+
+from pydantic import BaseModel
+
+
+class KeywordResponse(BaseModel):
+    name: str
+    # Number of templates tagged with it
+    count: int
+
+
+class KeywordListResponse(BaseModel):
+    keywords: list[KeywordResponse]
@@ -3,26 +3,61 @@
 from datetime import datetime
 from typing import Literal
 
-from pydantic import BaseModel, Field
+from PIL import ImageColor
+from pydantic import BaseModel, Field, field_validator
+
+# Layer geometry is in editor canvas pixels (600 wide): generous bounds that
+# keep a server-side render to a few megapixels per layer
+MAX_LAYER_OFFSET = 2400
+MAX_LAYER_SIZE = 1200
+MAX_FONT_SIZE = 200
+MAX_OUTLINE_WIDTH = 20
+MAX_TEXT_LENGTH = 200
+MAX_TEXT_LAYERS = 20
 
 
 class TemplateTextLayerSchema(BaseModel):
-    x: float
-    y: float
-    width: float
-    height: float
-    rotation: float = 0
-    fontSize: int = 36
-    fontFamily: str = "Impact"
-    color: str = "#ffffff"
-    outlineColor: str = "#000000"
-    outlineWidth: int = 2
+    x: float = Field(ge=-MAX_LAYER_OFFSET, le=MAX_LAYER_OFFSET)
+    y: float = Field(ge=-MAX_LAYER_OFFSET, le=MAX_LAYER_OFFSET)
+    width: float = Field(ge=0, le=MAX_LAYER_SIZE)
+    height: float = Field(ge=0, le=MAX_LAYER_SIZE)
+    rotation: float = Field(0, ge=-360, le=360)
+    fontSize: int = Field(36, ge=1, le=MAX_FONT_SIZE)
+    fontFamily: str = Field("Impact", max_length=64)
+    color: str = Field("#ffffff", max_length=64)
+    outlineColor: str = Field("#000000", max_length=64)
+    outlineWidth: int = Field(2, ge=0, le=MAX_OUTLINE_WIDTH)
     align: Literal["left", "center", "right"] = "center"
     verticalAlign: Literal["top", "middle", "bottom"] = "middle"
     bold: bool = False
     italic: bool = False
     allCaps: bool = False
 
+    @field_validator("color", "outlineColor")
+    @classmethod
+    def _check_color(cls, value: str) -> str:
+        # The renderer draws with Pillow: reject what it cannot parse
+        ImageColor.getrgb(value)
+        return value
+
+
+class RenderTextLayerSchema(TemplateTextLayerSchema):
+    text: str = Field("", max_length=MAX_TEXT_LENGTH)
+
+
+class TemplateRenderRequest(BaseModel):
+    text_layers: list[RenderTextLayerSchema] = Field(
+        default_factory=list, max_length=MAX_TEXT_LAYERS
+    )
+    format: Literal["jpeg", "png", "webp"] = "jpeg"
+    width: int = Field(600, ge=64, le=2048)
+
+
+class TemplateThumbnailSchema(BaseModel):
+    url: str
+    width: int
+    format: Literal["webp", "jpeg"]
+
 
 class TemplateResponse(BaseModel):
     id: int
@@ -32,16 +67,74 @@ class TemplateResponse(BaseModel):
     popularity: int
     created_at: datetime
     text_layers: list[TemplateTextLayerSchema]
+    thumbnails: list[TemplateThumbnailSchema] = []
+    # WebP derivatives as an <img srcset> value ("" until they are generated)
+    srcset: str = ""
 
     model_config = {"from_attributes": True}
 
 
+class TemplateSimilarResponse(TemplateResponse):
+    # Bits differing between the two image hashes (0: same picture)
+    distance: int
+
+
+class TemplateSimilarListResponse(BaseModel):
+    templates: list[TemplateSimilarResponse]
+
+
+class TemplateLookalikeResponse(TemplateResponse):
+    # Cosine similarity of the image embeddings (1: same picture)
+    score: float
+
+
+class TemplateLookalikeListResponse(BaseModel):
+    templates: list[TemplateLookalikeResponse]
+
+
+class TemplateCreatedResponse(TemplateResponse):
+    # Existing templates that look like the uploaded image
+    near_duplicates: list[TemplateSimilarResponse] = []
+
+
 class TemplateUpdateRequest(BaseModel):
     name: str = Field(..., min_length=1)
     keywords: list[str] = Field(..., min_length=1)
-    text_layers: list[TemplateTextLayerSchema] | None = None
+    text_layers: list[TemplateTextLayerSchema] | None = Field(
+        None, max_length=MAX_TEXT_LAYERS
+    )
 
 
 class TemplateListResponse(BaseModel):
     templates: list[TemplateResponse]
-    total: int
+    # Omitted on cursor pages and when include_total=false
+    total: int | None = None
+    # Opaque cursor of the next page, None on the last page
+    next_cursor: str | None = None
+
+
+class TemplateSuggestion(BaseModel):
+    id: int
+    name: str
+
+
+class TemplateSuggestResponse(BaseModel):
+    suggestions: list[TemplateSuggestion]
+
+
+class TemplateUploadUrlRequest(BaseModel):
+    content_type: str
+
+
+class TemplateUploadUrlResponse(BaseModel):
+    # Presigned POST: send ``fields`` then the file as ``file`` to ``url``
+    url: str
+    fields: dict[str, str]
+    token: str
+    expires_in: int
+
+
+class TemplateFinalizeRequest(BaseModel):
+    token: str
+    name: str = Field(..., min_length=1)
+    keywords: list[str] = Field(default_factory=list)
@@ -0,0 +1,86 @@
+"""Pre-serialized JSON for template responses.
+
+Building a ``TemplateResponse`` (JSON-decoding the text layers, validating
+each layer) and letting FastAPI validate and encode it again dominates the
+CPU time of list endpoints. Instead, each template's JSON is encoded once
+and cached, and list bodies are assembled by concatenating those fragments.
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from src.models import Template
+from src.services.catalog import catalog_cache
+
+
+def _source(template: Template) -> tuple:
+    """Every column a template response is built from."""
+    return (
+        template.name,
+        template.filename,
+        template.keywords,
+        template.popularity,
+        template.created_at,
+        template.text_layers,
+        template.thumbnail_widths,
+    )
+
+
+class FragmentCache:
+    """LRU of template id -> encoded response.
+
+    An entry is only served while the row it was built from still has the
+    same column values, which is a handful of string comparisons: stale
+    fragments cannot be served even if a row changes between its load and
+    an eviction. ``evict`` (subscribed to the catalog cache) frees memory.
+    """
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._entries: OrderedDict[int, tuple[tuple, bytes]] = OrderedDict()
+
+    def configure(self, max_entries: int) -> None:
+        with self._lock:
+            self._max_entries = max_entries
+            self._entries.clear()
+
+    def evict(self, ids: set[int] | None) -> None:
+        with self._lock:
+            if ids is None:
+                self._entries.clear()
+                return
+            for template_id in ids:
+                self._entries.pop(template_id, None)
+
+    def get(self, template: Template, build: Callable[[Template], BaseModel]) -> bytes:
+        source = _source(template)
+        with self._lock:
+            entry = self._entries.get(template.id)
+            if entry is not None and entry[0] == source:
+                self._entries.move_to_end(template.id)
+                return entry[1]
+        fragment = to_json(build(template))
+        if self._max_entries > 0:
+            with self._lock:
+                self._entries[template.id] = (source, fragment)
+                self._entries.move_to_end(template.id)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return fragment
+
+
+def list_body(key: str, fragments: list[bytes], **fields: object) -> bytes:
+    """``{"<key>": [<fragments>], **fields}`` without re-encoding fragments."""
+    body = b'{"' + key.encode() + b'":[' + b",".join(fragments) + b"]"
+    if fields:
+        body += b"," + to_json(fields)[1:-1]
+    return body + b"}"
+
+
+fragment_cache = FragmentCache()
+catalog_cache.subscribe(fragment_cache.evict)
@@ -0,0 +1,143 @@
+"""Blob service — content-addressed template images and their references.
+
+An uploaded image is stored under a name derived from its SHA-256, so the
+same picture uploaded many times is one file (one S3 object, one CDN cache
+entry). ``Blob.refcount`` counts the templates using a file; the file and
+its derivatives are deleted after the last one.
+
+Callers take a reference (``acquire``) in the transaction inserting the
+template and drop it (``release``) in the transaction deleting it. The last
+release leaves the row as a tombstone (refcount 0), and the template is
+deleted without waiting on storage. ``sweep`` then deletes the tombstone
+and the files in a transaction of their own, unless an upload took a
+reference again meanwhile: on SQLite the tombstone delete holds the write
+lock until the files are gone, so an upload acquiring the same blob
+concurrently sees it as new afterwards, and stores the files again. A
+tombstone whose sweep failed stays until ``sweep_all``. Both the upsert
+(SQLite ``ON CONFLICT``) and that locking argument are SQLite's, the only
+database the API runs on.
+"""
+
+import asyncio
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import ReturningDelete
+
+from src.models import Blob, Template
+from src.services import thumbnails as thumbnail_service
+from src.storage.disk import StorageDisk
+
+# Hex digits of the SHA-256 kept in the file name (128 bits)
+NAME_DIGITS = 32
+
+
+def blob_name(sha256: str, extension: str) -> str:
+    """Storage key of an image with this SHA-256 hex digest."""
+    return f"{sha256[:NAME_DIGITS]}{extension}"
+
+
+def acquire(db: Session, filename: str) -> bool:
+    """Add a reference to ``filename`` (not committed).
+
+    Returns True when it is the only one, i.e. the file may be missing.
+    """
+    refcount = db.scalar(
+        sqlite_insert(Blob)
+        .values(filename=filename, refcount=1)
+        .on_conflict_do_update(
+            index_elements=["filename"], set_={"refcount": Blob.refcount + 1}
+        )
+        .returning(Blob.refcount)
+    )
+    return refcount == 1
+
+
+def release(db: Session, filename: str, thumbnail_widths: str) -> bool:
+    """Drop a reference to ``filename`` (not committed).
+
+    Returns True when it was the last one: the caller sweeps the blob once
+    committed. ``thumbnail_widths`` are the derivatives to delete then.
+    """
+    refcount = db.scalar(
+        sqlite_insert(Blob)
+        .values(filename=filename, refcount=0, thumbnail_widths=thumbnail_widths)
+        .on_conflict_do_update(
+            index_elements=["filename"],
+            set_={
+                "refcount": Blob.refcount - 1,
+                "thumbnail_widths": thumbnail_widths,
+            },
+        )
+        .returning(Blob.refcount)
+    )
+    return refcount is not None and refcount <= 0
+
+
+def _claim_tombstone(filename: str) -> ReturningDelete[tuple[str]]:
+    return (
+        delete(Blob)
+        .where(Blob.filename == filename, Blob.refcount <= 0)
+        .returning(Blob.thumbnail_widths)
+    )
+
+
+def sweep(db: Session, disk: StorageDisk, filename: str) -> bool:
+    """Delete a tombstone and its files, if still unreferenced.
+
+    Returns True when the files were deleted.
+    """
+    widths = db.scalar(_claim_tombstone(filename))
+    if widths is None:
+        db.rollback()
+        return False
+    try:
+        disk.delete(filename)
+        thumbnail_service.delete(disk, filename, thumbnail_service.parse_widths(widths))
+    except Exception:
+        db.rollback()
+        raise
+    db.commit()
+    return True
+
+
+async def asweep(db: AsyncSession, disk: StorageDisk, filename: str) -> bool:
+    """Async ``sweep``."""
+    widths = await db.scalar(_claim_tombstone(filename))
+    if widths is None:
+        await db.rollback()
+        return False
+    try:
+        await asyncio.gather(
+            disk.adelete(filename),
+            thumbnail_service.adelete(
+                disk, filename, thumbnail_service.parse_widths(widths)
+            ),
+        )
+    except Exception:
+        await db.rollback()
+        raise
+    await db.commit()
+    return True
+
+
+def sweep_all(db: Session, disk: StorageDisk) -> int:
+    """Sweep every tombstone, e.g. those of failed sweeps; return the count."""
+    filenames = db.scalars(select(Blob.filename).where(Blob.refcount <= 0)).all()
+    # End the read transaction: upgrading it to a write could fail at once
+    db.rollback()
+    return sum(sweep(db, disk, filename) for filename in filenames)
+
+
+def sibling(db: Session, filename: str) -> Template | None:
+    """A template using ``filename`` whose derivatives are built, if any.
+
+    Its derivative widths and image hash hold for every template of the blob.
+    """
+    return db.scalar(
+        select(Template)
+        .where(Template.filename == filename, Template.thumbnail_widths != "")
+        .limit(1)
+    )
@@ -0,0 +1,179 @@
+"""Catalog version — a cheap signal, shared by every process, that templates
+changed.
+
+Triggers on ``templates`` append to ``catalog_changes`` (see migration
+f7a8b9c0d1e2); the newest row is the current version. Another trigger keeps
+only the newest 10000 rows (migration e2f3a4b5c6d7). Popularity is not
+logged: the version also carries the id of the newest popularity flush
+(migration a4b5c6d7e8f9), which HTTP validators include.
+
+The triggers only exist on SQLite: on another database the version would
+never move, so the app refuses to start there (``require_change_triggers``).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from src.models import CatalogChange, PopularityFlush, Template
+
+
+def require_change_triggers(engine: Engine) -> None:
+    """Raise ``RuntimeError`` unless the change log triggers can exist."""
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError(
+            f"{engine.dialect.name} is not supported: the catalog version and"
+            " the principal cache rely on SQLite triggers"
+        )
+
+
+class CatalogVersion(NamedTuple):
+    version: int
+    # Of the newest change or popularity flush
+    changed_at: datetime | None
+    popularity: int = 0
+
+
+def current_version(db: Session) -> CatalogVersion:
+    change = (
+        db.query(CatalogChange.id, CatalogChange.created_at)
+        .order_by(CatalogChange.id.desc())
+        .first()
+    )
+    flush = (
+        db.query(PopularityFlush.id, PopularityFlush.created_at)
+        .order_by(PopularityFlush.id.desc())
+        .first()
+    )
+    changed_at = max(
+        (row.created_at for row in (change, flush) if row is not None), default=None
+    )
+    return CatalogVersion(
+        change.id if change is not None else 0,
+        changed_at,
+        flush.id if flush is not None else 0,
+    )
+
+
+def changed_since(db: Session, version: int, limit: int) -> set[int] | None:
+    """Ids of templates changed after ``version``; None if more than ``limit``."""
+    rows = (
+        db.query(CatalogChange.template_id)
+        .filter(CatalogChange.id > version)
+        .order_by(CatalogChange.id)
+        .limit(limit + 1)
+        .all()
+    )
+    if len(rows) > limit:
+        return None
+    return {row.template_id for row in rows}
+
+
+class CatalogCache:
+    """Per-worker read-through cache of templates, coherent across workers.
+
+    Every worker polls the catalog version at most once per
+    ``check_interval`` seconds and evicts the templates changed since the
+    version it last saw, so a stale read is bounded by one check. The worker
+    that writes a template evicts it at once (``invalidate``). Popularity is
+    not in the change log, so entries also expire after ``ttl`` seconds.
+    Other per-template caches subscribe to the same evictions.
+    """
+
+    # Above this many changes since the last check, drop everything instead.
+    # Must stay below the rows the log keeps (migration e2f3a4b5c6d7).
+    MAX_TRACKED_CHANGES = 1000
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._max_entries = 0
+        self._ttl = 0.0
+        self._check_interval = 0.0
+        self._catalog: CatalogVersion | None = None
+        self._checked_at = 0.0
+        self._entries: OrderedDict[int, tuple[float, Template]] = OrderedDict()
+        self._listeners: list[Callable[[set[int] | None], None]] = []
+
+    def configure(self, max_entries: int, ttl: float, check_interval: float) -> None:
+        with self._lock:
+            self._max_entries = max_entries
+            self._ttl = ttl
+            self._check_interval = check_interval
+            self._catalog = None
+            self._entries.clear()
+
+    def subscribe(self, listener: Callable[[set[int] | None], None]) -> None:
+        """Call ``listener`` with changed template ids (None: everything)."""
+        self._listeners.append(listener)
+
+    def invalidate(self, template_id: int) -> None:
+        """Evict a template this worker just committed, and check the version
+        on the next read (other workers follow the change log)."""
+        with self._lock:
+            self._entries.pop(template_id, None)
+            self._checked_at = float("-inf")
+            if self._catalog is not None:
+                # A copy: a read that started before the commit compares its
+                # version by identity, so it will not cache the old row
+                self._catalog = CatalogVersion(*self._catalog)
+        for listener in self._listeners:
+            listener({template_id})
+
+    def version(self, db: Session) -> CatalogVersion:
+        """Current catalog version, checking the database at most once per
+        interval and applying the evictions it implies."""
+        now = time.monotonic()
+        known = self._catalog
+        if known is not None and now - self._checked_at < self._check_interval:
+            return known
+        catalog = current_version(db)
+        changed: set[int] | None = set()
+        if known is None or catalog.version < known.version:
+            changed = None
+        elif catalog.version != known.version:
+            changed = changed_since(db, known.version, self.MAX_TRACKED_CHANGES)
+        with self._lock:
+            # Evicting and moving the version together means a row loaded
+            # under the old version is never cached after its eviction
+            if changed is None:
+                self._entries.clear()
+            else:
+                for template_id in changed:
+                    self._entries.pop(template_id, None)
+            self._catalog = catalog
+            self._checked_at = now
+        if changed is None or changed:
+            for listener in self._listeners:
+                listener(changed)
+        return catalog
+
+    def get_template(self, db: Session, template_id: int) -> Template | None:
+        """Read-only template: the returned object is shared, never modify it."""
+        catalog = self.version(db)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(template_id)
+            if entry is not None and now - entry[0] < self._ttl:
+                self._entries.move_to_end(template_id)
+                return entry[1]
+        template = db.get(Template, template_id)
+        if template is None:
+            return None
+        # Detach it so it outlives the request session
+        db.expunge(template)
+        with self._lock:
+            if self._max_entries > 0 and self._catalog is catalog:
+                self._entries[template_id] = (now, template)
+                self._entries.move_to_end(template_id)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return template
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,157 @@
+"""Visual embeddings — a feature vector per template in a memory-mapped matrix.
+
+A template image is summed up in 128 numbers: a 64-bin colour histogram
+(4 levels per RGB channel, square-rooted) and its 8x8 grey thumbnail
+(mean-centred), each scaled to unit length and weighted equally. Vectors
+are unit length, so a dot product is their cosine similarity: 1 for the
+same picture, about 0.5 for images sharing either palette or layout only.
+
+All vectors live in one flat little-endian float32 file, row ``n`` holding
+template ``n`` (zeros: no vector). Rows are written in place with
+``pwrite`` and read through a read-only ``mmap``. Every worker of a host
+maps the same file, so the kernel page cache holds a single copy of the
+matrix (512 bytes per template) however many workers there are, and
+their writes are visible to each other at once. The file is local to the
+host: with several hosts, each keeps its own, filled by
+``manage.py templates backfill-embeddings``.
+"""
+
+import io
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+from sqlalchemy.engine import URL
+
+from src.database import database_engine
+
+DIMENSIONS = 128
+_DTYPE = np.dtype("<f4")
+ROW_BYTES = DIMENSIONS * _DTYPE.itemsize
+# Colour levels per RGB channel of the histogram (4**3 = 64 bins)
+_LEVELS = 4
+_LAYOUT_SIZE = 8
+# Equal weight for palette and layout, so the whole vector has unit length
+_PART_WEIGHT = np.float32(np.sqrt(0.5))
+
+
+def embed(content: bytes) -> np.ndarray:
+    """Unit feature vector of an encoded image.
+
+    Raises ``ValueError`` if ``content`` is not a decodable image.
+    """
+    try:
+        img = Image.open(io.BytesIO(content))
+        # JPEG decodes straight at a fraction of the size
+        img.draft("RGB", (64, 64))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ValueError("Invalid image file") from exc
+    small = img.resize((32, 32), Image.Resampling.BOX)
+
+    levels = np.asarray(small, dtype=np.uint8) // (256 // _LEVELS)
+    bins = (levels[..., 0].astype(np.intp) * _LEVELS + levels[..., 1]) * _LEVELS
+    bins += levels[..., 2]
+    counts = np.bincount(bins.ravel(), minlength=_LEVELS**3)
+    # Square roots of frequencies summing to 1: already unit length
+    palette = np.sqrt(counts / counts.sum(), dtype=np.float32)
+
+    grey = small.convert("L").resize((_LAYOUT_SIZE, _LAYOUT_SIZE), Image.Resampling.BOX)
+    layout = np.asarray(grey, dtype=np.float32).ravel()
+    layout -= layout.mean()
+    norm = np.linalg.norm(layout)
+    if norm > 0:
+        layout /= norm
+
+    vector = np.concatenate([palette, layout]) * _PART_WEIGHT
+    # A flat grey image has no layout part: keep the palette at unit length
+    return (vector / np.linalg.norm(vector)).astype(_DTYPE)
+
+
+def default_path(database_url: URL) -> Path | None:
+    """Matrix file next to a SQLite database file, None for other databases."""
+    name = database_url.database
+    if database_url.get_backend_name() != "sqlite" or name in (None, "", ":memory:"):
+        return None
+    database = Path(name)
+    return database.with_name(f"{database.stem}.embeddings")
+
+
+class EmbeddingMatrix:
+    def __init__(self, path: Path | None) -> None:
+        # None: image search is disabled
+        self._path = path
+        self._lock = threading.Lock()
+        # Read-only map of the whole file, replaced when the file grows
+        self._matrix = np.zeros((0, DIMENSIONS), dtype=_DTYPE)
+
+    @property
+    def enabled(self) -> bool:
+        return self._path is not None
+
+    def _write(self, template_id: int, row: bytes) -> None:
+        if self._path is None:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._path, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            # Writing past the end grows the file, the gap reads as zeros
+            os.pwrite(fd, row, template_id * ROW_BYTES)
+        finally:
+            os.close(fd)
+
+    def put(self, template_id: int, vector: np.ndarray) -> None:
+        """Store the vector of a template (no-op when disabled)."""
+        self._write(template_id, vector.astype(_DTYPE).tobytes())
+
+    def remove(self, template_id: int) -> None:
+        """Forget the vector of a deleted template."""
+        if template_id < len(self._rows()):
+            self._write(template_id, bytes(ROW_BYTES))
+
+    def _rows(self) -> np.ndarray:
+        """The current matrix, remapped if another writer grew the file."""
+        if self._path is None:
+            return self._matrix
+        try:
+            rows = self._path.stat().st_size // ROW_BYTES
+        except FileNotFoundError:
+            rows = 0
+        with self._lock:
+            if rows > len(self._matrix):
+                self._matrix = np.memmap(
+                    self._path, dtype=_DTYPE, mode="r", shape=(rows, DIMENSIONS)
+                )
+            return self._matrix
+
+    def get(self, template_id: int) -> np.ndarray | None:
+        """Vector of a template, None if it has none."""
+        rows = self._rows()
+        if template_id >= len(rows) or not rows[template_id].any():
+            return None
+        return np.array(rows[template_id])
+
+    def nearest(
+        self, vector: np.ndarray, limit: int = 20, exclude: int | None = None
+    ) -> list[tuple[int, float]]:
+        """``(template id, cosine similarity)`` of the closest vectors."""
+        rows = self._rows()
+        # One pass over the mapped matrix: 4 bytes x 128 per template
+        scores = rows @ vector.astype(_DTYPE)
+        if exclude is not None and exclude < len(scores):
+            scores[exclude] = -np.inf
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        # Empty rows (gaps, deleted templates) score exactly 0
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+
+_configured_path = os.environ.get("EMBEDDINGS_PATH", "")
+embedding_matrix = EmbeddingMatrix(
+    Path(_configured_path) if _configured_path else default_path(database_engine.url)
+)
@@ -0,0 +1,141 @@
+"""Bulk import — parallel storage uploads, batched inserts, resumable runs.
+
+Images are stored content-addressed (see the blob service), so a file
+stored by a run that crashed before its batch was committed is found again
+(not re-uploaded, not orphaned) by the next run. A picture already used by
+a template, or listed twice, is skipped as a duplicate. Finished entries
+are appended to a checkpoint file after each commit, so a rerun skips them
+without reading their files.
+"""
+
+import hashlib
+import io
+import json
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.models import Template
+from src.services import blobs as blob_service
+from src.services import embeddings as embedding_service
+from src.services import keywords as keyword_service
+from src.services import similarity
+from src.services import thumbnails as thumbnail_service
+from src.services import uploads as upload_service
+from src.services.embeddings import embedding_matrix
+from src.services.templates import EXTENSION_MAP
+from src.storage.disk import StorageDisk
+
+
+class ImportEntry(NamedTuple):
+    title: str
+    filename: str
+    keywords: list[str]
+
+
+class StoredImage(NamedTuple):
+    entry: ImportEntry
+    sha256: str
+    stored_name: str
+    widths: list[int]
+    dhash: int
+    # None when image search is disabled
+    vector: np.ndarray | None
+
+
+def read_entries(data_file: Path) -> list[ImportEntry]:
+    """Entries of a ``load-samples`` style JSON file."""
+    return [
+        ImportEntry(
+            title=item["title"],
+            filename=item["filename"],
+            keywords=item.get("keywords", "").split(","),
+        )
+        for item in json.loads(data_file.read_text())
+    ]
+
+
+def store_image(disk: StorageDisk, entry: ImportEntry, path: Path) -> StoredImage:
+    """Validate an image and upload it with its derivatives (thread-safe).
+
+    The original is saved last and skipped when already on the disk: its
+    presence means an earlier run stored everything. Raises ``ValueError``
+    for unsupported or oversized images.
+    """
+    content = path.read_bytes()
+    content_type = upload_service.sniff_content_type(
+        content[: upload_service.SNIFF_SIZE]
+    )
+    if content_type is None:
+        raise ValueError("Unsupported file type")
+    upload_service.check_header(content, content_type)
+
+    sha256 = hashlib.sha256(content).hexdigest()
+    stored_name = blob_service.blob_name(sha256, EXTENSION_MAP[content_type])
+    widths, derivatives = thumbnail_service.generate(content)
+    dhash = similarity.dhash(content)
+    vector = embedding_service.embed(content) if embedding_matrix.enabled else None
+    if not disk.exists(stored_name):
+        thumbnail_service.save(disk, stored_name, derivatives)
+        disk.save(stored_name, io.BytesIO(content))
+    return StoredImage(entry, sha256, stored_name, widths, dhash, vector)
+
+
+def insert_batch(db: Session, images: list[StoredImage]) -> list[StoredImage]:
+    """Insert one template per new image and commit; return the duplicates.
+
+    An image is a duplicate when a template already uses its file (an
+    earlier run) or an earlier image of ``images`` has the same content.
+    """
+    names = {image.stored_name for image in images}
+    taken = set(
+        db.scalars(select(Template.filename).where(Template.filename.in_(names)))
+    )
+    duplicates = []
+    inserted: list[tuple[Template, StoredImage]] = []
+    for image in images:
+        if image.stored_name in taken:
+            duplicates.append(image)
+            continue
+        taken.add(image.stored_name)
+        template = Template(
+            name=image.entry.title,
+            filename=image.stored_name,
+            thumbnail_widths=",".join(str(w) for w in image.widths),
+            dhash=similarity.to_hex(image.dhash),
+        )
+        db.add(template)
+        keyword_service.set_keywords(db, template, image.entry.keywords)
+        blob_service.acquire(db, image.stored_name)
+        inserted.append((template, image))
+    db.commit()
+    for template, image in inserted:
+        if image.vector is not None:
+            embedding_matrix.put(template.id, image.vector)
+    return duplicates
+
+
+class Checkpoint:
+    """Append-only JSON-lines log of the entries a run has finished."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.done: set[str] = set()
+        if path.exists():
+            with path.open() as f:
+                self.done = {json.loads(line)["filename"] for line in f if line.strip()}
+
+    def record(self, images: Iterable[StoredImage]) -> None:
+        """Mark entries finished; durable once this returns."""
+        with self.path.open("a") as f:
+            for image in images:
+                line = {"filename": image.entry.filename, "sha256": image.sha256}
+                f.write(json.dumps(line) + "\n")
+                self.done.add(image.entry.filename)
+            f.flush()
+            os.fsync(f.fileno())
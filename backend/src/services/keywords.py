@@ -0,0 +1,132 @@
+"""Keyword service — normalized keyword index and tag counts.
+
+``Template.keywords`` keeps the comma-joined keywords as entered (responses
+and full-text search read it). Every write of it goes through
+``set_keywords``, which also maintains the ``template_keywords`` rows and
+the ``Keyword.template_count`` of each tag, so tag filters and tag clouds
+are index lookups. Keywords are created with SQLite's ``INSERT ... ON
+CONFLICT``: like the rest of the API, this service assumes SQLite.
+"""
+
+from collections.abc import Iterable
+
+from sqlalchemy import ColumnElement, Select, delete, insert, literal, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.models import Keyword, Template, template_keywords
+
+
+def normalize(name: str) -> str:
+    """Tag form of a keyword: trimmed and lowercased."""
+    return name.strip().lower()
+
+
+def _tags(keywords: str) -> set[str]:
+    return {tag for k in keywords.split(",") if (tag := normalize(k))}
+
+
+def _current_tags(db: Session, template_id: int) -> set[str]:
+    return set(
+        db.scalars(
+            select(Keyword.name)
+            .join(template_keywords, template_keywords.c.keyword_id == Keyword.id)
+            .where(template_keywords.c.template_id == template_id)
+        )
+    )
+
+
+def _add_tags(db: Session, template_id: int, tags: set[str]) -> None:
+    # Another writer may create the same keyword concurrently
+    db.execute(
+        sqlite_insert(Keyword)
+        .values([{"name": tag, "template_count": 0} for tag in sorted(tags)])
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    db.execute(
+        insert(template_keywords).from_select(
+            ["template_id", "keyword_id"],
+            select(literal(template_id), Keyword.id).where(Keyword.name.in_(tags)),
+        )
+    )
+    db.execute(
+        update(Keyword)
+        .where(Keyword.name.in_(tags))
+        .values(template_count=Keyword.template_count + 1)
+    )
+
+
+def _remove_tags(db: Session, template_id: int, tags: set[str]) -> None:
+    keyword_ids = select(Keyword.id).where(Keyword.name.in_(tags))
+    db.execute(
+        delete(template_keywords).where(
+            template_keywords.c.template_id == template_id,
+            template_keywords.c.keyword_id.in_(keyword_ids),
+        )
+    )
+    db.execute(
+        update(Keyword)
+        .where(Keyword.name.in_(tags))
+        .values(template_count=Keyword.template_count - 1)
+    )
+
+
+def set_keywords(db: Session, template: Template, keywords: Iterable[str]) -> None:
+    """Set the keywords of ``template`` and sync its tags (not committed).
+
+    Flushes, so a new template gets its id.
+    """
+    template.keywords = ",".join(k.strip() for k in keywords if k.strip())
+    db.flush()
+    wanted = _tags(template.keywords)
+    current = _current_tags(db, template.id)
+    if added := wanted - current:
+        _add_tags(db, template.id, added)
+    if removed := current - wanted:
+        _remove_tags(db, template.id, removed)
+
+
+def clear_keywords(db: Session, template_id: int) -> None:
+    """Untag a template before it is deleted (not committed)."""
+    if current := _current_tags(db, template_id):
+        _remove_tags(db, template_id, current)
+
+
+async def aset_keywords(
+    db: AsyncSession, template: Template, keywords: Iterable[str]
+) -> None:
+    """Async ``set_keywords``."""
+    await db.run_sync(lambda session: set_keywords(session, template, keywords))
+
+
+async def aclear_keywords(db: AsyncSession, template_id: int) -> None:
+    """Async ``clear_keywords``."""
+    await db.run_sync(clear_keywords, template_id)
+
+
+def tag_filter(tag: str) -> ColumnElement[bool]:
+    """Condition on ``Template`` matching templates tagged ``tag`` exactly."""
+    return Template.id.in_(
+        select(template_keywords.c.template_id)
+        .join(Keyword, Keyword.id == template_keywords.c.keyword_id)
+        .where(Keyword.name == normalize(tag))
+    )
+
+
+def _top_keywords(limit: int) -> Select:
+    return (
+        select(Keyword)
+        .where(Keyword.template_count > 0)
+        .order_by(Keyword.template_count.desc(), Keyword.name)
+        .limit(limit)
+    )
+
+
+def list_keywords(db: Session, limit: int = 50) -> list[Keyword]:
+    """Most used tags first."""
+    return list(db.scalars(_top_keywords(limit)))
+
+
+async def alist_keywords(db: AsyncSession, limit: int = 50) -> list[Keyword]:
+    return list(await db.scalars(_top_keywords(limit)))
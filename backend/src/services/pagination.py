@@ -0,0 +1,135 @@
+"""Keyset pagination helpers.
+
+A listing is ordered by sort keys ending with a unique column, and its cursor
+encodes the key values of the last row of a page. The next page is a range
+scan starting right after that row, so it costs the same at any depth.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from typing import Any, NamedTuple
+
+from sqlalchemy import ColumnElement, Row, Select, and_, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import QueryableAttribute, Session
+
+from src.exceptions import InvalidCursor
+
+
+class SortKey(NamedTuple):
+    expr: ColumnElement[Any] | QueryableAttribute[Any]
+    descending: bool = True
+
+
+class Page(NamedTuple):
+    items: list
+    # None when not requested: counting costs O(matches) on every call
+    total: int | None
+    # None on the last page
+    next_cursor: str | None
+
+
+def encode_cursor(values: list[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor() from exc
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(isinstance(v, int | float | str) for v in values)
+    ):
+        raise InvalidCursor()
+    return values
+
+
+def _after(keys: list[SortKey], values: list[Any]) -> ColumnElement[bool]:
+    """Rows strictly after ``values`` in the order given by ``keys``."""
+    if len({key.descending for key in keys}) == 1:
+        # A row value comparison lets the database seek a composite index
+        lhs = tuple_(*(key.expr for key in keys))
+        rhs = tuple_(*values)
+        return lhs < rhs if keys[0].descending else lhs > rhs
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [k.expr == v for k, v in zip(keys[:i], values[:i], strict=True)]
+        step = key.expr < values[i] if key.descending else key.expr > values[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def _page_statement(
+    statement: Select,
+    keys: list[SortKey],
+    limit: int,
+    offset: int,
+    cursor: str | None,
+) -> Select:
+    labels = [key.expr.label(f"sort_{i}") for i, key in enumerate(keys)]
+    page = statement.add_columns(*labels).order_by(
+        *(
+            label.desc() if key.descending else label.asc()
+            for label, key in zip(labels, keys, strict=True)
+        )
+    )
+    if cursor is not None:
+        page = page.where(_after(keys, decode_cursor(cursor, len(keys))))
+    elif offset:
+        page = page.offset(offset)
+    # One extra row tells whether there is a next page without counting
+    return page.limit(limit + 1)
+
+
+def _to_page(rows: Sequence[Row], limit: int, total: int | None) -> Page:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(list(rows[-1][1:]))
+    return Page([row[0] for row in rows], total, next_cursor)
+
+
+def paginate(
+    db: Session,
+    statement: Select,
+    keys: list[SortKey],
+    limit: int,
+    offset: int = 0,
+    cursor: str | None = None,
+    count: Select | None = None,
+) -> Page:
+    """Fetch one page of ``statement`` (selecting one entity) ordered by ``keys``.
+
+    With a ``cursor`` the page starts after the row it encodes and ``offset``
+    is ignored. ``count`` is only run for the first page of a cursor walk.
+    """
+    rows = db.execute(_page_statement(statement, keys, limit, offset, cursor)).all()
+    total = None
+    if count is not None and cursor is None:
+        total = db.scalar(count)
+    return _to_page(rows, limit, total)
+
+
+async def apaginate(
+    db: AsyncSession,
+    statement: Select,
+    keys: list[SortKey],
+    limit: int,
+    offset: int = 0,
+    cursor: str | None = None,
+    count: Select | None = None,
+) -> Page:
+    """Async ``paginate``."""
+    page = _page_statement(statement, keys, limit, offset, cursor)
+    rows = (await db.execute(page)).all()
+    total = None
+    if count is not None and cursor is None:
+        total = await db.scalar(count)
+    return _to_page(rows, limit, total)
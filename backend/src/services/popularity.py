@@ -0,0 +1,111 @@
+"""Write-behind aggregation of template popularity increments.
+
+Opening a meme only bumps an in-memory counter. A background task flushes the
+counters of each API worker in one transaction of relative
+``popularity = popularity + n`` updates, so workers never overwrite each
+other's counts and the endpoint never waits on the SQLite writer lock. Each
+flush also logs a ``popularity_flushes`` row, which moves HTTP validators.
+"""
+
+import asyncio
+import contextlib
+import threading
+from collections import Counter
+
+import structlog
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from src.database import SessionLocal
+from src.models import PopularityFlush, Template
+
+logger = structlog.get_logger(__name__)
+
+_increment = (
+    update(Template)
+    .where(Template.id == bindparam("template_id"))
+    .values(popularity=Template.popularity + bindparam("increment"))
+)
+
+
+class PopularityBuffer:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Counter[int] = Counter()
+        self._pending = 0
+        self._flush_interval = 0.0
+        self._max_pending = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def add(self, template_id: int) -> None:
+        """Record one increment. Safe to call from any thread."""
+        with self._lock:
+            self._counts[template_id] += 1
+            self._pending += 1
+            full = self._pending >= self._max_pending
+        if full and self._loop is not None and self._wake is not None:
+            # Flush early instead of letting the buffer grow until the tick
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def flush(self, db: Session) -> int:
+        """Write the buffered increments in one transaction; return the count."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._pending = 0
+        if not counts:
+            return 0
+        try:
+            # Core executemany on the connection: an ORM update() given a
+            # parameter list would switch to bulk update by primary key.
+            db.connection().execute(
+                _increment,
+                [{"template_id": tid, "increment": n} for tid, n in counts.items()],
+            )
+            db.connection().execute(insert(PopularityFlush))
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Keep the increments for the next attempt
+            with self._lock:
+                self._counts.update(counts)
+                self._pending += counts.total()
+            raise
+        return counts.total()
+
+    def _flush_now(self) -> None:
+        with SessionLocal() as db:
+            self.flush(db)
+
+    async def _run(self, wake: asyncio.Event) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(wake.wait(), timeout=self._flush_interval)
+            wake.clear()
+            try:
+                await run_in_threadpool(self._flush_now)
+            except Exception:
+                logger.exception("popularity.flush_failed")
+
+    def start(self, flush_interval: float, max_pending: int) -> None:
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(self._wake))
+
+    async def stop(self) -> None:
+        """Stop the flush task and drain whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self._loop = None
+        self._wake = None
+        await run_in_threadpool(self._flush_now)
+
+
+popularity_buffer = PopularityBuffer()
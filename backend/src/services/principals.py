@@ -0,0 +1,165 @@
+"""Principal cache — who the logged-in user is, without a query per request.
+
+``get_current_user`` needs the user's id and roles on every authenticated
+request. Each worker keeps them as immutable ``Principal`` snapshots keyed
+by the OIDC ``sub``. Entries expire after ``ttl`` seconds and are evicted:
+
+- at once in the worker that changed them (``upsert_user``, ``assign_role``);
+- in every other worker within ``check_interval`` seconds, from the
+  ``principal_changes`` log that triggers on users, groups and memberships
+  append to (see migration d1e2f3a4b5c6).
+
+In the steady state an authenticated request runs no query at all: the log
+is polled at most once per interval per worker, not per request. A trigger
+keeps only its newest 10000 rows (migration f3a4b5c6d7e8).
+
+The triggers only exist on SQLite: elsewhere a revoked role would stay
+cached until the TTL, so the app refuses to start there
+(``catalog.require_change_triggers``).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from src.models import Group, PrincipalChange, User
+
+
+class Principal(NamedTuple):
+    """Read-only snapshot of an authenticated user."""
+
+    id: int
+    sub: str
+    # Role given to the user itself, and those of its groups
+    role: str | None
+    group_roles: tuple[str, ...]
+
+    @property
+    def effective_role(self) -> str | None:
+        """Same rule as ``users.get_effective_role``."""
+        if self.role is not None:
+            return self.role
+        return self.group_roles[0] if self.group_roles else None
+
+
+def load_principal(db: Session, sub: str) -> Principal | None:
+    user = db.scalar(
+        select(User)
+        .options(
+            selectinload(User.role),
+            selectinload(User.groups).selectinload(Group.role),
+        )
+        .where(User.sub == sub)
+    )
+    if user is None:
+        return None
+    return Principal(
+        id=user.id,
+        sub=user.sub,
+        role=user.role.name if user.role else None,
+        group_roles=tuple(g.role.name for g in user.groups if g.role),
+    )
+
+
+class PrincipalCache:
+    # Above this many changes since the last check, drop everything instead.
+    # Must stay below the rows the log keeps (migration f3a4b5c6d7e8).
+    MAX_TRACKED_CHANGES = 1000
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._max_entries = 0
+        self._ttl = 0.0
+        self._check_interval = 0.0
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+
+    def configure(self, max_entries: int, ttl: float, check_interval: float) -> None:
+        with self._lock:
+            self._max_entries = max_entries
+            self._ttl = ttl
+            self._check_interval = check_interval
+            self._version = None
+            self._entries.clear()
+
+    def invalidate(self, sub: str) -> None:
+        """Evict ``sub`` from this worker (others follow the change log)."""
+        with self._lock:
+            self._entries.pop(sub, None)
+
+    def _cached(self, sub: str, now: float) -> Principal | None:
+        """A fresh entry, unless the change log is due for a check."""
+        with self._lock:
+            if self._version is None or now - self._checked_at >= self._check_interval:
+                return None
+            entry = self._entries.get(sub)
+            if entry is None or now - entry[0] >= self._ttl:
+                return None
+            self._entries.move_to_end(sub)
+            return entry[1]
+
+    def _check(self, db: Session, now: float) -> int:
+        """Apply the change log; returns the version it was read at."""
+        with self._lock:
+            known = self._version
+            if known is not None and now - self._checked_at < self._check_interval:
+                return known
+        version = db.scalar(select(func.max(PrincipalChange.id))) or 0
+        changed: set[str] | None = set()
+        if known is None or version < known:
+            changed = None
+        elif version != known:
+            rows = db.scalars(
+                select(PrincipalChange.sub)
+                .where(PrincipalChange.id > known)
+                .limit(self.MAX_TRACKED_CHANGES + 1)
+            ).all()
+            changed = None if len(rows) > self.MAX_TRACKED_CHANGES else set(rows)
+        with self._lock:
+            if changed is None:
+                self._entries.clear()
+            else:
+                for sub in changed:
+                    self._entries.pop(sub, None)
+            self._version = version
+            self._checked_at = now
+        return version
+
+    def get(self, db: Session, sub: str) -> Principal | None:
+        """The principal of ``sub``, None for an unknown user (not cached)."""
+        now = time.monotonic()
+        principal = self._cached(sub, now)
+        if principal is not None:
+            return principal
+        version = self._check(db, now)
+        with self._lock:
+            entry = self._entries.get(sub)
+            if entry is not None and now - entry[0] < self._ttl:
+                return entry[1]
+        principal = load_principal(db, sub)
+        if principal is None:
+            return None
+        with self._lock:
+            # Not if the log moved on meanwhile: the row may predate a change
+            if self._max_entries > 0 and self._version == version:
+                self._entries[sub] = (now, principal)
+                self._entries.move_to_end(sub)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return principal
+
+    async def aget(self, db: AsyncSession, sub: str) -> Principal | None:
+        """Async ``get``; a cache hit does not touch the session."""
+        principal = self._cached(sub, time.monotonic())
+        if principal is not None:
+            return principal
+        return await db.run_sync(self.get, sub)
+
+
+principal_cache = PrincipalCache()
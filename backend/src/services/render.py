@@ -0,0 +1,325 @@
+"""Render service — composites text layers onto a template image.
+
+Drawing is CPU-bound, so it runs in a bounded pool of worker processes instead
+of the event loop or Starlette's threadpool. Layer coordinates are expressed in
+the editor's canvas space (``CANVAS_WIDTH`` pixels wide), exactly like the
+browser-side ``downloadMeme``.
+"""
+
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import structlog
+from PIL import Image, ImageDraw, ImageFont
+
+from src.exceptions import RenderQueueFull, RenderWorkerLost
+from src.services.render_cache import cache_key, render_cache
+from src.storage import active_disk
+from src.storage.disk import StorageDisk
+
+logger = structlog.get_logger(__name__)
+
+CANVAS_WIDTH = 600
+
+# format -> (Pillow format, media type, encoder options)
+OUTPUT_FORMATS: dict[str, tuple[str, str, dict]] = {
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 90}),
+    "png": ("PNG", "image/png", {"compress_level": 3}),
+    "webp": ("WEBP", "image/webp", {"quality": 85, "method": 4}),
+}
+
+# Largest text layer image drawn (128 MB of RGBA); the request schema keeps
+# layers well below it, this only bounds what slips through
+MAX_LAYER_PIXELS = 32_000_000
+
+# Decoded, resized template images kept per worker process
+_BASE_CACHE_SIZE = 16
+_base_cache: OrderedDict[tuple[str, int], Image.Image] = OrderedDict()
+
+
+@lru_cache(maxsize=128)
+def _load_font(
+    family: str, size: int, bold: bool, italic: bool, font_dir: str
+) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    suffix = ("Bold" if bold else "") + ("Italic" if italic else "")
+    names = [f"{family}-{suffix}", f"{family} {suffix}"] if suffix else []
+    names.append(family)
+    for name in names:
+        for candidate in (os.path.join(font_dir, name), name) if font_dir else (name,):
+            try:
+                return ImageFont.truetype(f"{candidate}.ttf", size)
+            except OSError:
+                continue
+    return ImageFont.load_default(size)
+
+
+def _load_base(key: str, path: str, source: bytes | None, width: int) -> Image.Image:
+    base = _base_cache.get((key, width))
+    if base is not None:
+        _base_cache.move_to_end((key, width))
+        return base
+    if source is None:
+        with active_disk.open(path) as f:
+            source = f.read()
+    with Image.open(io.BytesIO(source)) as img:
+        img.draft("RGB", (width, width * img.height // img.width))
+        height = max(1, round(img.height * width / img.width))
+        base = img.convert("RGBA").resize((width, height), Image.Resampling.LANCZOS)
+    _base_cache[(key, width)] = base
+    if len(_base_cache) > _BASE_CACHE_SIZE:
+        _base_cache.popitem(last=False)
+    return base
+
+
+def _draw_layer(canvas: Image.Image, layer: dict, scale: float, font_dir: str):
+    text = layer.get("text", "")
+    if not text:
+        return
+    if layer["allCaps"]:
+        text = text.upper()
+
+    width = layer["width"] * scale
+    height = layer["height"] * scale
+    font_size = max(1, round(layer["fontSize"] * scale))
+    stroke = round(layer["outlineWidth"] * scale)
+    font = _load_font(
+        layer["fontFamily"], font_size, layer["bold"], layer["italic"], font_dir
+    )
+
+    # Anchor mirrors the canvas textAlign / textBaseline="top" placement
+    tx = {"left": 0, "center": width / 2, "right": width}[layer["align"]]
+    ty = {
+        "top": 0,
+        "middle": (height - font_size) / 2,
+        "bottom": height - font_size,
+    }[layer["verticalAlign"]]
+    anchor = {"left": "la", "center": "ma", "right": "ra"}[layer["align"]]
+
+    # Text may overflow its box, so size the layer image around the box centre
+    # to cover both the box and the text bounds before rotating it.
+    probe = ImageDraw.Draw(canvas)
+    left, top, right, bottom = probe.textbbox(
+        (tx, ty), text, font=font, anchor=anchor, stroke_width=stroke
+    )
+    half_w = max(width / 2, abs(left - width / 2), abs(right - width / 2)) + 1
+    half_h = max(height / 2, abs(top - height / 2), abs(bottom - height / 2)) + 1
+    size = (round(half_w * 2), round(half_h * 2))
+    if size[0] * size[1] > MAX_LAYER_PIXELS:
+        raise ValueError("Text layer is too large to render")
+    overlay = Image.new("RGBA", size)
+    offset_x = half_w - width / 2
+    offset_y = half_h - height / 2
+    ImageDraw.Draw(overlay).text(
+        (tx + offset_x, ty + offset_y),
+        text,
+        font=font,
+        anchor=anchor,
+        fill=layer["color"],
+        stroke_width=stroke,
+        stroke_fill=layer["outlineColor"],
+    )
+
+    if layer["rotation"]:
+        # Canvas rotation is clockwise, Pillow's is counter-clockwise
+        overlay = overlay.rotate(
+            -layer["rotation"], resample=Image.Resampling.BICUBIC, expand=True
+        )
+    center_x = (layer["x"] + layer["width"] / 2) * scale
+    center_y = (layer["y"] + layer["height"] / 2) * scale
+    canvas.alpha_composite(
+        overlay,
+        dest=(
+            max(0, round(center_x - overlay.width / 2)),
+            max(0, round(center_y - overlay.height / 2)),
+        ),
+        source=(
+            max(0, round(overlay.width / 2 - center_x)),
+            max(0, round(overlay.height / 2 - center_y)),
+        ),
+    )
+
+
+def render_meme(
+    key: str,
+    path: str,
+    layers: list[dict],
+    fmt: str,
+    width: int,
+    font_dir: str = "",
+    source: bytes | None = None,
+) -> bytes:
+    """Draw ``layers`` on the template image and encode it. Runs in a worker.
+
+    ``key`` (the image digest) names the decoded image in the worker's
+    cache. On a miss the image is ``source`` if the caller already had its
+    bytes, else it is read from ``path`` on the active disk.
+
+    Raises ``ValueError`` for a layer Pillow cannot draw.
+    """
+    canvas = _load_base(key, path, source, width).copy()
+    scale = width / CANVAS_WIDTH
+    for layer in layers:
+        _draw_layer(canvas, layer, scale, font_dir)
+
+    pil_format, _, options = OUTPUT_FORMATS[fmt]
+    out = io.BytesIO()
+    if pil_format == "JPEG":
+        canvas = canvas.convert("RGB")
+    canvas.save(out, format=pil_format, **options)
+    return out.getvalue()
+
+
+def _warmup() -> None:
+    """No-op task used to spawn worker processes ahead of the first render."""
+
+
+class RenderPool:
+    """Bounded process pool with a cap on queued renders.
+
+    A worker dying (killed for memory, crashed in Pillow) breaks the whole
+    executor: the renders it held fail with ``RenderWorkerLost`` and the
+    pool starts new workers for the next ones.
+    """
+
+    def __init__(self) -> None:
+        self._executor: ProcessPoolExecutor | None = None
+        self._max_workers = 0
+        self._max_pending = 0
+        self._pending = 0
+        self._font_dir = ""
+
+    def _spawn(self) -> ProcessPoolExecutor:
+        # "spawn" keeps the workers free of the parent's threads and sockets
+        executor = ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        for _ in range(self._max_workers):
+            executor.submit(_warmup)
+        return executor
+
+    def start(self, max_workers: int, max_pending: int, font_dir: str = "") -> None:
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._font_dir = font_dir
+        self._executor = self._spawn()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def render(
+        self,
+        key: str,
+        path: str,
+        layers: list[dict],
+        fmt: str,
+        width: int,
+        source: bytes | None = None,
+    ) -> bytes:
+        if self._executor is None:
+            raise RuntimeError("Render pool is not started")
+        if self._pending >= self._max_pending:
+            raise RenderQueueFull()
+        executor = self._executor
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor,
+                render_meme,
+                key,
+                path,
+                layers,
+                fmt,
+                width,
+                self._font_dir,
+                source,
+            )
+        except BrokenProcessPool as exc:
+            # Renders failing together replace the executor once
+            if self._executor is executor:
+                logger.warning("render.pool_broken")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._spawn()
+            raise RenderWorkerLost() from exc
+        finally:
+            self._pending -= 1
+
+
+render_pool = RenderPool()
+
+
+# Template filename -> sha256 of its image. Filenames are never reused, so
+# entries never go stale; the bound only caps memory.
+_SOURCE_DIGESTS_SIZE = 4096
+_source_digests: OrderedDict[str, str] = OrderedDict()
+
+# Cache key -> in-flight render, so concurrent identical misses render once
+_inflight: dict[str, asyncio.Future[bytes]] = {}
+
+
+def remember_source_digest(filename: str, digest: str) -> None:
+    _source_digests[filename] = digest
+    if len(_source_digests) > _SOURCE_DIGESTS_SIZE:
+        _source_digests.popitem(last=False)
+
+
+async def _read_source(disk: StorageDisk, path: str) -> tuple[bytes, str]:
+    async with disk.aopen(path) as f:
+        source = await f.read()
+    return source, hashlib.sha256(source).hexdigest()
+
+
+async def _render_and_store(
+    key: str,
+    digest: str,
+    filename: str,
+    layers: list[dict],
+    fmt: str,
+    width: int,
+    source: bytes | None,
+) -> bytes:
+    content = await render_pool.render(digest, filename, layers, fmt, width, source)
+    await render_cache.put(key, content)
+    return content
+
+
+async def render_template(
+    disk: StorageDisk, filename: str, layers: list[dict], fmt: str, width: int
+) -> tuple[bytes, bool]:
+    """Return the rendered image and whether it was served from the cache.
+
+    The image bytes only leave this process when they had to be read here
+    for their digest; otherwise the worker reads them itself, if its cache
+    of decoded images misses.
+    """
+    source = None
+    digest = _source_digests.get(filename)
+    if digest is None:
+        source, digest = await _read_source(disk, filename)
+        remember_source_digest(filename, digest)
+
+    key = cache_key(digest, layers, fmt, width)
+    content = await render_cache.get(key)
+    if content is not None:
+        return content, True
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending), False
+    task = asyncio.ensure_future(
+        _render_and_store(key, digest, filename, layers, fmt, width, source)
+    )
+    _inflight[key] = task
+    try:
+        return await asyncio.shield(task), False
+    finally:
+        _inflight.pop(key, None)
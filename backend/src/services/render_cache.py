@@ -0,0 +1,245 @@
+"""Content-addressed cache for rendered memes.
+
+Entries are keyed by a hash of the template image digest, the canonical layer
+list, the output format and width. Two LRU tiers: encoded bytes in memory, and
+files on local disk shared by every worker of the node.
+
+The disk budget holds for the directory, not per worker. Every write adds
+its size to a counter in a ``usage`` file, under an exclusive ``flock``. The
+write that takes it over budget rescans the directory and deletes the least
+recently used files (a hit touches the mtime) down to ``DISK_TRIM_TO`` of
+the budget, then stores the real total. Files removed by hand are thus
+accounted for at the next trim.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+# Bump when the drawing code changes so stale renders are not served
+RENDER_VERSION = 1
+
+# Share of the disk budget left after a trim, so trims stay infrequent
+DISK_TRIM_TO = 0.9
+_USAGE = struct.Struct("<q")
+
+
+@dataclass
+class RenderCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    memory_evictions: int = 0
+    disk_evictions: int = 0
+
+
+def cache_key(source_digest: str, layers: list[dict], fmt: str, width: int) -> str:
+    canonical = json.dumps(layers, sort_keys=True, separators=(",", ":"))
+    payload = f"{RENDER_VERSION}\0{source_digest}\0{fmt}\0{width}\0{canonical}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _LRU:
+    """Size-bounded LRU index of key -> entry size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.total = 0
+        self.entries: OrderedDict[str, int] = OrderedDict()
+
+    def touch(self, key: str) -> bool:
+        if key not in self.entries:
+            return False
+        self.entries.move_to_end(key)
+        return True
+
+    def add(self, key: str, size: int) -> list[str]:
+        """Record an entry and return the keys evicted to stay under budget."""
+        self.discard(key)
+        self.entries[key] = size
+        self.total += size
+        evicted = []
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            old_key, old_size = self.entries.popitem(last=False)
+            self.total -= old_size
+            evicted.append(old_key)
+        return evicted
+
+    def discard(self, key: str) -> None:
+        size = self.entries.pop(key, None)
+        if size is not None:
+            self.total -= size
+
+
+class RenderCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._memory = _LRU(0)
+        self._memory_data: dict[str, bytes] = {}
+        self._disk_root: Path | None = None
+        self._disk_max_bytes = 0
+        # Threads of this worker, then other workers (flock is per process)
+        self._disk_lock = threading.Lock()
+        self._usage_fd: int | None = None
+        self.stats = RenderCacheStats()
+
+    def configure(
+        self, memory_max_bytes: int, disk_root: Path | None, disk_max_bytes: int
+    ) -> None:
+        self._memory = _LRU(memory_max_bytes)
+        self._memory_data.clear()
+        if self._usage_fd is not None:
+            os.close(self._usage_fd)
+            self._usage_fd = None
+        self._disk_root = disk_root if disk_max_bytes > 0 else None
+        self._disk_max_bytes = disk_max_bytes
+        if self._disk_root is not None:
+            self._disk_root.mkdir(parents=True, exist_ok=True)
+            self._usage_fd = os.open(
+                self._disk_root / "usage", os.O_RDWR | os.O_CREAT, 0o600
+            )
+            # The real total: files may have been removed, or the budget lowered
+            self._add_disk_usage(self._disk_root, 0, rescan=True)
+
+    @staticmethod
+    def _disk_path(root: Path, key: str) -> Path:
+        return root / key[:2] / key
+
+    @contextlib.contextmanager
+    def _locked_usage(self, fd: int) -> Iterator[None]:
+        with self._disk_lock:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _disk_usage(self) -> int:
+        fd = self._usage_fd
+        if fd is None:
+            return 0
+        data = os.pread(fd, _USAGE.size, 0)
+        return _USAGE.unpack(data)[0] if len(data) == _USAGE.size else 0
+
+    def _add_disk_usage(self, root: Path, size: int, rescan: bool = False) -> None:
+        """Count ``size`` more bytes on disk, trimming the directory if over."""
+        fd = self._usage_fd
+        if fd is None:
+            return
+        with self._locked_usage(fd):
+            total = self._disk_usage() + size
+            if rescan or total > self._disk_max_bytes:
+                total = self._trim_disk(root)
+            os.pwrite(fd, _USAGE.pack(total), 0)
+
+    def _trim_disk(self, root: Path) -> int:
+        """Delete the oldest files down to the trim target; return the total."""
+        files = []
+        for directory in os.scandir(root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                # Skip temporary files of writes in progress
+                if "." in entry.name:
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if total <= self._disk_max_bytes:
+            return total
+        target = self._disk_max_bytes * DISK_TRIM_TO
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.stats.disk_evictions += evicted
+        return total
+
+    def _get_memory(self, key: str) -> bytes | None:
+        with self._lock:
+            if not self._memory.touch(key):
+                return None
+            self.stats.memory_hits += 1
+            return self._memory_data[key]
+
+    def _put_memory(self, key: str, content: bytes) -> None:
+        if len(content) > self._memory.max_bytes:
+            return
+        with self._lock:
+            self._memory_data[key] = content
+            for old_key in self._memory.add(key, len(content)):
+                del self._memory_data[old_key]
+                self.stats.memory_evictions += 1
+
+    def _get_disk(self, key: str) -> bytes | None:
+        root = self._disk_root
+        if root is None:
+            return None
+        path = self._disk_path(root, key)
+        try:
+            content = path.read_bytes()
+            # Recency for the trim
+            os.utime(path)
+        except FileNotFoundError:
+            # Trimmed (or never written)
+            return None
+        with self._lock:
+            self.stats.disk_hits += 1
+        return content
+
+    def _put_disk(self, key: str, content: bytes) -> None:
+        root = self._disk_root
+        if root is None:
+            return
+        path = self._disk_path(root, key)
+        path.parent.mkdir(exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(content)
+        tmp.replace(path)
+        self._add_disk_usage(root, len(content))
+
+    async def get(self, key: str) -> bytes | None:
+        content = self._get_memory(key)
+        if content is not None:
+            return content
+        content = await run_in_threadpool(self._get_disk, key)
+        if content is not None:
+            self._put_memory(key, content)
+            return content
+        with self._lock:
+            self.stats.misses += 1
+        return None
+
+    async def put(self, key: str, content: bytes) -> None:
+        self._put_memory(key, content)
+        await run_in_threadpool(self._put_disk, key, content)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "memory_bytes": self._memory.total,
+                "memory_entries": len(self._memory.entries),
+                # Of the whole directory, as of the last write
+                "disk_bytes": self._disk_usage(),
+            }
+
+
+render_cache = RenderCache()
@@ -0,0 +1,161 @@
+"""Near-duplicate detection — perceptual hashes in a multi-index hash table.
+
+Each template image gets a 64-bit difference hash (dHash): the image is
+shrunk to 9x8 grey pixels and every bit says whether a pixel is darker than
+its right neighbour. Re-encoding, resizing or light edits flip only a few
+bits, so near-duplicates are hashes within a small Hamming distance.
+
+The per-worker index splits hashes into four 16-bit chunks, with one hash
+table per chunk. Two hashes within distance ``d`` agree on some chunk up to
+``d // 4`` bits (pigeonhole), so a query only checks the templates whose
+chunks are that close to its own: a few hundred table lookups and about as
+many candidates at a million templates, instead of a scan.
+"""
+
+import io
+import itertools
+import threading
+from functools import cache
+
+from PIL import Image, ImageOps
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.models import Template
+from src.services.catalog import catalog_cache
+
+CHUNKS = 4
+CHUNK_BITS = 16
+_CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# Largest distance a query may ask for (at most 3 bits off per chunk)
+MAX_DISTANCE = 15
+# Distance under which an upload is reported as a likely duplicate
+DUPLICATE_DISTANCE = 6
+_COLUMNS = select(Template.id, Template.dhash).where(Template.dhash.is_not(None))
+
+
+def dhash(content: bytes) -> int:
+    """64-bit difference hash of an encoded image.
+
+    Raises ``ValueError`` if ``content`` is not a decodable image.
+    """
+    try:
+        img = Image.open(io.BytesIO(content))
+        # JPEG decodes straight at a fraction of the size
+        img.draft("L", (64, 64))
+        img = ImageOps.exif_transpose(img).convert("L")
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ValueError("Invalid image file") from exc
+    pixels = img.resize((9, 8), Image.Resampling.BOX).tobytes()
+    value = 0
+    for row in range(0, 72, 9):
+        for col in range(row, row + 8):
+            value = (value << 1) | (pixels[col] < pixels[col + 1])
+    return value
+
+
+def to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def from_hex(value: str) -> int:
+    return int(value, 16)
+
+
+@cache
+def _flip_masks(bits: int) -> tuple[int, ...]:
+    """Every chunk XOR mask with at most ``bits`` bits set."""
+    return tuple(
+        sum(1 << i for i in positions)
+        for n in range(bits + 1)
+        for positions in itertools.combinations(range(CHUNK_BITS), n)
+    )
+
+
+def _chunks(value: int) -> list[int]:
+    return [(value >> (i * CHUNK_BITS)) & _CHUNK_MASK for i in range(CHUNKS)]
+
+
+class SimilarityIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hashes: dict[int, int] = {}
+        # One table per chunk: chunk value -> ids of the templates having it
+        self._tables: list[dict[int, list[int]]] = [{} for _ in range(CHUNKS)]
+        # Templates to reload on the next query (None: rebuild everything)
+        self._dirty: set[int] | None = None
+
+    def invalidate(self, ids: set[int] | None) -> None:
+        """Catalog cache listener: reload these templates on the next query."""
+        with self._lock:
+            if ids is None or self._dirty is None:
+                self._dirty = None
+            else:
+                self._dirty |= ids
+
+    def _add(self, template_id: int, value: int) -> None:
+        self._hashes[template_id] = value
+        for table, chunk in zip(self._tables, _chunks(value), strict=True):
+            table.setdefault(chunk, []).append(template_id)
+
+    def _remove(self, template_id: int) -> None:
+        value = self._hashes.pop(template_id, None)
+        if value is None:
+            return
+        for table, chunk in zip(self._tables, _chunks(value), strict=True):
+            bucket = table[chunk]
+            bucket.remove(template_id)
+            if not bucket:
+                del table[chunk]
+
+    def _refresh(self, db: Session) -> None:
+        # Caller holds the lock
+        if self._dirty is None:
+            self._hashes = {}
+            self._tables = [{} for _ in range(CHUNKS)]
+            for template_id, value in db.execute(_COLUMNS):
+                self._add(template_id, from_hex(value))
+        elif self._dirty:
+            for template_id in self._dirty:
+                self._remove(template_id)
+            rows = db.execute(_COLUMNS.where(Template.id.in_(self._dirty)))
+            for template_id, value in rows:
+                self._add(template_id, from_hex(value))
+        self._dirty = set()
+
+    def near(
+        self,
+        db: Session,
+        value: int,
+        max_distance: int = DUPLICATE_DISTANCE,
+        limit: int = 20,
+        exclude: int | None = None,
+    ) -> list[tuple[int, int]]:
+        """``(template id, distance)`` of the closest hashes, nearest first."""
+        if not 0 <= max_distance <= MAX_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {MAX_DISTANCE}")
+        masks = _flip_masks(max_distance // CHUNKS)
+        # Applies the change log, calling invalidate() (outside our lock)
+        catalog_cache.version(db)
+        with self._lock:
+            self._refresh(db)
+            candidates: set[int] = set()
+            for table, chunk in zip(self._tables, _chunks(value), strict=True):
+                for mask in masks:
+                    if bucket := table.get(chunk ^ mask):
+                        candidates.update(bucket)
+            if exclude is not None:
+                candidates.discard(exclude)
+            hashes = self._hashes
+            matches = [
+                (distance, template_id)
+                for template_id in candidates
+                if (distance := (hashes[template_id] ^ value).bit_count())
+                <= max_distance
+            ]
+        matches.sort()
+        return [(template_id, distance) for distance, template_id in matches[:limit]]
+
+
+similarity_index = SimilarityIndex()
+catalog_cache.subscribe(similarity_index.invalidate)
@@ -0,0 +1,217 @@
+"""Typeahead suggestions from a per-worker prefix index.
+
+Template names and keywords are split into normalized words (casefolded,
+accents stripped) kept in a sorted array; the words starting with a prefix
+are a contiguous run found by bisection, so a suggestion never touches the
+database. The index is updated from the catalog change log (only the
+changed templates are reloaded) and rebuilt every ``refresh_interval`` to
+pick up popularity, which the change log does not track. A rebuild scans the
+table outside the lock and swaps the new index in: queries keep using the
+current one meanwhile.
+"""
+
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from typing import NamedTuple
+
+from sqlalchemy import Row, select
+from sqlalchemy.orm import Session
+
+from src.models import Template
+from src.services.catalog import catalog_cache
+
+_WORD = re.compile(r"\w+")
+_MAX_CHAR = chr(0x10FFFF)
+_COLUMNS = select(Template.id, Template.name, Template.keywords, Template.popularity)
+
+
+def normalize_words(text: str) -> list[str]:
+    """Casefolded, accent-free words of ``text``."""
+    text = text.casefold()
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _WORD.findall(text)
+
+
+class Suggestion(NamedTuple):
+    id: int
+    name: str
+
+
+# Word -> (-popularity, -id) keys of its templates, sorted
+_Postings = dict[str, list[tuple[int, int]]]
+
+
+class _Entry(NamedTuple):
+    name: str
+    popularity: int
+    words: frozenset[str]
+
+
+def _index(
+    postings: _Postings,
+    entries: dict[int, _Entry],
+    row: Row,
+    sort: bool,
+) -> list[str]:
+    """Index a template row; return the words it adds to ``postings``."""
+    template_id, name, keywords, popularity = row
+    words = frozenset(normalize_words(f"{name} {keywords.replace(',', ' ')}"))
+    entries[template_id] = _Entry(name, popularity, words)
+    key = (-popularity, -template_id)
+    new_words = []
+    for word in words:
+        word_postings = postings.get(word)
+        if word_postings is None:
+            word_postings = postings[word] = []
+            new_words.append(word)
+        if sort:
+            insort(word_postings, key)
+        else:
+            word_postings.append(key)
+    return new_words
+
+
+def _build(db: Session) -> tuple[list[str], _Postings, dict[int, _Entry]]:
+    """Words, postings and entries of every template."""
+    postings: _Postings = {}
+    entries: dict[int, _Entry] = {}
+    for row in db.execute(_COLUMNS):
+        _index(postings, entries, row, sort=False)
+    for word_postings in postings.values():
+        word_postings.sort()
+    return sorted(postings), postings, entries
+
+
+class SuggestIndex:
+    def __init__(self, refresh_interval: float = 300.0) -> None:
+        self._lock = threading.Lock()
+        self._refresh_interval = refresh_interval
+        self._built_at: float | None = None
+        # Distinct words, sorted, and the templates containing each as
+        # (-popularity, -id) keys: most popular (then newest) first
+        self._words: list[str] = []
+        self._postings: _Postings = {}
+        self._entries: dict[int, _Entry] = {}
+        # Templates to reload on the next query (None: rebuild everything)
+        self._dirty: set[int] | None = set()
+        # A query is building a new index, outside the lock
+        self._rebuilding = False
+
+    def configure(self, refresh_interval: float) -> None:
+        with self._lock:
+            self._refresh_interval = refresh_interval
+            self._built_at = None
+
+    def invalidate(self, ids: set[int] | None) -> None:
+        """Catalog cache listener: reload these templates on the next query."""
+        with self._lock:
+            if ids is None or self._dirty is None:
+                self._dirty = None
+            else:
+                self._dirty |= ids
+
+    def _add(self, row: Row) -> None:
+        for word in _index(self._postings, self._entries, row, sort=True):
+            insort(self._words, word)
+
+    def _remove(self, template_id: int) -> None:
+        entry = self._entries.pop(template_id, None)
+        if entry is None:
+            return
+        key = (-entry.popularity, -template_id)
+        for word in entry.words:
+            postings = self._postings[word]
+            del postings[bisect_left(postings, key)]
+            if not postings:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+
+    def _apply_changes(self, db: Session) -> None:
+        # Caller holds the lock; a few rows at most
+        if not self._dirty:
+            return
+        for template_id in self._dirty:
+            self._remove(template_id)
+        for row in db.execute(_COLUMNS.where(Template.id.in_(self._dirty))):
+            self._add(row)
+        self._dirty = set()
+
+    def _refresh(self, db: Session) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._built_at is None:
+                # Nothing to serve before the first build: it holds the lock
+                self._dirty = set()
+                self._words, self._postings, self._entries = _build(db)
+                self._built_at = now
+                return
+            if self._rebuilding:
+                # Changes wait for the new index, which may miss them
+                return
+            due = now - self._built_at >= self._refresh_interval
+            if not due and self._dirty is not None:
+                self._apply_changes(db)
+                return
+            self._rebuilding = True
+            # Changes from here on may be missing from the scan: they are
+            # applied to the new index once it is in
+            self._dirty = set()
+        try:
+            index = _build(db)
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+                self._dirty = None
+            raise
+        with self._lock:
+            self._words, self._postings, self._entries = index
+            self._built_at = now
+            self._rebuilding = False
+            if self._dirty is not None:
+                self._apply_changes(db)
+
+    def _word_range(self, prefix: str) -> range:
+        """Positions in ``_words`` of the words starting with ``prefix``."""
+        start = bisect_left(self._words, prefix)
+        return range(start, bisect_left(self._words, prefix + _MAX_CHAR, lo=start))
+
+    def suggest(self, db: Session, query: str, limit: int = 8) -> list[Suggestion]:
+        """Most popular templates having a word starting with every query word."""
+        prefixes = normalize_words(query)
+        if not prefixes:
+            return []
+        # Applies the change log, calling invalidate() (outside our lock)
+        catalog_cache.version(db)
+        self._refresh(db)
+        with self._lock:
+            # Walk the templates of the prefix matching the fewest words in
+            # popularity order, checking the other prefixes on each; stop at
+            # ``limit`` hits instead of collecting every match.
+            ranges = sorted(
+                ((self._word_range(p), p) for p in prefixes),
+                key=lambda item: len(item[0]),
+            )
+            words, others = ranges[0][0], [p for _, p in ranges[1:]]
+            streams = [self._postings[self._words[i]] for i in words]
+            suggestions: list[Suggestion] = []
+            seen: set[int] = set()
+            for _, neg_id in heapq.merge(*streams):
+                if neg_id in seen:
+                    continue
+                seen.add(neg_id)
+                entry = self._entries[-neg_id]
+                if all(any(w.startswith(p) for w in entry.words) for p in others):
+                    suggestions.append(Suggestion(-neg_id, entry.name))
+                    if len(suggestions) == limit:
+                        break
+            return suggestions
+
+
+suggest_index = SuggestIndex()
+catalog_cache.subscribe(suggest_index.invalidate)
@@ -1,18 +1,57 @@
 """Template service — CRUD and file handling."""
 
+import asyncio
 import json
+import re
 import uuid
+from typing import NamedTuple
 
+import numpy as np
+import structlog
 from fastapi import UploadFile
-from sqlalchemy import func
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import (
+    Select,
+    String,
+    column,
+    func,
+    literal_column,
+    select,
+    table,
+    type_coerce,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from src.database import AsyncSessionLocal
 from src.exceptions import TemplateNotFound
 from src.models import Template
+from src.services import blobs as blob_service
+from src.services import embeddings as embedding_service
+from src.services import keywords as keyword_service
+from src.services import render as render_service
+from src.services import similarity
+from src.services import thumbnails as thumbnail_service
+from src.services import uploads as upload_service
+from src.services.catalog import catalog_cache
+from src.services.embeddings import embedding_matrix
+from src.services.pagination import Page, SortKey, apaginate, paginate
+from src.services.popularity import popularity_buffer
+from src.services.similarity import similarity_index
 from src.storage.disk import StorageDisk
+from src.storage.s3 import S3Disk
+
+logger = structlog.get_logger(__name__)
 
-ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/bmp"}
 MAX_FILE_SIZE = 3 * 1024 * 1024  # 3 MB
+# Direct (presigned) uploads land here until they are finalized
+INCOMING_PREFIX = "incoming/"
+# Leading bytes of a direct upload fetched to sniff it and parse its header
+DIRECT_UPLOAD_HEAD_SIZE = 256 * 1024
+# How long after the presigned POST expires its upload can still be finalized
+FINALIZE_GRACE_SECONDS = 3600
+# Sniffed media type -> stored file extension
 EXTENSION_MAP = {
     "image/jpeg": ".jpg",
     "image/png": ".png",
@@ -20,31 +59,132 @@ EXTENSION_MAP = {
     "image/bmp": ".bmp",
 }
 
+# FTS5 index over name/keywords, created by migration d5e6f7a8b9c0 (SQLite only)
+templates_fts = table("templates_fts", column("rowid"))
+# bm25 column weights: a hit in the name counts more than a keyword hit
+FTS_NAME_WEIGHT = 2.0
+FTS_KEYWORDS_WEIGHT = 1.0
+# Popularity at which a match gets half of the maximum (2x) ranking boost
+FTS_POPULARITY_PIVOT = 10.0
+
+
+def _fts_query(search: str) -> str | None:
+    """Turn free text into an FTS5 query: every word, each as a prefix."""
+    tokens = re.findall(r"\w+", search.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+# created_at compared as the raw stored text: the DateTime bind processor
+# would render cursor values with microseconds that stored rows lack.
+_created_at = type_coerce(Template.created_at, String)
+
+
+class _Listing(NamedTuple):
+    statement: Select
+    count: Select
+    keys: list[SortKey]
+
+
+def _templates_listing(
+    dialect: str, search: str | None, tags: list[str] | None
+) -> _Listing:
+    statement = select(Template)
+    count = select(func.count(Template.id))
+    for tag in tags or []:
+        condition = keyword_service.tag_filter(tag)
+        statement = statement.where(condition)
+        count = count.where(condition)
+    keys = [
+        SortKey(Template.popularity),
+        SortKey(_created_at),
+        SortKey(Template.id),
+    ]
+
+    fts_query = _fts_query(search) if search else None
+    if fts_query and dialect == "sqlite":
+        # bm25() is only allowed in the query that owns the MATCH, so score
+        # the matches in a subquery and join the templates onto it.
+        fts = literal_column("templates_fts")
+        matches = (
+            select(
+                templates_fts.c.rowid.label("template_id"),
+                func.bm25(fts, FTS_NAME_WEIGHT, FTS_KEYWORDS_WEIGHT).label("score"),
+            )
+            .where(fts.op("MATCH")(fts_query))
+            .subquery()
+        )
+        # bm25 is negative (lower is better); scale it by a popularity boost
+        # in [1, 2) so popular templates float up among close matches.
+        boost = 1.0 + Template.popularity / (Template.popularity + FTS_POPULARITY_PIVOT)
+        statement = statement.join(matches, matches.c.template_id == Template.id)
+        count = count.join(matches, matches.c.template_id == Template.id)
+        keys = [
+            SortKey(matches.c.score * boost, descending=False),
+            SortKey(Template.id),
+        ]
+    elif search:
+        term = f"%{search.lower()}%"
+        condition = Template.name.ilike(term) | Template.keywords.ilike(term)
+        statement = statement.where(condition)
+        count = count.where(condition)
+    return _Listing(statement, count, keys)
+
+
+def _creator_listing(creator_id: int) -> _Listing:
+    condition = Template.creator_id == creator_id
+    return _Listing(
+        select(Template).where(condition),
+        select(func.count(Template.id)).where(condition),
+        [SortKey(_created_at), SortKey(Template.id)],
+    )
+
 
 def list_templates(
     db: Session,
     search: str | None = None,
+    tags: list[str] | None = None,
     limit: int = 40,
     offset: int = 0,
-) -> tuple[list[Template], int]:
-    filters = []
-    if search:
-        term = f"%{search.lower()}%"
-        filters.append(Template.name.ilike(term) | Template.keywords.ilike(term))
-
-    # Single query: fetch rows + total via window function (one DB round-trip)
-    total_col = func.count().over().label("total")
-    rows = (
-        db.query(Template, total_col)
-        .filter(*filters)
-        .order_by(Template.popularity.desc(), Template.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+    cursor: str | None = None,
+    include_total: bool = True,
+) -> Page:
+    """Templates by popularity, or by relevance when searching.
+
+    ``tags`` keeps templates tagged with every one of them.
+    """
+    listing = _templates_listing(db.get_bind().dialect.name, search, tags)
+    return paginate(
+        db,
+        listing.statement,
+        listing.keys,
+        limit,
+        offset=offset,
+        cursor=cursor,
+        count=listing.count if include_total else None,
+    )
+
+
+async def alist_templates(
+    db: AsyncSession,
+    search: str | None = None,
+    tags: list[str] | None = None,
+    limit: int = 40,
+    offset: int = 0,
+    cursor: str | None = None,
+    include_total: bool = True,
+) -> Page:
+    listing = _templates_listing(db.get_bind().dialect.name, search, tags)
+    return await apaginate(
+        db,
+        listing.statement,
+        listing.keys,
+        limit,
+        offset=offset,
+        cursor=cursor,
+        count=listing.count if include_total else None,
     )
-    if not rows:
-        return [], 0
-    return [r for r, _ in rows], rows[0].total
 
 
 def list_templates_by_creator(
@@ -52,56 +192,277 @@ def list_templates_by_creator(
     creator_id: int,
     limit: int = 40,
     offset: int = 0,
-) -> tuple[list[Template], int]:
-    total_col = func.count().over().label("total")
-    rows = (
-        db.query(Template, total_col)
-        .filter(Template.creator_id == creator_id)
-        .order_by(Template.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+    cursor: str | None = None,
+    include_total: bool = True,
+) -> Page:
+    listing = _creator_listing(creator_id)
+    return paginate(
+        db,
+        listing.statement,
+        listing.keys,
+        limit,
+        offset=offset,
+        cursor=cursor,
+        count=listing.count if include_total else None,
+    )
+
+
+async def alist_templates_by_creator(
+    db: AsyncSession,
+    creator_id: int,
+    limit: int = 40,
+    offset: int = 0,
+    cursor: str | None = None,
+    include_total: bool = True,
+) -> Page:
+    listing = _creator_listing(creator_id)
+    return await apaginate(
+        db,
+        listing.statement,
+        listing.keys,
+        limit,
+        offset=offset,
+        cursor=cursor,
+        count=listing.count if include_total else None,
     )
-    if not rows:
-        return [], 0
-    return [r for r, _ in rows], rows[0].total
 
 
 def get_template(db: Session, template_id: int) -> Template | None:
-    return db.query(Template).filter(Template.id == template_id).first()
+    return db.get(Template, template_id)
 
 
-def create_template(
-    db: Session,
+async def aget_template(db: AsyncSession, template_id: int) -> Template | None:
+    return await db.get(Template, template_id)
+
+
+def _upload_serializer(secret: str) -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(secret, salt="template-direct-upload")
+
+
+async def _ainsert_template(
+    db: AsyncSession, template: Template, keywords: list[str]
+) -> bool:
+    """Insert ``template`` with a reference to its file.
+
+    Returns True when no other template uses the file.
+    """
+    db.add(template)
+    await keyword_service.aset_keywords(db, template, keywords)
+    only_reference = await db.run_sync(
+        lambda session: blob_service.acquire(session, template.filename)
+    )
+    await db.commit()
+    catalog_cache.invalidate(template.id)
+    await db.refresh(template)
+    return only_reference
+
+
+async def _astore_blob(disk: StorageDisk, filename: str, content: bytes) -> list[int]:
+    """Save an image and its derivatives; return the derivative widths."""
+    widths, derivatives = await run_in_threadpool(thumbnail_service.generate, content)
+    await asyncio.gather(
+        disk.asave(filename, content),
+        thumbnail_service.asave(disk, filename, derivatives),
+    )
+    return widths
+
+
+async def acreate_template(
+    db: AsyncSession,
     disk: StorageDisk,
     name: str,
     keywords: list[str],
     file: UploadFile,
     creator_id: int | None = None,
 ) -> Template:
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
-        raise ValueError(f"Unsupported file type: {file.content_type}")
-    content = file.file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise ValueError("File size exceeds the 3 MB limit")
-    file.file.seek(0)
+    upload = await upload_service.read_upload(file, MAX_FILE_SIZE, size_hint=file.size)
+    filename = blob_service.blob_name(upload.sha256, EXTENSION_MAP[upload.content_type])
 
-    ext = EXTENSION_MAP[file.content_type]
-    filename = f"{uuid.uuid4().hex}{ext}"
-    disk.save(filename, file.file)
+    # An image already stored for another template is neither re-encoded
+    # nor uploaded again
+    sibling = None
+    if await disk.aexists(filename):
+        sibling = await db.run_sync(
+            lambda session: blob_service.sibling(session, filename)
+        )
+    if sibling is not None:
+        widths = thumbnail_service.parse_widths(sibling.thumbnail_widths)
+        dhash = sibling.dhash
+        vector = embedding_matrix.get(sibling.id)
+    else:
+        widths = await _astore_blob(disk, filename, upload.content)
+        dhash = None
+        vector = None
+    if dhash is None:
+        dhash = similarity.to_hex(
+            await run_in_threadpool(similarity.dhash, upload.content)
+        )
+    if vector is None and embedding_matrix.enabled:
+        vector = await run_in_threadpool(embedding_service.embed, upload.content)
+    render_service.remember_source_digest(filename, upload.sha256)
 
     template = Template(
         name=name,
         filename=filename,
-        keywords=",".join(k.strip() for k in keywords if k.strip()),
         creator_id=creator_id,
+        thumbnail_widths=",".join(str(w) for w in widths),
+        dhash=dhash,
     )
-    db.add(template)
-    db.commit()
-    db.refresh(template)
+    # The previous last template using the file may have been deleted,
+    # and the file swept, since the checks above
+    if await _ainsert_template(db, template, keywords) and not await disk.aexists(
+        filename
+    ):
+        await _astore_blob(disk, filename, upload.content)
+    if vector is not None:
+        await run_in_threadpool(embedding_matrix.put, template.id, vector)
     return template
 
 
+def create_direct_upload(
+    disk: S3Disk, user_id: int, content_type: str, secret: str, expires_in: int
+) -> dict:
+    """Presigned POST for a browser upload into the ``incoming/`` area.
+
+    The returned token binds the object key and content type to the user,
+    and is exchanged for a template by ``finalize_direct_upload``.
+    """
+    if content_type not in EXTENSION_MAP:
+        raise ValueError(f"Unsupported file type: {content_type}")
+    path = f"{INCOMING_PREFIX}{uuid.uuid4().hex}{EXTENSION_MAP[content_type]}"
+    presigned = disk.presign_post(path, content_type, MAX_FILE_SIZE, expires_in)
+    token = _upload_serializer(secret).dumps(
+        {"path": path, "user_id": user_id, "content_type": content_type}
+    )
+    return {**presigned, "token": token, "expires_in": expires_in}
+
+
+async def finalize_direct_upload(
+    db: AsyncSession,
+    disk: S3Disk,
+    token: str,
+    secret: str,
+    max_age: int,
+    user_id: int,
+    name: str,
+    keywords: list[str],
+) -> Template:
+    """Verify a direct upload and create its template (without thumbnails).
+
+    Only the object metadata and its first bytes are fetched. A rejected
+    object is deleted.
+    """
+    try:
+        data = _upload_serializer(secret).loads(
+            token, max_age=max_age + FINALIZE_GRACE_SECONDS
+        )
+    except BadSignature as exc:
+        raise ValueError("Invalid upload token") from exc
+    if data["user_id"] != user_id:
+        raise ValueError("Invalid upload token")
+    path, content_type = data["path"], data["content_type"]
+
+    head = await disk.ahead(path)
+    if head is None:
+        raise ValueError("Upload not found")
+    try:
+        size, stored_type = head
+        if size > MAX_FILE_SIZE:
+            raise ValueError("File size exceeds the 3 MB limit")
+        leading = await disk.aread_head(path, DIRECT_UPLOAD_HEAD_SIZE)
+        sniffed = upload_service.sniff_content_type(leading)
+        if stored_type != content_type or sniffed != content_type:
+            raise ValueError("Unsupported file type")
+        upload_service.check_header(leading, content_type)
+    except ValueError:
+        await disk.adelete(path)
+        raise
+
+    filename = path.removeprefix(INCOMING_PREFIX)
+    await disk.acopy(path, filename)
+    await disk.adelete(path)
+    template = Template(name=name, filename=filename, creator_id=user_id)
+    await _ainsert_template(db, template, keywords)
+    return template
+
+
+async def _aset_derived(template_id: int, widths: list[int], dhash: int) -> None:
+    async with AsyncSessionLocal() as db:
+        template = await aget_template(db, template_id)
+        if template is not None:
+            template.thumbnail_widths = ",".join(str(w) for w in widths)
+            template.dhash = similarity.to_hex(dhash)
+            await db.commit()
+            catalog_cache.invalidate(template_id)
+
+
+async def agenerate_thumbnails(
+    disk: StorageDisk, template_id: int, filename: str
+) -> None:
+    """Build the derivatives and hash of a stored image (background task)."""
+    try:
+        async with disk.aopen(filename) as f:
+            content = await f.read()
+        widths, derivatives = await run_in_threadpool(
+            thumbnail_service.generate, content
+        )
+        dhash = await run_in_threadpool(similarity.dhash, content)
+        await thumbnail_service.asave(disk, filename, derivatives)
+        await _aset_derived(template_id, widths, dhash)
+        if embedding_matrix.enabled:
+            vector = await run_in_threadpool(embedding_service.embed, content)
+            await run_in_threadpool(embedding_matrix.put, template_id, vector)
+    except Exception:
+        logger.exception("template.thumbnails_failed", template_id=template_id)
+
+
+def similar_templates(
+    db: Session,
+    template: Template,
+    max_distance: int = similarity.DUPLICATE_DISTANCE,
+    limit: int = 20,
+) -> list[tuple[Template, int]]:
+    """Other templates whose image looks like this one's, with distances."""
+    if template.dhash is None:
+        return []
+    matches = similarity_index.near(
+        db,
+        similarity.from_hex(template.dhash),
+        max_distance=max_distance,
+        limit=limit,
+        exclude=template.id,
+    )
+    return [
+        (other, distance)
+        for template_id, distance in matches
+        if (other := catalog_cache.get_template(db, template_id)) is not None
+    ]
+
+
+def lookalike_templates(
+    db: Session, vector: np.ndarray, limit: int = 20, exclude: int | None = None
+) -> list[tuple[Template, float]]:
+    """Templates whose image embedding is closest to ``vector``, with scores."""
+    matches = embedding_matrix.nearest(vector, limit=limit, exclude=exclude)
+    return [
+        (other, score)
+        for template_id, score in matches
+        if (other := catalog_cache.get_template(db, template_id)) is not None
+    ]
+
+
+async def asearch_by_image(
+    db: Session, file: UploadFile, limit: int = 20
+) -> list[tuple[Template, float]]:
+    """Templates that look like an uploaded image, which is not stored.
+
+    Raises ``ValueError`` for unsupported or oversized images.
+    """
+    upload = await upload_service.read_upload(file, MAX_FILE_SIZE, size_hint=file.size)
+    vector = await run_in_threadpool(embedding_service.embed, upload.content)
+    return await run_in_threadpool(lookalike_templates, db, vector, limit)
+
+
 def update_template(
     db: Session,
     template_id: int,
@@ -113,28 +474,89 @@ def update_template(
     if template is None:
         raise TemplateNotFound()
     template.name = name
-    template.keywords = ",".join(k.strip() for k in keywords if k.strip())
+    keyword_service.set_keywords(db, template, keywords)
     if text_layers is not None:
         template.text_layers = json.dumps(text_layers)
     db.commit()
+    catalog_cache.invalidate(template_id)
     db.refresh(template)
     return template
 
 
+async def aupdate_template(
+    db: AsyncSession,
+    template_id: int,
+    name: str,
+    keywords: list[str],
+    text_layers: list[dict] | None = None,
+) -> Template:
+    template = await aget_template(db, template_id)
+    if template is None:
+        raise TemplateNotFound()
+    template.name = name
+    await keyword_service.aset_keywords(db, template, keywords)
+    if text_layers is not None:
+        template.text_layers = json.dumps(text_layers)
+    await db.commit()
+    catalog_cache.invalidate(template_id)
+    await db.refresh(template)
+    return template
+
+
+def _exists(template_id: int) -> Select:
+    return select(Template.id).where(Template.id == template_id)
+
+
 def increment_popularity(db: Session, template_id: int) -> bool:
-    template = get_template(db, template_id)
-    if not template:
+    """Buffer a popularity increment; it reaches the DB on the next flush."""
+    if db.scalar(_exists(template_id)) is None:
         return False
-    template.popularity += 1
-    db.commit()
+    popularity_buffer.add(template_id)
+    return True
+
+
+async def aincrement_popularity(db: AsyncSession, template_id: int) -> bool:
+    if await db.scalar(_exists(template_id)) is None:
+        return False
+    popularity_buffer.add(template_id)
     return True
 
 
+async def adelete_template(db: AsyncSession, template: Template) -> bool:
+    """Delete a template, without touching storage.
+
+    Returns True when no other template uses its files: sweep them with
+    ``asweep_blob`` (see the blob service).
+    """
+    await keyword_service.aclear_keywords(db, template.id)
+    last = await db.run_sync(
+        lambda session: blob_service.release(
+            session, template.filename, template.thumbnail_widths
+        )
+    )
+    await db.delete(template)
+    await db.commit()
+    catalog_cache.invalidate(template.id)
+    await run_in_threadpool(embedding_matrix.remove, template.id)
+    return last
+
+
+async def asweep_blob(disk: StorageDisk, filename: str) -> None:
+    """Delete the files released by ``adelete_template`` (background task)."""
+    async with AsyncSessionLocal() as db:
+        await blob_service.asweep(db, disk, filename)
+
+
 def delete_template(db: Session, disk: StorageDisk, template_id: int) -> bool:
     template = get_template(db, template_id)
     if not template:
         return False
-    disk.delete(template.filename)
+    keyword_service.clear_keywords(db, template.id)
+    last = blob_service.release(db, template.filename, template.thumbnail_widths)
     db.delete(template)
     db.commit()
+    catalog_cache.invalidate(template.id)
+    embedding_matrix.remove(template.id)
+    if last:
+        blob_service.sweep(db, disk, template.filename)
     return True
@@ -0,0 +1,116 @@
+"""Thumbnail service — responsive derivatives of template images.
+
+Every template gets a fixed set of downscaled WebP images for the gallery
+``srcset`` plus one JPEG fallback. Derivatives live next to the originals on
+the storage disk, under ``thumbs/<original stem>/<width>.<ext>``.
+"""
+
+import asyncio
+import io
+from pathlib import PurePosixPath
+
+from PIL import Image, ImageOps
+
+from src.storage.disk import StorageDisk
+
+THUMBNAIL_WIDTHS = (200, 400, 800)
+FALLBACK_WIDTH = 400
+WEBP_OPTIONS = {"quality": 80, "method": 4}
+JPEG_OPTIONS = {"quality": 82, "optimize": True, "progressive": True}
+
+
+def _folder(filename: str) -> str:
+    return f"thumbs/{PurePosixPath(filename).stem}"
+
+
+def webp_path(filename: str, width: int) -> str:
+    return f"{_folder(filename)}/{width}.webp"
+
+
+def fallback_path(filename: str, width: int) -> str:
+    return f"{_folder(filename)}/{width}.jpg"
+
+
+def parse_widths(value: str) -> list[int]:
+    return [int(w) for w in value.split(",") if w]
+
+
+def target_widths(original_width: int) -> list[int]:
+    """Derivative widths for an image, never upscaling past the original."""
+    widths = [w for w in THUMBNAIL_WIDTHS if w < original_width]
+    if original_width < THUMBNAIL_WIDTHS[-1]:
+        widths.append(original_width)
+    return widths
+
+
+def generate(source: bytes) -> tuple[list[int], dict[str, bytes]]:
+    """Decode ``source`` once and encode every derivative.
+
+    Returns the WebP widths and a mapping of relative path suffix
+    (``"<width>.webp"`` / ``"<width>.jpg"``) to encoded bytes. Raises
+    ``ValueError`` if the source is not a decodable image.
+    """
+    try:
+        img = Image.open(io.BytesIO(source))
+        img.draft("RGB", (THUMBNAIL_WIDTHS[-1], THUMBNAIL_WIDTHS[-1]))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if img.has_transparency_data else "RGB")
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ValueError("Invalid image file") from exc
+
+    widths = target_widths(img.width)
+    outputs: dict[str, bytes] = {}
+    # Largest first: each step downsamples the previous one, which is cheaper
+    # than resampling the full-size original every time.
+    current = img
+    for width in sorted(widths, reverse=True):
+        height = max(1, round(img.height * width / img.width))
+        current = current.resize((width, height), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        current.save(buf, format="WEBP", **WEBP_OPTIONS)
+        outputs[f"{width}.webp"] = buf.getvalue()
+        if width == min(FALLBACK_WIDTH, img.width):
+            buf = io.BytesIO()
+            current.convert("RGB").save(buf, format="JPEG", **JPEG_OPTIONS)
+            outputs[f"{width}.jpg"] = buf.getvalue()
+    return sorted(widths), outputs
+
+
+def save(disk: StorageDisk, filename: str, outputs: dict[str, bytes]) -> None:
+    for suffix, content in outputs.items():
+        disk.save(f"{_folder(filename)}/{suffix}", io.BytesIO(content))
+
+
+async def asave(disk: StorageDisk, filename: str, outputs: dict[str, bytes]) -> None:
+    await asyncio.gather(
+        *(
+            disk.asave(f"{_folder(filename)}/{suffix}", content)
+            for suffix, content in outputs.items()
+        )
+    )
+
+
+def store(disk: StorageDisk, filename: str, source: bytes) -> list[int]:
+    """Generate and save the derivatives of ``filename``; return their widths."""
+    widths, outputs = generate(source)
+    save(disk, filename, outputs)
+    return widths
+
+
+def delete(disk: StorageDisk, filename: str, widths: list[int]) -> None:
+    for width in widths:
+        disk.delete(webp_path(filename, width))
+    if widths:
+        disk.delete(fallback_path(filename, fallback_width(widths)))
+
+
+async def adelete(disk: StorageDisk, filename: str, widths: list[int]) -> None:
+    paths = [webp_path(filename, width) for width in widths]
+    if widths:
+        paths.append(fallback_path(filename, fallback_width(widths)))
+    await asyncio.gather(*(disk.adelete(path) for path in paths))
+
+
+def fallback_width(widths: list[int]) -> int:
+    """Width of the JPEG fallback among the derivative ``widths``."""
+    return max([w for w in widths if w <= FALLBACK_WIDTH] or [min(widths)])
@@ -0,0 +1,120 @@
+"""Upload ingest — streaming size cap, format sniffing and header checks.
+
+The client-supplied content type is never trusted: the format is sniffed from
+the leading bytes, and image dimensions are read from the header (Pillow
+opens images lazily) so decompression bombs are rejected before any decode.
+"""
+
+import hashlib
+import io
+from typing import NamedTuple
+
+from PIL import Image
+
+from src.storage.disk import AsyncReadable
+
+CHUNK_SIZE = 64 * 1024
+# Enough leading bytes to recognise every accepted format
+SNIFF_SIZE = 12
+# Largest accepted image, in pixels (about 100 MB once decoded as RGBA)
+MAX_IMAGE_PIXELS = 25_000_000
+
+# Pillow format name -> media type
+_PIL_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "BMP": "image/bmp"}
+
+
+class IngestedUpload(NamedTuple):
+    content: bytes
+    content_type: str
+    sha256: str
+    width: int
+    height: int
+
+
+def sniff_content_type(head: bytes) -> str | None:
+    """Media type of an accepted image format from its magic bytes."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    return None
+
+
+def _webp_size(head: bytes) -> tuple[int, int]:
+    """Canvas size from the first chunk of a WebP file.
+
+    Pillow hands the whole file to libwebp just to open it, which does not
+    work on the leading bytes of a direct upload.
+    """
+    chunk = head[12:16]
+    if chunk == b"VP8X" and len(head) >= 30:
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    if chunk == b"VP8 " and len(head) >= 30 and head[23:26] == b"\x9d\x01\x2a":
+        width = int.from_bytes(head[26:28], "little") & 0x3FFF
+        height = int.from_bytes(head[28:30], "little") & 0x3FFF
+        return width, height
+    if chunk == b"VP8L" and len(head) >= 25 and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    raise ValueError("Invalid image file")
+
+
+def check_header(content: bytes, content_type: str) -> tuple[int, int]:
+    """Parse the image header only and return its size.
+
+    ``content`` may be just the leading bytes of the file. Raises
+    ``ValueError`` if the header is unreadable, disagrees with the sniffed
+    type, or declares more than ``MAX_IMAGE_PIXELS``.
+    """
+    if content_type == "image/webp":
+        width, height = _webp_size(content)
+    else:
+        try:
+            with Image.open(io.BytesIO(content)) as img:
+                fmt, (width, height) = img.format, img.size
+        except (OSError, Image.DecompressionBombError) as exc:
+            raise ValueError("Invalid image file") from exc
+        if _PIL_FORMATS.get(fmt or "") != content_type:
+            raise ValueError("Invalid image file")
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValueError("Image dimensions are too large")
+    return width, height
+
+
+async def read_upload(
+    file: AsyncReadable, max_size: int, size_hint: int | None = None
+) -> IngestedUpload:
+    """Read an upload in chunks, validating it as early as possible.
+
+    Stops reading as soon as ``max_size`` is exceeded (or right away when
+    ``size_hint`` already says so) and rejects unknown formats after the first
+    chunk. The content is hashed in the same pass. Raises ``ValueError``.
+    """
+    too_large = f"File size exceeds the {max_size // (1024 * 1024)} MB limit"
+    if size_hint is not None and size_hint > max_size:
+        raise ValueError(too_large)
+
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    content_type = None
+    while chunk := await file.read(CHUNK_SIZE):
+        if len(buffer) + len(chunk) > max_size:
+            raise ValueError(too_large)
+        buffer += chunk
+        digest.update(chunk)
+        if content_type is None and len(buffer) >= SNIFF_SIZE:
+            content_type = sniff_content_type(bytes(buffer[:SNIFF_SIZE]))
+            if content_type is None:
+                raise ValueError("Unsupported file type")
+    if content_type is None:
+        raise ValueError("Unsupported file type")
+
+    content = bytes(buffer)
+    width, height = check_header(content, content_type)
+    return IngestedUpload(content, content_type, digest.hexdigest(), width, height)
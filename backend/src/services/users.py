@@ -1,17 +1,40 @@
-"""User service — upsert users and groups from OIDC data."""
+"""User service — upsert users and groups from OIDC data.
+
+Missing groups are created with SQLite's ``ON CONFLICT DO NOTHING``; the
+API only runs on SQLite (``catalog.require_change_triggers``).
+"""
 
 from sqlalchemy import or_, select
-from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
 from src.models import Group, Role, User
-
-
-def _get_or_create_group(db: Session, name: str) -> Group:
-    group = db.scalar(select(Group).where(Group.name == name))
-    if group is None:
-        group = Group(name=name)
-        db.add(group)
-    return group
+from src.services.principals import principal_cache
+
+
+def _resolve_groups(db: Session, names: list[str]) -> list[Group]:
+    """Groups named ``names``, creating the missing ones (not committed).
+
+    The number of queries does not depend on the number of groups: one for
+    the groups and one for their roles, plus an insert and a select when
+    some are missing. Roles are loaded for ``get_effective_role``.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+    query = select(Group).options(selectinload(Group.role))
+    found = {g.name: g for g in db.scalars(query.where(Group.name.in_(names)))}
+    missing = [name for name in names if name not in found]
+    if missing:
+        # A concurrent login may create the same groups first
+        db.execute(
+            sqlite_insert(Group)
+            .values([{"name": name} for name in missing])
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        found |= {g.name: g for g in db.scalars(query.where(Group.name.in_(missing)))}
+    return [found[name] for name in names]
 
 
 def assign_role(
@@ -49,6 +72,7 @@ def assign_role(
 
     user.role = role
     db.commit()
+    principal_cache.invalidate(user.sub)
     return user
 
 
@@ -62,6 +86,29 @@ def get_effective_role(user: User) -> str | None:
     return None
 
 
+def _upsert(
+    db: Session, sub: str, name: str, email: str, group_names: list[str]
+) -> User:
+    # Nothing is written when the user is already up to date
+    groups = _resolve_groups(db, group_names)
+    user = db.scalar(
+        select(User)
+        .options(selectinload(User.role), selectinload(User.groups))
+        .where(User.sub == sub)
+    )
+    if user is None:
+        user = User(sub=sub, name=name, email=email, role=None, groups=groups)
+        db.add(user)
+        return user
+    if user.name != name:
+        user.name = name
+    if user.email != email:
+        user.email = email
+    if {g.id for g in user.groups} != {g.id for g in groups}:
+        user.groups = groups
+    return user
+
+
 def upsert_user(
     db: Session,
     sub: str,
@@ -69,16 +116,23 @@ def upsert_user(
     email: str,
     group_names: list[str],
 ) -> User:
-    groups = [_get_or_create_group(db, g) for g in group_names]
+    """Create or update a user from OIDC data; loads what
+    ``get_effective_role`` reads."""
+    user = _upsert(db, sub, name, email, group_names)
+    db.commit()
+    principal_cache.invalidate(sub)
+    return user
 
-    user = db.scalar(select(User).where(User.sub == sub))
-    if user is None:
-        user = User(sub=sub, name=name, email=email, groups=groups)
-        db.add(user)
-    else:
-        user.name = name
-        user.email = email
-        user.groups = groups
 
-    db.commit()
+async def aupsert_user(
+    db: AsyncSession,
+    sub: str,
+    name: str,
+    email: str,
+    group_names: list[str],
+) -> User:
+    """Async ``upsert_user``."""
+    user = await db.run_sync(_upsert, sub, name, email, group_names)
+    await db.commit()
+    principal_cache.invalidate(sub)
     return user
@@ -0,0 +1,41 @@
+"""Every use of slowapi internals, in one place.
+
+slowapi has no public API for checking the default limits from a plain ASGI
+middleware, nor for parsing them ahead of time. What ``src.ratelimit`` needs
+is done here, against private names of slowapi 0.1.9: pyproject.toml pins
+that exact version, and tests/test_ratelimit.py fails when an upgrade
+changes any of it.
+"""
+
+from collections.abc import Callable
+
+from slowapi import Limiter
+from slowapi.middleware import _should_exempt, async_check_limits
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def freeze_default_limits(limiter: Limiter) -> None:
+    """Parse the default limit strings once instead of on every request."""
+    limiter._default_limits = [  # noqa: SLF001
+        list(group)
+        for group in limiter._default_limits  # noqa: SLF001
+    ]
+
+
+def uses_default_limits(limiter: Limiter, endpoint: Callable | None) -> bool:
+    """Whether the default limits apply to ``endpoint``.
+
+    Not for mounts and 404s (no endpoint), ``@limiter.exempt`` routes and
+    routes with a ``@limiter.limit`` of their own, which the decorator checks.
+    """
+    return not _should_exempt(limiter, endpoint)
+
+
+async def check_default_limits(
+    limiter: Limiter, request: Request, endpoint: Callable | None, app: Starlette
+) -> Response | None:
+    """Count the request against the default limits; the 429 response if over."""
+    error_response, _ = await async_check_limits(limiter, request, endpoint, app)
+    return error_response
@@ -1,7 +1,15 @@
 """Abstract base class for storage disks."""
 
 from abc import ABC, abstractmethod
-from typing import BinaryIO
+from contextlib import AbstractAsyncContextManager
+from typing import BinaryIO, Protocol
+
+# Chunk size used when streaming file contents
+CHUNK_SIZE = 1024 * 1024
+
+
+class AsyncReadable(Protocol):
+    async def read(self, size: int = -1, /) -> bytes: ...
 
 
 class StorageDisk(ABC):
@@ -9,6 +17,14 @@ class StorageDisk(ABC):
     def save(self, path: str, file: BinaryIO) -> None:
         """Persist file contents at the given path."""
 
+    @abstractmethod
+    def open(self, path: str) -> BinaryIO:
+        """Open the file at the given path for binary reading."""
+
+    @abstractmethod
+    def exists(self, path: str) -> bool:
+        """Return whether a file exists at the given path."""
+
     @abstractmethod
     def delete(self, path: str) -> None:
         """Remove the file at the given path."""
@@ -20,3 +36,25 @@ class StorageDisk(ABC):
     @abstractmethod
     def ensure(self) -> None:
         """Initialise the storage backend (create dirs, validate bucket, etc.)."""
+
+    # Async counterparts, for request handlers: they must not hold a
+    # threadpool worker for the duration of a transfer.
+
+    @abstractmethod
+    async def asave(self, path: str, file: bytes | AsyncReadable) -> None:
+        """Persist ``file`` (bytes or an async stream) at the given path."""
+
+    @abstractmethod
+    def aopen(self, path: str) -> AbstractAsyncContextManager[AsyncReadable]:
+        """Open the file at the given path for async binary reading."""
+
+    @abstractmethod
+    async def aexists(self, path: str) -> bool:
+        """Return whether a file exists at the given path."""
+
+    @abstractmethod
+    async def adelete(self, path: str) -> None:
+        """Remove the file at the given path."""
+
+    async def aclose(self) -> None:
+        """Release the async client resources (called on app shutdown)."""
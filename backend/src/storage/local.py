@@ -1,10 +1,14 @@
 """Local filesystem storage disk."""
 
 import shutil
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import BinaryIO
 
-from src.storage.disk import StorageDisk
+import anyio
+
+from src.storage.disk import CHUNK_SIZE, AsyncReadable, StorageDisk
 
 
 class LocalDisk(StorageDisk):
@@ -12,6 +16,10 @@ class LocalDisk(StorageDisk):
         self._root = Path(root)
         self._base_url = base_url.rstrip("/")
 
+    @property
+    def root(self) -> Path:
+        return self._root
+
     def ensure(self) -> None:
         self._root.mkdir(parents=True, exist_ok=True)
 
@@ -21,8 +29,35 @@ class LocalDisk(StorageDisk):
         with dest.open("wb") as buf:
             shutil.copyfileobj(file, buf)
 
+    def open(self, path: str) -> BinaryIO:
+        return (self._root / path).open("rb")
+
+    def exists(self, path: str) -> bool:
+        return (self._root / path).is_file()
+
     def delete(self, path: str) -> None:
         (self._root / path).unlink(missing_ok=True)
 
     def url(self, path: str) -> str:
         return f"{self._base_url}/{path}"
+
+    async def asave(self, path: str, file: bytes | AsyncReadable) -> None:
+        dest = anyio.Path(self._root / path)
+        await dest.parent.mkdir(parents=True, exist_ok=True)
+        async with await anyio.open_file(dest, "wb") as buf:
+            if isinstance(file, bytes):
+                await buf.write(file)
+                return
+            while chunk := await file.read(CHUNK_SIZE):
+                await buf.write(chunk)
+
+    @asynccontextmanager
+    async def aopen(self, path: str) -> AsyncIterator[AsyncReadable]:
+        async with await anyio.open_file(self._root / path, "rb") as f:
+            yield f
+
+    async def aexists(self, path: str) -> bool:
+        return await anyio.Path(self._root / path).is_file()
+
+    async def adelete(self, path: str) -> None:
+        await anyio.Path(self._root / path).unlink(missing_ok=True)
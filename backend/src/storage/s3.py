@@ -1,10 +1,35 @@
 """S3-compatible storage disk (AWS S3, MinIO, Cloudflare R2, etc.)."""
 
-from typing import BinaryIO
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, BinaryIO
 
 import boto3
+from aiobotocore.session import get_session
+from botocore.exceptions import ClientError
 
-from src.storage.disk import StorageDisk
+from src.storage.disk import AsyncReadable, StorageDisk
+
+# Streams above this size are sent as a multipart upload (S3 minimum: 5 MiB)
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _is_not_found(exc: ClientError) -> bool:
+    return exc.response.get("Error", {}).get("Code") in {"404", "NoSuchKey"}
+
+
+async def _read_full(file: AsyncReadable, size: int) -> bytes:
+    """Read up to ``size`` bytes, short only at the end of the stream."""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        chunk = await file.read(remaining)
+        if not chunk:
+            break
+        parts.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(parts)
 
 
 class S3Disk(StorageDisk):
@@ -27,18 +52,159 @@ class S3Disk(StorageDisk):
         if access_key and secret_key:
             kwargs["aws_access_key_id"] = access_key
             kwargs["aws_secret_access_key"] = secret_key
+        self._client_kwargs = kwargs
         self._client = boto3.client("s3", **kwargs)
+        # aiobotocore client, created on first use inside the event loop
+        self._async_client: Any = None
+        self._async_stack = AsyncExitStack()
+        self._async_lock = asyncio.Lock()
+
+    def _key(self, path: str) -> str:
+        return f"{self._prefix}{path}"
 
     def ensure(self) -> None:
         self._client.head_bucket(Bucket=self._bucket)
 
     def save(self, path: str, file: BinaryIO) -> None:
-        self._client.upload_fileobj(file, self._bucket, f"{self._prefix}{path}")
+        self._client.upload_fileobj(file, self._bucket, self._key(path))
+
+    def open(self, path: str) -> BinaryIO:
+        obj = self._client.get_object(Bucket=self._bucket, Key=self._key(path))
+        return obj["Body"]
+
+    def exists(self, path: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self._bucket, Key=self._key(path))
+        except ClientError as exc:
+            if _is_not_found(exc):
+                return False
+            raise
+        return True
 
     def delete(self, path: str) -> None:
-        self._client.delete_object(Bucket=self._bucket, Key=f"{self._prefix}{path}")
+        self._client.delete_object(Bucket=self._bucket, Key=self._key(path))
 
     def url(self, path: str) -> str:
         if self._endpoint_url:
             return f"{self._endpoint_url}/{self._bucket}/{self._prefix}{path}"
         return f"https://{self._bucket}.s3.{self._region}.amazonaws.com/{self._prefix}{path}"
+
+    def presign_post(
+        self, path: str, content_type: str, max_size: int, expires_in: int
+    ) -> dict:
+        """Presigned POST letting a browser upload ``path`` directly.
+
+        S3 enforces the exact content type and a size of 1..``max_size`` bytes.
+        Returns the form ``url`` and the ``fields`` to send before the file.
+        """
+        return self._client.generate_presigned_post(
+            Bucket=self._bucket,
+            Key=self._key(path),
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=expires_in,
+        )
+
+    async def _aclient(self) -> Any:
+        if self._async_client is None:
+            async with self._async_lock:
+                if self._async_client is None:
+                    self._async_client = await self._async_stack.enter_async_context(
+                        get_session().create_client("s3", **self._client_kwargs)
+                    )
+        return self._async_client
+
+    async def aclose(self) -> None:
+        async with self._async_lock:
+            await self._async_stack.aclose()
+            self._async_client = None
+
+    async def asave(self, path: str, file: bytes | AsyncReadable) -> None:
+        client = await self._aclient()
+        key = self._key(path)
+        if isinstance(file, bytes):
+            await client.put_object(Bucket=self._bucket, Key=key, Body=file)
+            return
+        chunk = await _read_full(file, MULTIPART_CHUNK_SIZE)
+        if len(chunk) < MULTIPART_CHUNK_SIZE:
+            await client.put_object(Bucket=self._bucket, Key=key, Body=chunk)
+            return
+
+        upload = await client.create_multipart_upload(Bucket=self._bucket, Key=key)
+        upload_id = upload["UploadId"]
+        parts = []
+        try:
+            while chunk:
+                part = await client.upload_part(
+                    Bucket=self._bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=len(parts) + 1,
+                    Body=chunk,
+                )
+                parts.append({"PartNumber": len(parts) + 1, "ETag": part["ETag"]})
+                chunk = await _read_full(file, MULTIPART_CHUNK_SIZE)
+            await client.complete_multipart_upload(
+                Bucket=self._bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await client.abort_multipart_upload(
+                Bucket=self._bucket, Key=key, UploadId=upload_id
+            )
+            raise
+
+    @asynccontextmanager
+    async def aopen(self, path: str) -> AsyncIterator[AsyncReadable]:
+        client = await self._aclient()
+        obj = await client.get_object(Bucket=self._bucket, Key=self._key(path))
+        async with obj["Body"] as body:
+            yield body
+
+    async def aexists(self, path: str) -> bool:
+        client = await self._aclient()
+        try:
+            await client.head_object(Bucket=self._bucket, Key=self._key(path))
+        except ClientError as exc:
+            if _is_not_found(exc):
+                return False
+            raise
+        return True
+
+    async def ahead(self, path: str) -> tuple[int, str] | None:
+        """Size and content type of the object at ``path``, None if missing."""
+        client = await self._aclient()
+        try:
+            head = await client.head_object(Bucket=self._bucket, Key=self._key(path))
+        except ClientError as exc:
+            if _is_not_found(exc):
+                return None
+            raise
+        return head["ContentLength"], head.get("ContentType", "")
+
+    async def aread_head(self, path: str, size: int) -> bytes:
+        """First ``size`` bytes of the object at ``path`` (ranged GET)."""
+        client = await self._aclient()
+        obj = await client.get_object(
+            Bucket=self._bucket, Key=self._key(path), Range=f"bytes=0-{size - 1}"
+        )
+        async with obj["Body"] as body:
+            return await body.read()
+
+    async def acopy(self, src: str, dest: str) -> None:
+        """Server-side copy: the bytes never leave S3."""
+        client = await self._aclient()
+        await client.copy_object(
+            Bucket=self._bucket,
+            Key=self._key(dest),
+            CopySource={"Bucket": self._bucket, "Key": self._key(src)},
+        )
+
+    async def adelete(self, path: str) -> None:
+        client = await self._aclient()
+        await client.delete_object(Bucket=self._bucket, Key=self._key(path))
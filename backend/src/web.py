@@ -3,49 +3,113 @@
 import os
 import uuid
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 import structlog
 from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.staticfiles import StaticFiles
-from slowapi import Limiter, _rate_limit_exceeded_handler
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from slowapi.util import get_remote_address
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from src.config import get_settings
-from src.database import database_engine
+from src.database import (
+    async_database_engine,
+    async_read_engine,
+    database_engine,
+    read_engine,
+)
 from src.logging_setup import setup_logging
 from src.otel_setup import setup_otel
+from src.ratelimit import RateLimitMiddleware, limiter
 from src.routes.auth import router as auth_router
 from src.routes.health import router as health_router
+from src.routes.keywords import router as keywords_router
 from src.routes.templates import router as templates_router
+from src.serialization import fragment_cache
+from src.services.catalog import catalog_cache, require_change_triggers
+from src.services.popularity import popularity_buffer
+from src.services.principals import principal_cache
+from src.services.render import render_pool
+from src.services.render_cache import render_cache
+from src.services.suggest import suggest_index
 from src.storage import active_disk
 from src.storage.local import LocalDisk
 
 logger = structlog.get_logger(__name__)
 
 
-class RequestContextMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        structlog.contextvars.clear_contextvars()
-        structlog.contextvars.bind_contextvars(
-            request_id=str(uuid.uuid4()),
-            method=request.method,
-            path=request.url.path,
-        )
-        return await call_next(request)
+class RequestContextMiddleware:
+    """Binds request_id, method and path to the logs of a request.
+
+    Plain ASGI: the route runs in the same task, so it sees the bindings.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            structlog.contextvars.clear_contextvars()
+            structlog.contextvars.bind_contextvars(
+                request_id=str(uuid.uuid4()),
+                method=scope["method"],
+                path=scope["path"],
+            )
+        await self.app(scope, receive, send)
+
+
+def _render_cache_dir(configured: str) -> Path | None:
+    """Disk tier location: explicit setting, else under the local disk root."""
+    if configured:
+        return Path(configured)
+    if isinstance(active_disk, LocalDisk):
+        return active_disk.root / "renders"
+    return None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("startup")
+    require_change_triggers(database_engine)
     active_disk.ensure()
+    settings = get_settings()
+    render_pool.start(
+        max_workers=settings.RENDER_POOL_SIZE,
+        max_pending=settings.RENDER_MAX_PENDING,
+        font_dir=settings.RENDER_FONT_DIR,
+    )
+    render_cache.configure(
+        memory_max_bytes=settings.RENDER_CACHE_MEMORY_MB * 1024 * 1024,
+        disk_root=_render_cache_dir(settings.RENDER_CACHE_DIR),
+        disk_max_bytes=settings.RENDER_CACHE_DISK_MB * 1024 * 1024,
+    )
+    catalog_cache.configure(
+        max_entries=settings.CATALOG_CACHE_SIZE,
+        ttl=settings.CATALOG_CACHE_TTL,
+        check_interval=settings.CATALOG_CACHE_CHECK_INTERVAL,
+    )
+    fragment_cache.configure(max_entries=settings.CATALOG_CACHE_SIZE)
+    principal_cache.configure(
+        max_entries=settings.PRINCIPAL_CACHE_SIZE,
+        ttl=settings.PRINCIPAL_CACHE_TTL,
+        check_interval=settings.PRINCIPAL_CACHE_CHECK_INTERVAL,
+    )
+    suggest_index.configure(refresh_interval=settings.SUGGEST_REFRESH_INTERVAL)
+    popularity_buffer.start(
+        flush_interval=settings.POPULARITY_FLUSH_INTERVAL,
+        max_pending=settings.POPULARITY_FLUSH_MAX_PENDING,
+    )
     yield
+    await popularity_buffer.stop()
+    render_pool.shutdown()
+    await active_disk.aclose()
+    # Async connections are bound to this event loop
+    await async_database_engine.dispose()
+    await async_read_engine.dispose()
 
 
 def create_app() -> FastAPI:
@@ -56,13 +120,12 @@ def create_app() -> FastAPI:
 
     app.add_middleware(RequestContextMiddleware)
 
-    limiter = Limiter(key_func=get_remote_address, default_limits=[settings.RATE_LIMIT])
     app.state.limiter = limiter
     app.add_exception_handler(
         RateLimitExceeded,
         _rate_limit_exceeded_handler,  # ty:ignore[invalid-argument-type]
     )
-    app.add_middleware(SlowAPIMiddleware)
+    app.add_middleware(RateLimitMiddleware)
 
     app.add_middleware(
         SessionMiddleware,
@@ -87,7 +150,12 @@ def create_app() -> FastAPI:
     if settings.OTEL_ENABLED:
         setup_otel(
             app,
-            database_engine,
+            [
+                database_engine,
+                read_engine,
+                async_database_engine.sync_engine,
+                async_read_engine.sync_engine,
+            ],
             service_name=settings.OTEL_SERVICE_NAME,
             otlp_endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT,
         )
@@ -101,6 +169,7 @@ def create_app() -> FastAPI:
     api_router.include_router(router=auth_router)
     api_router.include_router(router=health_router)
     api_router.include_router(router=templates_router)
+    api_router.include_router(router=keywords_router)
     app.include_router(api_router)
 
     return app
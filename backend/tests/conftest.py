@@ -0,0 +1,52 @@
+"""Test settings: a throwaway migrated SQLite database and local storage.
+
+The environment is set before anything from ``src`` is imported, since the
+database engines, the storage disk and the rate limiter are built at import.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_tmp = Path(tempfile.mkdtemp(prefix="memegenerator-tests-"))
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_tmp / 'test.db'}",
+    STORAGE_DRIVER="local",
+    STORAGE_LOCAL_PATH=str(_tmp / "storage"),
+    STORAGE_LOCAL_BASE_URL="/api/static/templates",
+    EMBEDDINGS_PATH=str(_tmp / "test.embeddings"),
+    RATE_LIMIT_STORAGE_URI=f"shm://{_tmp / 'ratelimit'}",
+    SESSION_SECRET_KEY="test",
+    SESSION_COOKIE_MAX_AGE="86400",
+    RATE_LIMIT="1000/minute",
+    RATE_LIMIT_UPLOAD="1000/minute",
+    APP_ENV="test",
+    LOG_LEVEL="WARNING",
+    OTEL_ENABLED="false",
+    ALLOWED_HOSTS="testserver",
+    ALLOWED_ORIGINS="http://localhost",
+)
+for _name in (
+    "KEYCLOAK_CLIENT_ID",
+    "KEYCLOAK_CLIENT_SECRET",
+    "KEYCLOAK_AUTHORIZE_URL",
+    "KEYCLOAK_ACCESS_TOKEN_URL",
+    "KEYCLOAK_JWT_URL",
+    "OTEL_EXPORTER_OTLP_ENDPOINT",
+):
+    os.environ[_name] = "http://localhost/unused"
+os.environ.pop("DATABASE_READ_URL", None)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Migrate the test database once, with the triggers of production."""
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(Config("src/migrations/alembic.ini"), "head")
+    yield
+    shutil.rmtree(_tmp, ignore_errors=True)
@@ -0,0 +1,83 @@
+"""Template deletes leave tombstones; sweeps delete unreferenced files."""
+
+import io
+import uuid
+
+from sqlalchemy import select
+
+from src.database import SessionLocal
+from src.models import Blob, Template
+from src.services import blobs as blob_service
+from src.services import templates as template_service
+from src.storage import active_disk
+
+
+def _template(filename: str) -> int:
+    with SessionLocal() as db:
+        template = Template(name="blob", filename=filename)
+        db.add(template)
+        blob_service.acquire(db, filename)
+        db.commit()
+        return template.id
+
+
+def _stored() -> str:
+    filename = f"{uuid.uuid4().hex}.jpg"
+    active_disk.save(filename, io.BytesIO(b"image"))
+    return filename
+
+
+def _refcount(filename: str) -> int | None:
+    with SessionLocal() as db:
+        return db.scalar(select(Blob.refcount).where(Blob.filename == filename))
+
+
+def test_release_leaves_a_tombstone() -> None:
+    filename = _stored()
+    template_id = _template(filename)
+    with SessionLocal() as db:
+        template = db.get(Template, template_id)
+        assert template is not None
+        assert blob_service.release(db, filename, template.thumbnail_widths)
+        db.delete(template)
+        db.commit()
+
+    assert _refcount(filename) == 0
+    assert active_disk.exists(filename)
+
+    with SessionLocal() as db:
+        assert blob_service.sweep(db, active_disk, filename)
+    assert _refcount(filename) is None
+    assert not active_disk.exists(filename)
+
+
+def test_sweep_spares_a_blob_taken_again() -> None:
+    filename = _stored()
+    first = _template(filename)
+    with SessionLocal() as db:
+        template = db.get(Template, first)
+        assert template is not None
+        blob_service.release(db, filename, template.thumbnail_widths)
+        db.delete(template)
+        db.commit()
+    # An upload of the same image before the sweep
+    _template(filename)
+
+    with SessionLocal() as db:
+        assert not blob_service.sweep(db, active_disk, filename)
+    assert _refcount(filename) == 1
+    assert active_disk.exists(filename)
+
+
+def test_delete_sweeps_the_last_reference_only() -> None:
+    filename = _stored()
+    first, second = _template(filename), _template(filename)
+    with SessionLocal() as db:
+        assert template_service.delete_template(db, active_disk, first)
+    assert _refcount(filename) == 1
+    assert active_disk.exists(filename)
+
+    with SessionLocal() as db:
+        assert template_service.delete_template(db, active_disk, second)
+    assert _refcount(filename) is None
+    assert not active_disk.exists(filename)
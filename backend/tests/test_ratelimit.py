@@ -0,0 +1,91 @@
+"""RateLimitMiddleware and the slowapi internals it relies on.
+
+These fail when a slowapi upgrade changes what ``src.slowapi_compat`` uses.
+"""
+
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from limits import RateLimitItem
+from slowapi import Limiter, _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+from slowapi.util import get_remote_address
+
+from src.ratelimit import RateLimitMiddleware
+from src.slowapi_compat import freeze_default_limits, uses_default_limits
+
+DEFAULT_LIMIT = 2
+OWN_LIMIT = 4
+
+
+@pytest.fixture
+def limiter(tmp_path: Path) -> Limiter:
+    limiter = Limiter(
+        key_func=get_remote_address,
+        default_limits=[f"{DEFAULT_LIMIT}/minute"],
+        storage_uri=f"shm://{tmp_path / 'ratelimit'}",
+        strategy="sliding-window-counter",
+    )
+    freeze_default_limits(limiter)
+    return limiter
+
+
+@pytest.fixture
+def client(limiter: Limiter) -> TestClient:
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(
+        RateLimitExceeded,
+        _rate_limit_exceeded_handler,  # ty:ignore[invalid-argument-type]
+    )
+    app.add_middleware(RateLimitMiddleware)
+
+    @app.get("/default")
+    async def default() -> dict:
+        return {}
+
+    @app.get("/own")
+    @limiter.limit(f"{OWN_LIMIT}/minute")
+    async def own(request: Request) -> dict:
+        return {}
+
+    @app.get("/exempt")
+    @limiter.exempt
+    async def exempt() -> dict:
+        return {}
+
+    return TestClient(app)
+
+
+def _statuses(client: TestClient, path: str, requests: int) -> list[int]:
+    return [client.get(path).status_code for _ in range(requests)]
+
+
+def test_frozen_default_limits_still_apply(limiter: Limiter) -> None:
+    [group] = limiter._default_limits  # noqa: SLF001
+    assert isinstance(group, list)
+    [limit] = group
+    assert isinstance(limit.limit, RateLimitItem)
+    assert limit.limit.amount == DEFAULT_LIMIT
+
+
+def test_default_limit(client: TestClient) -> None:
+    assert _statuses(client, "/default", DEFAULT_LIMIT + 1) == [200, 200, 429]
+
+
+def test_route_limit_replaces_default(client: TestClient) -> None:
+    statuses = _statuses(client, "/own", OWN_LIMIT + 1)
+    assert statuses == [200] * OWN_LIMIT + [429]
+
+
+def test_exempt_route(client: TestClient) -> None:
+    assert _statuses(client, "/exempt", DEFAULT_LIMIT + 1) == [200] * (
+        DEFAULT_LIMIT + 1
+    )
+
+
+def test_no_default_limit_without_endpoint(limiter: Limiter) -> None:
+    # Mounts and 404s
+    assert not uses_default_limits(limiter, None)
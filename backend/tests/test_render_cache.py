@@ -0,0 +1,56 @@
+"""The disk tier of the render cache stays within its budget across workers."""
+
+import asyncio
+import os
+from pathlib import Path
+
+from src.services.render_cache import DISK_TRIM_TO, RenderCache
+
+ENTRY_SIZE = 1000
+BUDGET = 20 * ENTRY_SIZE
+
+
+def _worker(root: Path) -> RenderCache:
+    cache = RenderCache()
+    cache.configure(memory_max_bytes=0, disk_root=root, disk_max_bytes=BUDGET)
+    return cache
+
+
+def _directory_bytes(root: Path) -> int:
+    return sum(path.stat().st_size for path in root.glob("*/*"))
+
+
+def _key(i: int) -> str:
+    return f"{i:064x}"
+
+
+def test_budget_holds_for_the_directory(tmp_path: Path) -> None:
+    workers = [_worker(tmp_path) for _ in range(3)]
+    for i in range(100):
+        asyncio.run(workers[i % 3].put(_key(i), bytes(ENTRY_SIZE)))
+        assert _directory_bytes(tmp_path) <= BUDGET
+    assert _directory_bytes(tmp_path) >= BUDGET * DISK_TRIM_TO - ENTRY_SIZE
+    assert sum(w.snapshot()["disk_evictions"] for w in workers) > 0
+
+
+def test_trim_keeps_recently_read_files(tmp_path: Path) -> None:
+    writer, reader = _worker(tmp_path), _worker(tmp_path)
+    for i in range(20):
+        asyncio.run(writer.put(_key(i), bytes(ENTRY_SIZE)))
+        # Distinct mtimes, oldest first
+        os.utime(tmp_path / _key(i)[:2] / _key(i), (i, i))
+    assert asyncio.run(reader.get(_key(0))) is not None
+
+    asyncio.run(writer.put(_key(20), bytes(ENTRY_SIZE)))
+
+    assert asyncio.run(reader.get(_key(0))) is not None
+    assert asyncio.run(reader.get(_key(1))) is None
+
+
+def test_startup_counts_files_of_earlier_runs(tmp_path: Path) -> None:
+    first = _worker(tmp_path)
+    for i in range(10):
+        asyncio.run(first.put(_key(i), bytes(ENTRY_SIZE)))
+    (tmp_path / "usage").unlink()
+
+    assert _worker(tmp_path).snapshot()["disk_bytes"] == 10 * ENTRY_SIZE
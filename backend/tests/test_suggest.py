@@ -0,0 +1,67 @@
+"""Suggestions keep being served while the index is rebuilt."""
+
+import threading
+import uuid
+
+import pytest
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal
+from src.models import Template
+from src.services import suggest
+from src.services.suggest import SuggestIndex
+
+TIMEOUT = 10
+
+
+def _word() -> str:
+    return f"w{uuid.uuid4().hex[:12]}"
+
+
+def _names(index: SuggestIndex, query: str) -> list[str]:
+    with SessionLocal() as db:
+        return [s.name for s in index.suggest(db, query)]
+
+
+def test_queries_are_served_during_a_rebuild(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    before, after = _word(), _word()
+    with SessionLocal() as db:
+        template = Template(name=before, filename=f"{uuid.uuid4().hex}.jpg")
+        db.add(template)
+        db.commit()
+    # Every query is due for a rebuild; the first one builds
+    index = SuggestIndex(refresh_interval=0)
+    assert _names(index, before) == [before]
+
+    scanned, resume = threading.Event(), threading.Event()
+    build = suggest._build  # noqa: SLF001
+
+    def paused_build(db: Session):
+        rows = build(db)
+        scanned.set()
+        resume.wait(TIMEOUT)
+        return rows
+
+    monkeypatch.setattr(suggest, "_build", paused_build)
+    rebuild = threading.Thread(target=_names, args=(index, before))
+    rebuild.start()
+    assert scanned.wait(TIMEOUT)
+    index._refresh_interval = 3600  # noqa: SLF001
+
+    # Renamed after the scan: only the change log tells the index
+    with SessionLocal() as db:
+        renamed = db.get(Template, template.id)
+        assert renamed is not None
+        renamed.name = after
+        db.commit()
+    index.invalidate({template.id})
+
+    assert _names(index, before) == [before]
+    assert rebuild.is_alive(), "the query waited for the rebuild"
+
+    resume.set()
+    rebuild.join(TIMEOUT)
+    assert _names(index, after) == [after]
+    assert _names(index, before) == []
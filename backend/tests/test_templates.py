@@ -0,0 +1,115 @@
+"""Template routes: cached reads after writes, validators, who may edit."""
+
+import time
+from collections.abc import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.database import SessionLocal
+from src.dependencies import get_current_user
+from src.models import Template, User
+from src.services.catalog import catalog_cache
+from src.services.popularity import popularity_buffer
+from src.services.principals import Principal
+from src.web import app
+
+
+@pytest.fixture(scope="module")
+def creator() -> Principal:
+    with SessionLocal() as db:
+        user = User(sub="creator", name="Creator", email="creator@example.com")
+        db.add(user)
+        db.commit()
+        return Principal(id=user.id, sub=user.sub, role=None, group_roles=())
+
+
+@pytest.fixture
+def client(creator: Principal) -> Iterator[TestClient]:
+    app.dependency_overrides[get_current_user] = lambda: creator
+    with TestClient(app) as client:
+        # No periodic version check within the test: only the write's own
+        # eviction can refresh the cache
+        catalog_cache.configure(max_entries=100, ttl=3600, check_interval=3600)
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def template_id(creator: Principal) -> int:
+    with SessionLocal() as db:
+        template = Template(name="A", filename="a.jpg", creator_id=creator.id)
+        db.add(template)
+        db.commit()
+        return template.id
+
+
+def test_get_after_update_on_same_worker(client: TestClient, template_id: int) -> None:
+    before = client.get(f"/api/templates/{template_id}")
+    assert before.json()["name"] == "A"
+
+    patched = client.patch(
+        f"/api/templates/{template_id}", json={"name": "B", "keywords": ["doge"]}
+    )
+    assert patched.status_code == 200
+
+    after = client.get(
+        f"/api/templates/{template_id}",
+        headers={"If-None-Match": before.headers["etag"]},
+    )
+    assert after.status_code == 200
+    assert after.json()["name"] == "B"
+    assert after.headers["etag"] != before.headers["etag"]
+
+
+def test_get_after_delete_on_same_worker(client: TestClient, template_id: int) -> None:
+    assert client.get(f"/api/templates/{template_id}").status_code == 200
+
+    assert client.delete(f"/api/templates/{template_id}").status_code == 204
+
+    assert client.get(f"/api/templates/{template_id}").status_code == 404
+
+
+def test_list_revalidates_until_popularity_flush(
+    client: TestClient, template_id: int, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    catalog_cache.configure(max_entries=100, ttl=3600, check_interval=0)
+    etag = client.get("/api/templates").headers["etag"]
+
+    # Long after max-age, nothing changed
+    later = time.time() + 3600
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: later)
+        revalidated = client.get("/api/templates", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+    client.post(f"/api/templates/{template_id}/popularity")
+    with SessionLocal() as db:
+        popularity_buffer.flush(db)
+    flushed = client.get("/api/templates", headers={"If-None-Match": etag})
+    assert flushed.status_code == 200
+    assert flushed.headers["etag"] != etag
+
+
+@pytest.mark.parametrize(
+    ("role", "group_roles", "status"),
+    [
+        (None, (), 403),
+        (None, ("admin",), 200),
+        ("admin", (), 200),
+    ],
+)
+def test_update_by_admin_of_a_group(
+    client: TestClient,
+    template_id: int,
+    role: str | None,
+    group_roles: tuple[str, ...],
+    status: int,
+) -> None:
+    other = Principal(id=-1, sub="other", role=role, group_roles=group_roles)
+    app.dependency_overrides[get_current_user] = lambda: other
+
+    patched = client.patch(
+        f"/api/templates/{template_id}", json={"name": "B", "keywords": ["doge"]}
+    )
+    assert patched.status_code == status
@@ -0,0 +1,97 @@
+"""The OIDC login upsert runs a bounded number of statements."""
+
+import asyncio
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.database import (
+    AsyncSessionLocal,
+    SessionLocal,
+    async_database_engine,
+    database_engine,
+)
+from src.models import Group, Role
+from src.services import users as user_service
+
+# Group lookup, group insert and reselect, user lookup, user insert, and one
+# executemany for the memberships
+NEW_USER_STATEMENTS = 6
+# Group lookup, user lookup, the user's groups; nothing written
+UNCHANGED_LOGIN_STATEMENTS = 3
+
+
+@contextmanager
+def count_statements(engine: Engine) -> Iterator[list[str]]:
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def _groups(prefix: str, count: int) -> list[str]:
+    return [f"{prefix}-{i}" for i in range(count)]
+
+
+@pytest.mark.parametrize("group_count", [1, 10, 100])
+def test_new_user_statements_do_not_grow_with_groups(group_count: int):
+    sub = f"new-{group_count}"
+    groups = _groups(sub, group_count)
+    with SessionLocal() as db, count_statements(database_engine) as statements:
+        user = user_service.upsert_user(db, sub, "name", f"{sub}@example.com", groups)
+        assert sorted(g.name for g in user.groups) == sorted(groups)
+    assert len(statements) == NEW_USER_STATEMENTS
+
+
+@pytest.mark.parametrize("group_count", [1, 10, 100])
+def test_unchanged_login_writes_nothing(group_count: int):
+    sub = f"same-{group_count}"
+    groups = _groups(sub, group_count)
+    with SessionLocal() as db:
+        user_service.upsert_user(db, sub, "name", f"{sub}@example.com", groups)
+    with SessionLocal() as db, count_statements(database_engine) as statements:
+        user_service.upsert_user(db, sub, "name", f"{sub}@example.com", groups)
+    assert len(statements) == UNCHANGED_LOGIN_STATEMENTS
+    assert not any(
+        s.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))
+        for s in statements
+    )
+
+
+@pytest.mark.parametrize("group_count", [2, 20, 200])
+def test_group_roles_load_in_one_statement(group_count: int):
+    sub = f"roles-{group_count}"
+    groups = _groups(sub, group_count)
+    with SessionLocal() as db:
+        user_service.upsert_user(db, sub, "name", f"{sub}@example.com", groups)
+        role = Role(name=f"role-{sub}")
+        for group in db.query(Group).filter(Group.name.in_(groups[::2])):
+            group.role = role
+        db.commit()
+    with SessionLocal() as db, count_statements(database_engine) as statements:
+        user = user_service.upsert_user(db, sub, "name", f"{sub}@example.com", groups)
+        assert user_service.get_effective_role(user) == f"role-{sub}"
+    assert len(statements) == UNCHANGED_LOGIN_STATEMENTS + 1
+
+
+def test_async_login_statements_do_not_grow_with_groups():
+    async def login(sub: str, groups: list[str]) -> int:
+        async with AsyncSessionLocal() as db:
+            with count_statements(async_database_engine.sync_engine) as statements:
+                await user_service.aupsert_user(
+                    db, sub, "name", f"{sub}@example.com", groups
+                )
+        return len(statements)
+
+    few = asyncio.run(login("async-few", _groups("async-few", 2)))
+    many = asyncio.run(login("async-many", _groups("async-many", 200)))
+    assert few == many == NEW_USER_STATEMENTS
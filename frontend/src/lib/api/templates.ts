@@ -6,7 +6,17 @@ function normalizeUrl(url: string): string {
 }
 
 function toTemplate(t: Template): Template {
-	return { ...t, image_url: normalizeUrl(t.image_url) };
+	const thumbnails = (t.thumbnails ?? []).map((th) => ({ ...th, url: normalizeUrl(th.url) }));
+	const srcset = thumbnails
+		.filter((th) => th.format === 'webp')
+		.map((th) => `${th.url} ${th.width}w`)
+		.join(', ');
+	return { ...t, image_url: normalizeUrl(t.image_url), thumbnails, srcset };
+}
+
+/** Smallest-payload image for grid cards: the JPEG thumbnail, else the original. */
+export function thumbnailUrl(t: Template): string {
+	return t.thumbnails?.find((th) => th.format === 'jpeg')?.url ?? t.image_url;
 }
 
 export async function fetchTemplates(
@@ -24,6 +34,19 @@ export async function fetchTemplates(
 	return { templates: data.templates.map(toTemplate), total: data.total };
 }
 
+/** Typeahead: ids and names of the most popular templates matching `q`. */
+export async function suggestTemplates(
+	q: string,
+	limit = 8
+): Promise<{ id: number; name: string }[]> {
+	const url = new URL(`${API_URL}/templates/suggest`);
+	url.searchParams.set('q', q);
+	url.searchParams.set('limit', String(limit));
+	const res = await fetch(url.toString());
+	if (!res.ok) return [];
+	return (await res.json()).suggestions;
+}
+
 export async function incrementPopularity(id: number): Promise<void> {
 	await apiFetch(`/templates/${id}/popularity`, { method: 'POST' });
 }
@@ -66,11 +89,49 @@ export async function deleteTemplate(id: number): Promise<void> {
 	if (!res.ok) throw new Error(`Delete failed: ${res.status}`);
 }
 
+/**
+ * Upload straight to S3 through a presigned POST, then let the API verify it.
+ * Returns null when the backend does not offer direct uploads (local storage).
+ */
+async function uploadTemplateDirect(
+	name: string,
+	keywords: string[],
+	file: File
+): Promise<Template | null> {
+	const res = await apiFetch('/templates/upload-url', {
+		method: 'POST',
+		headers: { 'Content-Type': 'application/json' },
+		body: JSON.stringify({ content_type: file.type })
+	});
+	if (res.status === 404) return null;
+	if (!res.ok) throw new Error(`Upload failed: ${res.status}`);
+	const { url, fields, token } = await res.json();
+
+	const form = new FormData();
+	for (const [key, value] of Object.entries(fields as Record<string, string>)) {
+		form.append(key, value);
+	}
+	form.append('file', file);
+	const upload = await fetch(url, { method: 'POST', body: form });
+	if (!upload.ok) throw new Error(`Upload failed: ${upload.status}`);
+
+	const finalize = await apiFetch('/templates/finalize', {
+		method: 'POST',
+		headers: { 'Content-Type': 'application/json' },
+		body: JSON.stringify({ token, name, keywords })
+	});
+	if (!finalize.ok) throw new Error(`Upload failed: ${finalize.status}`);
+	return toTemplate(await finalize.json());
+}
+
 export async function uploadTemplate(
 	name: string,
 	keywords: string[],
 	file: File
 ): Promise<Template> {
+	const direct = await uploadTemplateDirect(name, keywords, file);
+	if (direct) return direct;
+
 	const form = new FormData();
 	form.append('name', name);
 	form.append('keywords', keywords.join(','));
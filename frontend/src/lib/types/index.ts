@@ -16,6 +16,12 @@ export interface TemplateTextLayer {
 	allCaps: boolean;
 }
 
+export interface TemplateThumbnail {
+	url: string;
+	width: number;
+	format: 'webp' | 'jpeg';
+}
+
 export interface Template {
 	id: number;
 	name: string;
@@ -23,6 +29,10 @@ export interface Template {
 	image_url: string;
 	created_at: string;
 	text_layers: TemplateTextLayer[];
+	thumbnails?: TemplateThumbnail[];
+	srcset?: string;
+	// Set on a freshly uploaded template: existing ones with a similar image
+	near_duplicates?: Template[];
 }
 
 export interface TextLayer {